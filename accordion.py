@@ -0,0 +1,156 @@
+import json
+
+from bs4.dammit import EntitySubstitution
+
+####
+# string templates for the bootstrap accordion markup (see the header comment in
+# parse_google_doc.py), so we don't have to copy() and wrap a stack of bs4 tags for every card
+#
+# the output is exactly what str() of the equivalent bs4 tags gives: attributes in alphabetical
+# order, text and attribute values escaped the same way as bs4's default ('minimal') formatter
+####
+
+CARD_OPEN = '<div class="card"><div class="card-header" id=%(head_id)s><h2 class="mb-0">'\
+            '<button aria-controls=%(coll_id)s aria-expanded="false" '\
+            'class="btn btn-lg btn-light btn-block collapsed" data-target=%(target)s '\
+            'data-toggle="collapse" type="button"><span class="pull-left">%(title)s</span>'\
+            '</button></h2></div><div aria-labelledby=%(head_id)s class="collapse" '\
+            'data-parent=%(parent)s id=%(coll_id)s>'
+CARD_CLOSE = '</div></div>'
+ACCORDION_OPEN = '<div class="accordion" id=%s>'
+ACCORDION_CLOSE = '</div>'
+SEARCH_BOX = '<div class="card-search" data-index=%s></div><script src="search.js"></script>'
+
+# with shared='ref', a section that appears under more than one h1 is only written out the
+# first time; the repeats are empty card bodies pointing at it, which SHARED_SCRIPT fills in
+# with a copy of the first one when the page loads
+SHARED_BODY = '<div class="card-body" data-shared=%s>'
+SHARED_REF = '<div class="card-body" data-same-as=%s></div>'
+SHARED_SCRIPT = '<script>document.addEventListener("DOMContentLoaded",function(){'\
+                'document.querySelectorAll(".card-body[data-same-as]").forEach(function(d){'\
+                'var s=document.querySelector(\'.card-body[data-shared="\'+d.getAttribute("data-same-as")+\'"]\');'\
+                'if(s){d.innerHTML=s.innerHTML;}});});</script>'
+
+# with lazy loading (see lazy.py), each card body is a placeholder, and LAZY_SCRIPT swaps in the
+# body from the bundle the first time its card opens: on bootstrap's show.bs.collapse event if
+# there is jquery, and on clicks on anything that toggles a card either way (the bundle is
+# fetched once, and fetched again if that failed). The click finds the card by the id in its
+# data-target rather than with querySelector, which throws on ids that start with a digit
+LAZY_BODY = '<div class="card-body" data-lazy=%s></div>'
+LAZY_SCRIPT = '<script>(function(){var url=%s,bundle=null;function fill(panel){'\
+              'var d=panel&&panel.firstElementChild;if(!d||!d.hasAttribute("data-lazy"))return;'\
+              'if(!bundle){bundle=fetch(url).then(function(r){if(!r.ok)throw r.status;return r.json();});'\
+              'bundle.catch(function(){bundle=null;});}'\
+              'bundle.then(function(b){var n=b.cards[d.getAttribute("data-lazy")];'\
+              'if(n!==undefined&&d.parentNode){d.outerHTML=b.bodies[n];}},function(){});}'\
+              'if(window.jQuery){jQuery(document).on("show.bs.collapse",function(e){fill(e.target);});}'\
+              'document.addEventListener("click",function(e){'\
+              'var t=e.target.closest&&e.target.closest("[data-toggle=collapse]");'\
+              'if(t){fill(document.getElementById(t.getAttribute("data-target").slice(1)));}});})();</script>'
+
+def text(s):
+    """
+    escape a string for use as element text
+    """
+    return EntitySubstitution.substitute_xml(s)
+
+def attr(s):
+    """
+    escape and quote a string for use as an attribute value
+    """
+    return EntitySubstitution.quoted_attribute_value(EntitySubstitution.substitute_xml(s))
+
+def card_open(head_id,coll_id,acc_id,title):
+    """
+    markup for the start of a card, up to where the <div class="card-body"> goes
+    head_id is the id of the card-header div, coll_id the id of the collapsible div, acc_id the
+    id of the accordion it's in, and title the text for the button
+    """
+    return CARD_OPEN % {'head_id':attr(head_id),'coll_id':attr(coll_id),\
+                        'target':attr('#%s' % coll_id),'parent':attr('#%s' % acc_id),\
+                        'title':text(title)}
+
+def accordion_open(acc_id):
+    """
+    markup for the start of an accordion
+    """
+    return ACCORDION_OPEN % attr(acc_id)
+
+def heading(name,title):
+    """
+    markup for a plain heading (eg the <h1>s between accordions)
+    """
+    return '<%s>%s</%s>' % (name,text(title),name)
+
+def shared_body(body,label):
+    """
+    markup for the first (full) copy of a shared card body: body is the serialized
+    <div class="card-body">, label what the repeats refer to it by
+    """
+    plain = '<div class="card-body">'
+    assert body.startswith(plain),'not a card body'
+    return SHARED_BODY % attr(label) + body[len(plain):]
+
+def nest_in(body,markup):
+    """
+    markup for a card body with more markup (eg a nested accordion) at the end of it: body is
+    the serialized <div class="card-body">
+    """
+    assert body.endswith('</div>'),'not a card body'
+    return body[:-len('</div>')] + markup + '</div>'
+
+def shared_ref(label):
+    """
+    markup for a repeat of a shared card body, filled in by SHARED_SCRIPT
+    """
+    return SHARED_REF % attr(label)
+
+def lazy_body(card_id):
+    """
+    markup for the placeholder of a lazy-loaded card body
+    """
+    return LAZY_BODY % attr(card_id)
+
+def lazy_script(url):
+    """
+    markup for the script that fills in lazy-loaded card bodies from the bundle at url
+    (relative to the page)
+    """
+    return LAZY_SCRIPT % json.dumps(url).replace('</','<\\/')
+
+def search_box(url):
+    """
+    markup for a search box over the cards, for search.js to fill in: url is the search index
+    (see search.py), relative to the page, and search.js has to sit next to the page too
+    """
+    return SEARCH_BOX % attr(url)
+
+class Page:
+    """
+    the output document, written out as it is put together: shell is the html skeleton with an
+    empty body (from gdoc_utils.shell_html), and each piece of markup added goes straight to f
+    (a file open for writing), so finished cards don't have to stay in memory; with f None the
+    pieces are kept and joined at the end
+    """
+    def __init__(self,shell,f=None):
+        head,self.tail = shell.split('<body></body>')
+        self.f = f
+        self.pieces = []
+        self.write(head+'<body>')
+
+    def write(self,markup):
+        """
+        add a piece of markup to the body
+        """
+        if self.f != None:
+            self.f.write(markup)
+        else:
+            self.pieces.append(markup)
+
+    def close(self):
+        """
+        finish the document: returns it as a string, or None if it went to f
+        """
+        self.write('</body>'+self.tail)
+        if self.f == None:
+            return ''.join(self.pieces)
@@ -0,0 +1,227 @@
+import os, sys
+import json
+import time
+import traceback
+from argparse import ArgumentParser
+from concurrent.futures import ProcessPoolExecutor
+
+from gdoc_utils import read_export, write_atomic, atomic_file, guess_kind, out_name, add_parser_arg, KINDS
+from watch import watch, is_export
+from links import AnchorIndex, index_file
+from search import dump_index, index_path
+from minify import write_minified, write_gzipped, add_minify_args
+from lazy import dump_bundle, bundle_path, add_lazy_arg
+from css_optimize import optimize, print_savings, add_css_args
+
+####
+# convert a whole set of google-exported html files in one go (guidelines, editorial policies,
+# faq, ...), in parallel worker processes
+#
+# input is either a directory (every .html or .zip export in it is converted) or a manifest
+# file with one export per line:
+#   path/to/export.html  [guidelines|faq]  [output name]
+# blank lines and lines starting with # are skipped; paths are relative to the manifest.
+# if the kind isn't given we guess it (see gdoc_utils.guess_kind); outputs are named out_<input name>.html
+# unless the manifest says otherwise
+#
+# every document is indexed (in the workers) before any is converted, so links from one to a
+# heading in another point at the right card on the other's output page (see links.py); links
+# that don't go anywhere are listed in the report
+#
+# with --watch (directory only) it keeps running and reconverts exports as they are added or
+# changed, in the same worker processes (so imports and stylesheet tables stay warm)
+#
+# with --optimize-css DIR, the css stage (css_optimize.py) is run on all the pages afterwards,
+# writing them with their repeated styles as classes, and the stylesheets, to DIR
+#
+# usage: python batch_convert.py exports/ [-o outdir] [-j 4] [--report report.json] [--watch]
+####
+
+def read_manifest(mfile):
+    """
+    read a manifest file into a list of (input path, kind or None, output name or None)
+    """
+    jobs = []
+    mdir = os.path.dirname(os.path.abspath(mfile))
+    f = open(mfile,'r')
+    for line in f:
+        line = line.strip()
+        if line == '' or line.startswith('#'):
+            continue
+        parts = line.split()
+        ifile = os.path.join(mdir,parts[0])
+        kind = None; oname = None
+        for p in parts[1:]:
+            if p in KINDS:
+                kind = p
+            else:
+                oname = p
+        jobs.append((ifile,kind,oname))
+    f.close()
+    return jobs
+
+def find_jobs(source):
+    """
+    list (input path, kind or None, output name or None) for a directory or a manifest file
+    """
+    if os.path.isdir(source):
+        names = sorted(n for n in os.listdir(source) if is_export(n))
+        return [(os.path.join(source,n),None,None) for n in names]
+    return read_manifest(source)
+
+def convert_file(ifile,kind=None,ofile=None,parser=None,index=None,search=False,minify=False,lazy=False):
+    """
+    convert one export and write the result; runs in a worker process
+    index is a links.AnchorIndex of all the documents in the run, for links between them, and
+    search=True also writes a search index of the cards next to the output, and minify=True
+    (or 'check', to compare the documents first) writes the files minified, with .gz copies;
+    lazy=True puts the card bodies in a bundle next to the output, loaded as cards are opened
+    returns a dict of what happened for the summary report (errors are caught and reported)
+    """
+    result = {'ifile':ifile,'kind':kind,'ofile':ofile,'ok':False,'seconds':None,'error':None,'unresolved':[],\
+              'sizes':None}
+    t0 = time.perf_counter()
+    try:
+        text = read_export(ifile)
+        if kind == None:
+            kind = guess_kind(ifile,text)
+            result['kind'] = kind
+        if kind == 'faq':
+            import parse_faq as module
+        else:
+            import parse_google_doc as module
+        found = {'url':os.path.basename(index_path(ofile))} if search else None
+        bundle = {'url':os.path.basename(bundle_path(ofile))} if lazy else None
+        kwargs = dict(parser=parser,index=index,page=os.path.basename(ofile),unresolved=result['unresolved'],\
+                      search=found,lazy=bundle)
+        if minify:
+            out = module.convert(text,**kwargs)
+            result['sizes'] = write_minified(ofile,out,check=minify == 'check')
+        else:
+            with atomic_file(ofile) as f:
+                module.convert(text,out=f,**kwargs)  # written out card by card
+        if found != None:
+            (write_gzipped if minify else write_atomic)(index_path(ofile),dump_index(found['index']))
+        if bundle != None:
+            (write_gzipped if minify else write_atomic)(bundle_path(ofile),dump_bundle(bundle['bundle']))
+        result['ok'] = True
+    except Exception as e:
+        result['error'] = '%s: %s' % (type(e).__name__,e)
+        result['traceback'] = traceback.format_exc()
+    result['seconds'] = time.perf_counter() - t0
+    return result
+
+def index_job(ifile,kind=None,parser=None):
+    """
+    index_file, but an export that can't be read or parsed just adds nothing (converting it
+    will fail and report why); runs in a worker process
+    """
+    try:
+        return index_file(ifile,kind,parser)
+    except Exception:
+        return {}
+
+def run_batch(jobs,odir='.',nproc=None,parser=None,pool=None,index=None,search=False,minify=False,lazy=False):
+    """
+    convert a list of (input path, kind or None, output name or None) in a process pool (a new
+    one with nproc workers, unless an existing pool is given)
+    all the documents are indexed first (into index, or a new links.AnchorIndex) so links
+    between them can be resolved; an index kept from earlier runs still has the other documents
+    search, minify and lazy are passed on to convert_file
+    returns the list of per-file result dicts, in the same order as jobs
+    """
+    os.makedirs(odir,exist_ok=True)
+    if pool == None:
+        with ProcessPoolExecutor(max_workers=nproc) as pool:
+            return run_batch(jobs,odir=odir,parser=parser,pool=pool,index=index,search=search,minify=minify,\
+                             lazy=lazy)
+    if index == None:
+        index = AnchorIndex()
+    ofiles = [os.path.join(odir,oname or out_name(ifile)) for ifile,kind,oname in jobs]
+    targets = [pool.submit(index_job,ifile,kind,parser) for ifile,kind,oname in jobs]
+    for ofile,fut in zip(ofiles,targets):
+        index.add(os.path.basename(ofile),fut.result())
+    futures = []
+    for (ifile,kind,oname),ofile in zip(jobs,ofiles):
+        futures.append(pool.submit(convert_file,ifile,kind,ofile,parser,index,search,minify,lazy))
+    return [fut.result() for fut in futures]
+
+def print_report(results,wall):
+    """
+    print a summary table of a batch run
+    """
+    print('%-40s %-10s %8s  %s' % ('input','kind','time [s]','result'))
+    for r in results:
+        status = r['ofile'] if r['ok'] else 'FAILED %s' % r['error']
+        print('%-40s %-10s %8.2f  %s' % (os.path.basename(r['ifile']),r['kind'],r['seconds'],status))
+    nfail = sum(1 for r in results if not r['ok'])
+    print('%d files, %d failed, %.2f s wall' % (len(results),nfail,wall))
+    unresolved = [u for r in results for u in r['unresolved']]
+    if len(unresolved) > 0:
+        print('%d links could not be resolved (listed in --report)' % len(unresolved))
+    sizes = [r['sizes'] for r in results if r['sizes'] != None]
+    if len(sizes) > 0:
+        full,small,gz = [sum(s[k] for s in sizes) for k in range(3)]
+        print('minified: %.1f kB -> %.1f kB (%.0f%% smaller), %.1f kB gzipped' \
+              % (full/1e3,small/1e3,100.*(full-small)/max(full,1),gz/1e3))
+
+if __name__ == '__main__':
+    parser = ArgumentParser()
+    parser.add_argument('source',type=str,help='directory of exports, or a manifest file')
+    parser.add_argument('--odir','-o',type=str,default='.',help='directory to write outputs to')
+    parser.add_argument('--jobs','-j',type=int,default=None,help='number of worker processes')
+    parser.add_argument('--report',type=str,default=None,help='write the summary as json here')
+    add_parser_arg(parser)
+    parser.add_argument('--search',action='store_true',help='also write a search index of the cards next to each output')
+    add_minify_args(parser)
+    add_lazy_arg(parser)
+    parser.add_argument('--watch',action='store_true',help='keep running and reconvert exports when they change')
+    parser.add_argument('--interval',type=float,default=1.0,help='seconds between checks in --watch mode')
+    parser.add_argument('--optimize-css',type=str,default=None,metavar='DIR',\
+                    help='then hoist repeated inline styles into classes and purge the stylesheets, writing it all to DIR')
+    add_css_args(parser)
+    args = parser.parse_args()
+    minify = 'check' if args.minify_check else args.minify
+
+    assert os.path.exists(args.source),'source does not exist'
+    assert args.optimize_css == None or os.path.abspath(args.optimize_css) != os.path.abspath(args.odir),\
+           '--optimize-css has to be somewhere other than --odir'
+    pages = set()  # the pages written so far (all of them in --watch mode), for --optimize-css
+    def optimize_css(results):
+        """
+        run the css stage on every page written so far
+        """
+        pages.update(r['ofile'] for r in results if r['ok'])
+        if args.optimize_css != None and len(pages) > 0:
+            print_savings(optimize(sorted(pages),args.stylesheet,args.optimize_css,themes=args.theme,also=args.also,\
+                                   keep=args.keep))
+    if args.watch:
+        assert os.path.isdir(args.source),'--watch needs a directory'
+        index = AnchorIndex()  # kept between runs, so links to documents that didn't change still work
+        with ProcessPoolExecutor(max_workers=args.jobs) as pool:
+            def handle(paths):
+                t0 = time.perf_counter()
+                results = run_batch([(p,None,None) for p in paths],odir=args.odir,parser=args.parser,\
+                                    pool=pool,index=index,search=args.search,minify=minify,lazy=args.lazy)
+                print_report(results,time.perf_counter()-t0)
+                optimize_css(results)
+            print('watching %s (ctrl-c to stop)' % args.source)
+            watch(args.source,handle,interval=args.interval)
+        sys.exit(0)
+
+    jobs = find_jobs(args.source)
+
+    t0 = time.perf_counter()
+    results = run_batch(jobs,odir=args.odir,nproc=args.jobs,parser=args.parser,search=args.search,\
+                        minify=minify,lazy=args.lazy)
+    wall = time.perf_counter() - t0
+    print_report(results,wall)
+    optimize_css(results)
+
+    if args.report != None:
+        f = open(args.report,'w')
+        json.dump({'wall_seconds':wall,'files':results},f,indent=1)
+        f.close()
+
+    if any(not r['ok'] for r in results):
+        sys.exit(1)
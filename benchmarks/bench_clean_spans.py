@@ -0,0 +1,75 @@
+import os, sys
+import time
+import random
+from copy import copy
+from argparse import ArgumentParser
+
+sys.path.insert(0,os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from gdoc_utils import load_soup, style_text, clean_spans
+from css_translate import translate_table
+from parse_google_doc import css_keys
+
+####
+# time clean_spans on a synthetic google export with lots of spans and lots of .c# classes,
+# against the old version that scanned every translated class for every span
+#
+# usage: python benchmarks/bench_clean_spans.py [--spans 50000] [--classes 500]
+####
+
+def synthetic_export(nspans=50000,nclasses=500,seed=0):
+    """
+    make a google-like html export: a big .c# stylesheet and paragraphs full of classed spans
+    """
+    rng = random.Random(seed)
+    props = ['font-weight:700','font-style:italic','text-decoration:underline',\
+             'background-color:#ff0','font-weight:400','color:#000000','font-size:11pt']
+    rules = ['.c%d{%s}' % (c,';'.join(rng.sample(props,rng.randrange(1,4)))) for c in range(nclasses)]
+    body = []; isp = 0
+    while isp < nspans:
+        nin = rng.randrange(1,8)
+        spans = []
+        for s in range(nin):
+            cls = ' '.join('c%d' % rng.randrange(nclasses) for k in range(rng.randrange(1,4)))
+            spans.append('<span class="%s">word%d </span>' % (cls,isp+s))
+        body.append('<p class="c0">%s</p>' % ''.join(spans))
+        isp += nin
+    return '<html><head><style type="text/css">%s</style></head><body>%s</body></html>' \
+                % (''.join(rules),''.join(body))
+
+def clean_spans_scan(soup,translate={}):
+    """
+    the old clean_spans: loop over every translated class for every span, with prebuilt tags
+    """
+    tags = {}
+    for k in translate.keys():
+        tags[k] = [soup.new_tag(a) for a in translate[k]]
+    for sp in soup.find_all('span'):
+        for k in tags.keys():
+            if 'class' in sp.attrs and k in sp.attrs['class']:
+                for a in tags[k]:
+                    sp.wrap(copy(a))
+        sp.unwrap()
+    return soup
+
+if __name__ == '__main__':
+    parser = ArgumentParser()
+    parser.add_argument('--spans',type=int,default=50000,help='number of spans')
+    parser.add_argument('--classes',type=int,default=500,help='number of .c# classes')
+    args = parser.parse_args()
+
+    text = synthetic_export(args.spans,args.classes)
+    results = {}
+    for name,func in [('indexed',clean_spans),('scan',clean_spans_scan)]:
+        soup = load_soup(text)
+        header = soup.head.extract()
+        translate = translate_table(style_text(header),css_keys)
+        t0 = time.perf_counter()
+        soup = func(soup,translate=translate)
+        dt = time.perf_counter() - t0
+        results[name] = str(soup)
+        print('%-8s %8.3f s  (%d spans, %d translated classes)' % (name,dt,args.spans,len(translate)))
+
+    if results['indexed'] != results['scan']:
+        print('indexed and scan outputs differ!')
+        sys.exit(1)
+    print('outputs identical')
@@ -0,0 +1,92 @@
+import os, sys
+import re
+import time
+import random
+from argparse import ArgumentParser
+
+sys.path.insert(0,os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from gdoc_utils import read_export, load_soup, strip_comments
+
+####
+# time comment stripping on a heavily commented synthetic draft (and/or real exports), against
+# the old find_comment_class + strip_comments, and check that both remove exactly the same nodes
+#
+# usage: python benchmarks/bench_comments.py [--comments 500] [-f export.html ...]
+####
+
+def synthetic_draft(ncomments=500,nparas=3000,seed=0):
+    """
+    a google-like export with comment refs scattered through the text, footnotes, and the
+    comment divs at the end
+    """
+    rng = random.Random(seed)
+    body = ['<div><p class="c1"><span class="c0">header</span></p></div>']
+    refs = sorted(rng.sample(range(nparas),min(ncomments,nparas)))
+    ir = 0
+    for i in range(nparas):
+        ref = ''
+        while ir < len(refs) and refs[ir] == i:
+            ref += '<sup><a href="#cmnt%d" id="cmnt_ref%d">[%d]</a></sup>' % (ir+1,ir+1,ir+1)
+            ir += 1
+        body.append('<p class="c3"><span class="c0">paragraph %d</span>%s</p>' % (i,ref))
+        if i % 50 == 0:
+            body.append('<div class="c7"><p><span>boxed %d</span></p></div>' % i)
+    body.append('<hr><div><p class="c4"><a href="#ftnt_ref1" id="ftnt1">[1]</a><span>note</span></p></div>')
+    for n in range(1,len(refs)+1):
+        body.append('<div class="c9"><p class="c4"><a href="#cmnt_ref%d" id="cmnt%d">[%d]</a>'\
+                    '<span class="c0">comment %d</span></p></div>' % (n,n,n,n))
+    return '<html><body class="c2">%s</body></html>' % ''.join(body)
+
+def find_comment_class_old(soup):
+    """
+    the old way of finding the comment class: look inside every div in turn
+    """
+    divs = soup.find_all('div')
+    for d in divs:
+        aas = d.find_all(id=re.compile('^cmnt'))
+        if len(aas) > 0:
+            return d.attrs['class']
+
+def strip_comments_old(soup):
+    """
+    the old comment stripping, with a separate find_all for the divs and the anchors
+    """
+    cmt_class = find_comment_class_old(soup)
+    for div in soup.find_all('div',class_=cmt_class):
+        div.decompose()
+    for a in soup.find_all(id=re.compile('^cmnt')):
+        a.decompose()
+    return soup
+
+def check(text,label):
+    """
+    strip comments both ways, print timing, and return whether the results are the same
+    """
+    results = {}
+    for name,func in [('one-pass',strip_comments),('old',strip_comments_old)]:
+        soup = load_soup(text)
+        ntags = len(soup.find_all(True))
+        t0 = time.perf_counter()
+        soup = func(soup)
+        dt = time.perf_counter() - t0
+        results[name] = str(soup)
+        print('%-24s %-9s %8.4f s  removed %d of %d tags' % (label,name,dt,\
+                    ntags-len(soup.find_all(True)),ntags))
+    return results['one-pass'] == results['old']
+
+if __name__ == '__main__':
+    parser = ArgumentParser()
+    parser.add_argument('--comments',type=int,default=500,help='number of comments in the synthetic draft')
+    parser.add_argument('--ifile','-f',type=str,nargs='*',default=[],help='exports to check too')
+    args = parser.parse_args()
+
+    ok = True
+    for ncmt in [0,1,args.comments]:
+        ok = check(synthetic_draft(ncmt),'synthetic (%d comments)' % ncmt) and ok
+    for ifile in args.ifile:
+        ok = check(read_export(ifile),os.path.basename(ifile)) and ok
+
+    if not ok:
+        print('comment stripping removed different nodes than the old version!')
+        sys.exit(1)
+    print('same nodes removed')
@@ -0,0 +1,277 @@
+import os, sys
+import json
+import time
+import tempfile
+from argparse import ArgumentParser
+
+sys.path.insert(0,os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from bs4 import BeautifulSoup
+from gdoc_utils import write_atomic
+from minify import minify
+from lazy import dump_bundle, bundle_path
+from css_optimize import optimize, print_savings, start_tags, normal_style, parse_css, split_selectors, STYLE_PREFIX
+from make_export import make_export
+import parse_google_doc
+import parse_faq
+
+####
+# the css stage (css_optimize.py) on synthetic pages of both kinds, with a stand-in for the
+# bootstrap theme (the real one isn't in the repo): a sample of bootstrap 4's rules, plus its
+# grid in each @media block. Prints the time and the savings, and checks that
+#   - every element in the pages comes out with the same attributes, other than a style
+#     attribute turned into the class whose rule has that style (pages written plain,
+#     minified, and with a --lazy bundle)
+#   - every selector in the theme and stylesheet that matches an element in a page (soupsieve,
+#     bs4's css selector engine) is still in the purged stylesheet
+#
+# usage: python benchmarks/bench_css.py [--scales 1 10]
+####
+
+MODULES = {'guidelines':parse_google_doc,'faq':parse_faq}
+THEME = """@charset "UTF-8";
+:root{--blue:#007bff;--font-family-sans-serif:-apple-system,"Segoe UI",Roboto,sans-serif}
+*,::after,::before{box-sizing:border-box}
+html{font-family:sans-serif;line-height:1.15}
+body{margin:0;font-size:1rem;line-height:1.5;color:#212529;background-color:#fff}
+[tabindex="-1"]:focus:not(:focus-visible){outline:0!important}
+h1,h2,h3,h4,h5,h6{margin-top:0;margin-bottom:.5rem}
+p{margin-top:0;margin-bottom:1rem}
+abbr[data-original-title],abbr[title]{text-decoration:underline dotted;cursor:help}
+ol,ul,dl{margin-top:0;margin-bottom:1rem}
+ol ol,ol ul,ul ol,ul ul{margin-bottom:0}
+b,strong{font-weight:bolder}
+sub,sup{position:relative;font-size:75%;line-height:0}
+a{color:#007bff;text-decoration:none;background-color:transparent}
+a:hover{color:#0056b3;text-decoration:underline}
+a:not([href]):not([class]){color:inherit}
+pre,code,kbd,samp{font-family:SFMono-Regular,Menlo,monospace}
+img{vertical-align:middle;border-style:none}
+table{border-collapse:collapse}
+th{text-align:inherit}
+button{border-radius:0}
+button:focus{outline:1px dotted;outline:5px auto -webkit-focus-ring-color}
+[type=button],[type=reset],[type=submit],button{-webkit-appearance:button}
+[hidden]{display:none!important}
+.h1,.h2,.h3{margin-bottom:.5rem;font-weight:500}
+.lead{font-size:1.25rem;font-weight:300}
+.list-unstyled{padding-left:0;list-style:none}
+.container{width:100%;padding-right:15px;padding-left:15px;margin-right:auto;margin-left:auto}
+.row{display:flex;flex-wrap:wrap;margin-right:-15px;margin-left:-15px}
+.table{width:100%;margin-bottom:1rem;color:#212529}
+.table td,.table th{padding:.75rem;vertical-align:top;border-top:1px solid #dee2e6}
+.table thead th{vertical-align:bottom;border-bottom:2px solid #dee2e6}
+.table tbody+tbody{border-top:2px solid #dee2e6}
+.table-sm td,.table-sm th{padding:.3rem}
+.table-bordered{border:1px solid #dee2e6}
+.table-striped tbody tr:nth-of-type(odd){background-color:rgba(0,0,0,.05)}
+.table-hover tbody tr:hover{color:#212529;background-color:rgba(0,0,0,.075)}
+.form-control{display:block;width:100%;height:calc(1.5em + .75rem + 2px);padding:.375rem .75rem}
+.form-control:focus{color:#495057;border-color:#80bdff;outline:0}
+.form-control::placeholder{color:#6c757d;opacity:1}
+.form-group{margin-bottom:1rem}
+.btn{display:inline-block;font-weight:400;text-align:center;border:1px solid transparent;padding:.375rem .75rem}
+.btn:hover{color:#212529;text-decoration:none}
+.btn.focus,.btn:focus{outline:0;box-shadow:0 0 0 .2rem rgba(0,123,255,.25)}
+.btn-primary{color:#fff;background-color:#007bff;border-color:#007bff}
+.btn-primary:hover{color:#fff;background-color:#0069d9;border-color:#0062cc}
+.btn-secondary{color:#fff;background-color:#6c757d;border-color:#6c757d}
+.btn-light{color:#212529;background-color:#f8f9fa;border-color:#f8f9fa}
+.btn-light:hover{color:#212529;background-color:#e2e6ea;border-color:#dae0e5}
+.btn-light:not(:disabled):not(.disabled).active,.btn-light:not(:disabled):not(.disabled):active{color:#212529}
+.btn-link{font-weight:400;color:#007bff;text-decoration:none}
+.btn-lg{padding:.5rem 1rem;font-size:1.25rem;line-height:1.5;border-radius:.3rem}
+.btn-block{display:block;width:100%}
+.btn-block+.btn-block{margin-top:.5rem}
+.fade{transition:opacity .15s linear}
+.fade:not(.show){opacity:0}
+.collapse:not(.show){display:none}
+.collapsing{position:relative;height:0;overflow:hidden;transition:height .35s ease}
+.dropdown-menu{position:absolute;top:100%;left:0;z-index:1000;display:none;float:left;min-width:10rem}
+.dropdown-item{display:block;width:100%;padding:.25rem 1.5rem;clear:both}
+.dropdown-item.active,.dropdown-item:active{color:#fff;text-decoration:none;background-color:#007bff}
+.nav{display:flex;flex-wrap:wrap;padding-left:0;margin-bottom:0;list-style:none}
+.nav-link{display:block;padding:.5rem 1rem}
+.nav-tabs .nav-item.show .nav-link,.nav-tabs .nav-link.active{color:#495057;background-color:#fff}
+.navbar{position:relative;display:flex;flex-wrap:wrap;align-items:center;padding:.5rem 1rem}
+.navbar-brand{display:inline-block;padding-top:.3125rem;margin-right:1rem;font-size:1.25rem}
+.navbar-light .navbar-nav .nav-link{color:rgba(0,0,0,.5)}
+.card{position:relative;display:flex;flex-direction:column;min-width:0;word-wrap:break-word;background-color:#fff}
+.card>hr{margin-right:0;margin-left:0}
+.card-body{flex:1 1 auto;min-height:1px;padding:1.25rem}
+.card-title{margin-bottom:.75rem}
+.card-header{padding:.75rem 1.25rem;margin-bottom:0;background-color:rgba(0,0,0,.03);border-bottom:1px solid rgba(0,0,0,.125)}
+.card-header:first-child{border-radius:calc(.25rem - 1px) calc(.25rem - 1px) 0 0}
+.card-footer{padding:.75rem 1.25rem;background-color:rgba(0,0,0,.03)}
+.accordion{overflow-anchor:none}
+.accordion>.card{overflow:hidden}
+.accordion>.card:not(:last-of-type){border-bottom:0;border-bottom-right-radius:0}
+.accordion>.card>.card-header{border-radius:0;margin-bottom:-1px}
+.breadcrumb{display:flex;flex-wrap:wrap;padding:.75rem 1rem;margin-bottom:1rem;list-style:none}
+.pagination{display:flex;padding-left:0;list-style:none;border-radius:.25rem}
+.page-link{position:relative;display:block;padding:.5rem .75rem;margin-left:-1px}
+.badge{display:inline-block;padding:.25em .4em;font-size:75%;font-weight:700}
+.alert{position:relative;padding:.75rem 1.25rem;margin-bottom:1rem;border:1px solid transparent}
+.alert-danger{color:#721c24;background-color:#f8d7da;border-color:#f5c6cb}
+@keyframes progress-bar-stripes{from{background-position:1rem 0}to{background-position:0 0}}
+.progress{display:flex;height:1rem;overflow:hidden;font-size:.75rem}
+.progress-bar-animated{animation:progress-bar-stripes 1s linear infinite}
+.media{display:flex;align-items:flex-start}
+.list-group{display:flex;flex-direction:column;padding-left:0;margin-bottom:0}
+.list-group-item{position:relative;display:block;padding:.75rem 1.25rem}
+.close{float:right;font-size:1.5rem;font-weight:700;line-height:1}
+.modal{position:fixed;top:0;left:0;z-index:1050;display:none;width:100%;height:100%}
+.modal-dialog{position:relative;width:auto;margin:.5rem;pointer-events:none}
+.modal-content{position:relative;display:flex;flex-direction:column;width:100%}
+.tooltip{position:absolute;z-index:1070;display:block;margin:0}
+.popover{position:absolute;top:0;left:0;z-index:1060;display:block;max-width:276px}
+.carousel{position:relative}
+.carousel-item{position:relative;display:none;float:left;width:100%}
+.carousel-indicators li{box-sizing:content-box;flex:0 1 auto;width:30px;height:3px}
+.spinner-border{display:inline-block;width:2rem;height:2rem;border:.25em solid currentColor}
+.mb-0,.my-0{margin-bottom:0!important}
+.mt-3,.my-3{margin-top:1rem!important}
+.pull-left{float:left!important}
+.pull-right{float:right!important}
+.d-none{display:none!important}
+.d-block{display:block!important}
+.text-center{text-align:center!important}
+.sr-only{position:absolute;width:1px;height:1px;padding:0;overflow:hidden;clip:rect(0,0,0,0)}
+@font-face{font-family:"Overpass";src:url("overpass.woff2") format("woff2")}
+@media print{*,::after,::before{text-shadow:none!important;box-shadow:none!important}a:not(.btn){text-decoration:underline}pre{white-space:pre-wrap!important}thead{display:table-header-group}tr,img{page-break-inside:avoid}.navbar{display:none}.table{border-collapse:collapse!important}.table td,.table th{background-color:#fff!important}}
+@media (prefers-reduced-motion:reduce){.btn{transition:none}.collapsing{transition:none}.fade{transition:none}.progress-bar-animated{animation:none}}
+"""
+
+def grid():
+    """
+    bootstrap's grid: col-<breakpoint>-1..12 with offsets and orders, in a @media block each
+    """
+    css = []
+    for bp,width in (('sm',576),('md',768),('lg',992),('xl',1200)):
+        rules = ['.container{max-width:%dpx}' % (width-36)]
+        for k in range(1,13):
+            rules.append('.col-%s-%d{flex:0 0 %.6f%%;max-width:%.6f%%}' % (bp,k,100.*k/12,100.*k/12))
+            rules.append('.order-%s-%d{order:%d}' % (bp,k,k))
+            rules.append('.offset-%s-%d{margin-left:%.6f%%}' % (bp,k,100.*k/12))
+        for prop,p in (('margin','m'),('padding','p')):
+            for k,size in enumerate(('0','.25rem','.5rem','1rem','1.5rem','3rem')):
+                rules.append('.%s-%s-%d{%s:%s!important}' % (p,bp,k,prop,size))
+                rules.append('.%st-%s-%d,.%sy-%s-%d{%s-top:%s!important}' % (p,bp,k,p,bp,k,prop,size))
+        css.append('@media (min-width:%dpx){%s}' % (width,''.join(rules)))
+    return '\n'.join(css)
+
+def same_but_hoisted(before,after,rules):
+    """
+    whether two pages have the same start tags with the same attributes, other than style
+    attributes in the first that are gs- classes (with that style) in the second
+    """
+    a = list(start_tags(before)); b = list(start_tags(after))
+    if len(a) != len(b):
+        return False
+    for (m,name,attrs),(n,name2,attrs2) in zip(a,b):
+        attrs = dict(attrs); attrs2 = dict(attrs2)
+        if 'style' in attrs and 'style' not in attrs2:
+            classes = attrs2.get('class','').split()
+            hoisted = [c for c in classes if c.startswith(STYLE_PREFIX)]
+            if len(hoisted) != 1 or rules.get(hoisted[0]) != normal_style(attrs.pop('style')):
+                return False
+            classes.remove(hoisted[0])
+            if len(classes) > 0 or 'class' in attrs:
+                attrs2['class'] = ' '.join(classes)
+            else:
+                del attrs2['class']
+        if name != name2 or attrs != attrs2:
+            return False
+    return True
+
+def hoisted_rules(css):
+    """
+    the gs- classes in a generated stylesheet, and the (normalized) style each stands for
+    """
+    rules = {}
+    for prelude,body in parse_css(css):
+        if prelude.startswith('.'+STYLE_PREFIX):
+            rules[prelude[1:]] = normal_style(body.replace('!important',''))
+    return rules
+
+def missing_selectors(pages,sheet,purged):
+    """
+    the selectors in sheet that match something in one of the pages but aren't in purged
+    """
+    def selectors(items,into):
+        for prelude,body in items:
+            if isinstance(body,list):
+                selectors(body,into)
+            elif not prelude.startswith('@'):
+                into.update(split_selectors(prelude))
+        return into
+    kept = selectors(parse_css(purged),set())
+    wanted = selectors(parse_css(sheet),set())
+    soups = [BeautifulSoup(page,'html.parser') for page in pages]
+    missing = []
+    for sel in sorted(wanted - kept):
+        for soup in soups:
+            try:
+                found = soup.select_one(sel)
+            except Exception:
+                found = None  # (:hover and the like, which soupsieve doesn't do)
+            if found != None:
+                missing.append(sel)
+                break
+    return missing
+
+if __name__ == '__main__':
+    parser = ArgumentParser()
+    parser.add_argument('--scales',type=float,nargs='+',default=[1,10],help='document sizes, relative to the real ones')
+    args = parser.parse_args()
+
+    here = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    ok = True
+    with tempfile.TemporaryDirectory() as tmp:
+        theme = os.path.join(tmp,'theme.css')
+        write_atomic(theme,THEME+grid())
+        for scale in args.scales:
+            for variant in ('plain','minified','lazy'):
+                pages = []
+                for kind,module in MODULES.items():
+                    text = make_export(kind,scale)
+                    page = os.path.join(tmp,'out_%s.html' % kind)
+                    if variant == 'lazy':
+                        lazy = {'url':os.path.basename(bundle_path(page))}
+                        out = module.convert(text,lazy=lazy)
+                        write_atomic(bundle_path(page),dump_bundle(lazy['bundle']))
+                    else:
+                        out = module.convert(text)
+                        if os.path.isfile(bundle_path(page)):
+                            os.remove(bundle_path(page))
+                    write_atomic(page,minify(out) if variant == 'minified' else out)
+                    pages.append(page)
+                odir = os.path.join(tmp,'build')
+                t0 = time.perf_counter()
+                sizes = optimize(pages,os.path.join(here,'stylesheet.css'),odir,themes=[theme])
+                dt = time.perf_counter() - t0
+                print('x%g, %s pages: %.2f s' % (scale,variant,dt))
+                print_savings(sizes)
+
+                with open(os.path.join(odir,'stylesheet.css')) as f:
+                    generated = f.read()
+                with open(os.path.join(odir,'stylesheet.min.css')) as f:
+                    purged = f.read()
+                rules = hoisted_rules(generated)
+                befores = []; afters = []
+                for page in pages:
+                    with open(page) as f:
+                        befores.append(f.read())
+                    with open(os.path.join(odir,os.path.basename(page))) as f:
+                        afters.append(f.read())
+                    if variant == 'lazy':
+                        with open(bundle_path(page)) as f:
+                            befores[-1] += ''.join(json.load(f)['bodies'])
+                        with open(bundle_path(os.path.join(odir,os.path.basename(page)))) as f:
+                            afters[-1] += ''.join(json.load(f)['bodies'])
+                same = all(same_but_hoisted(b,a,rules) for b,a in zip(befores,afters))
+                missing = missing_selectors(afters,THEME+grid()+generated,purged)
+                ok = ok and same and len(missing) == 0 and len(rules) > 0
+                print('    %s; %s' % ('attributes the same, styles hoisted' if same else 'ATTRIBUTES DIFFER',\
+                      'every matching selector kept' if len(missing) == 0 else 'MATCHING SELECTORS DROPPED: %s' % missing))
+    if not ok:
+        sys.exit(1)
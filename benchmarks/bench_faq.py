@@ -0,0 +1,79 @@
+import os, sys
+import re
+import time
+from argparse import ArgumentParser
+
+sys.path.insert(0,os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from profiling import StageTimer
+from make_export import make_export
+import parse_faq
+
+####
+# the FAQ at sizes up to thousands of Q/A pairs: conversion time (and time per question, which
+# should stay flat), with no headings, under a single title heading, and under many category
+# headings, the questions in each in fixed-size chunks. Some answers get paragraphs with no bold
+# in them (which used to crash the answer loop), and each heading an intro paragraph. The check
+# is that every question comes out as one card, the card and accordion ids are all different,
+# there are as many accordions as the chunks of each category make, and every intro is on the
+# page
+#
+# usage: python benchmarks/bench_faq.py [--pairs 500 5000] [--categories 40] [--chunk 50]
+####
+
+PLAIN = '<p class="c3"><span class="c0">and no bold in this paragraph</span></p>'
+INTRO = '<p class="c3"><span class="c0">about the questions under this heading</span></p>'
+
+def faq_export(npairs,categories):
+    """
+    a synthetic faq export with npairs questions, plain paragraphs after some answers, and an
+    intro after each category heading
+    """
+    text = make_export('faq',npairs/40.,categories=categories)
+    k = [0]
+    def plain(m):
+        k[0] += 1
+        return m.group(0) + (PLAIN if k[0] % 7 == 0 else '')
+    text = re.sub(r'<h2[^>]*>.*?</h2>',lambda m: m.group(0) + INTRO,text)
+    return re.sub(r'<p class="c3"><span class="c\d+">A\. </span>.*?</p>',plain,text)
+
+def accordions(npairs,categories,chunk):
+    """
+    how many accordions an faq from faq_export should have: each category's questions (the way
+    make_export shares them out), or all of them, in chunks
+    """
+    sizes = [npairs]
+    if categories > 0:
+        sizes = [0]*categories
+        for q in range(npairs):
+            sizes[q*categories//npairs] += 1
+    return sum(max(1,-(-n//chunk)) if chunk > 0 else 1 for n in sizes)
+
+if __name__ == '__main__':
+    parser = ArgumentParser()
+    parser.add_argument('--pairs',type=int,nargs='+',default=[500,5000],help='numbers of Q/A pairs')
+    parser.add_argument('--categories',type=int,default=40,help='number of category headings in the categorized faq')
+    parser.add_argument('--chunk',type=int,default=parse_faq.CHUNK,help='questions per accordion (in each category)')
+    args = parser.parse_args()
+
+    ok = True
+    for npairs in args.pairs:
+        for cats in (0,1,args.categories):
+            text = faq_export(npairs,cats)
+            timer = StageTimer()
+            t0 = time.perf_counter()
+            out = parse_faq.convert(text,timer=timer,chunk=args.chunk)
+            dt = time.perf_counter() - t0
+            ids = re.findall(r'class="collapse" data-parent="[^"]*" id="([^"]*)"',out)
+            naccs = out.count('class="accordion"')
+            accs = re.findall(r'class="accordion" id="([^"]*)"',out)
+            want = accordions(npairs,cats,args.chunk)
+            good = len(ids) == npairs and len(set(ids+accs)) == len(ids+accs) and naccs == want \
+                   and out.count('about the questions under this heading') == cats
+            ok = ok and good
+            stages = ', '.join('%s %.2f' % (st['name'],st['seconds']) for st in timer.stages if st['seconds'] > 0.05)
+            print('%d pairs, %s: %.2f s (%.2f ms per question; %s), %d cards in %d accordions%s' \
+                  % (npairs,'%s, chunks of %d' % ({0:'no headings',1:'a title'}.get(cats,'%d categories' % cats),\
+                     args.chunk),dt,1e3*dt/npairs,\
+                     stages,len(ids),naccs,'' if good else '  WRONG'))
+    if not ok:
+        sys.exit(1)
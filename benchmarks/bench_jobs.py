@@ -0,0 +1,54 @@
+import os, sys
+import time
+from argparse import ArgumentParser
+from concurrent.futures import ProcessPoolExecutor
+
+sys.path.insert(0,os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from profiling import StageTimer
+from make_export import make_export
+import parse_google_doc
+
+####
+# building the h2 sections in worker processes (--jobs N) against building them in the main
+# process, on synthetic guidelines exports: wall time of the whole conversion and of the
+# sections stage, and a check that the output is the same
+#
+# with a pool the main process still scans each section's links and serializes its elements
+# for the workers, which costs about as much as the serial section building minus card_body
+# and the link/table fixes, so the sections stage can't go much below that however many
+# workers there are (and on a machine with one core the pool only adds work)
+#
+# usage: python benchmarks/bench_jobs.py [--scales 1 10] [--jobs 2 4] [--nest-lis]
+####
+
+def run(text,nest,pool):
+    """
+    convert text; returns the output, the wall time and the time of the sections stage
+    """
+    timer = StageTimer()
+    t0 = time.perf_counter()
+    out = parse_google_doc.convert(text,nest=nest,pool=pool,timer=timer)
+    dt = time.perf_counter() - t0
+    return out,dt,[st['seconds'] for st in timer.stages if st['name'] == 'sections'][0]
+
+if __name__ == '__main__':
+    parser = ArgumentParser()
+    parser.add_argument('--scales',type=float,nargs='+',default=[1,10],help='document sizes, relative to the real ones')
+    parser.add_argument('--jobs',type=int,nargs='+',default=[2,4],help='numbers of worker processes to try')
+    parser.add_argument('--nest-lis',dest='nest',action='store_true',help='convert with --nest-lis')
+    args = parser.parse_args()
+
+    print('%d cpus' % os.cpu_count())
+    ok = True
+    for scale in args.scales:
+        text = make_export('guidelines',scale)
+        ref,dt,sect = run(text,args.nest,None)
+        print('guidelines x%g, serial: %.2f s (sections %.2f s)' % (scale,dt,sect))
+        for n in args.jobs:
+            with ProcessPoolExecutor(max_workers=n) as pool:
+                list(pool.map(abs,range(n)))  # start the workers before timing
+                out,dt,sect = run(text,args.nest,pool)
+            print('    --jobs %d: %.2f s (sections %.2f s)%s' % (n,dt,sect,'' if out == ref else '  OUTPUT DIFFERS'))
+            ok = ok and out == ref
+    if not ok:
+        sys.exit(1)
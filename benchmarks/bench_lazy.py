@@ -0,0 +1,88 @@
+import os, sys
+import re
+import time
+from argparse import ArgumentParser
+
+sys.path.insert(0,os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from minify import gzipped
+from lazy import dump_bundle
+from gdoc_utils import load_soup
+from make_export import make_export
+import parse_google_doc
+import parse_faq
+
+####
+# --lazy on synthetic exports of both kinds: the size of the page (plain and gzipped) with the
+# card bodies inline and with only placeholders, the size of the bundle of bodies, and the
+# conversion time. Checks that putting each body from the bundle in place of its placeholder
+# (what the page's script does as the cards are opened) gives back the all-inline page; the
+# guidelines export has sections repeated under several h1s, which the bundle has only once.
+# Also checks the script's fallback for pages without jquery: each button that toggles a card
+# has to lead it, through the id in its data-target, to the card's placeholder
+#
+# usage: python benchmarks/bench_lazy.py [--scales 1 10]
+####
+
+MODULES = {'guidelines':parse_google_doc,'faq':parse_faq}
+PLACEHOLDER = re.compile(r'<div class="card-body" data-lazy="([^"]*)"></div>')
+
+def fill(page,bundle):
+    """
+    the page with every placeholder swapped for its body, and the script taken out
+    """
+    page = PLACEHOLDER.sub(lambda m: bundle['bodies'][bundle['cards'][m.group(1)]],page)
+    return re.sub(r'<script>\(function\(\)\{var url=.*?</script>','',page)
+
+def unfilled(page,bundle):
+    """
+    the data-targets of the buttons in a --lazy page for which the click handler wouldn't find a
+    placeholder it can fill: it takes the first element with the target's id (as
+    getElementById does) and looks at its first child
+    """
+    soup = load_soup(page,'html5lib')
+    first = {}
+    for tag in soup.find_all(id=True):
+        first.setdefault(tag['id'],tag)
+    missed = []
+    for t in soup.find_all(attrs={'data-toggle':'collapse'}):
+        panel = first.get(t['data-target'][1:])
+        d = panel.find(True,recursive=False) if panel != None else None
+        if d == None or d.get('data-lazy') not in bundle['cards']:
+            missed.append(t['data-target'])
+    return missed
+
+def sizes(text):
+    """
+    (plain, gzipped) size of some text in kB
+    """
+    data = text.encode('utf-8')
+    return len(data)/1e3,len(gzipped(data))/1e3
+
+if __name__ == '__main__':
+    parser = ArgumentParser()
+    parser.add_argument('--scales',type=float,nargs='+',default=[1,10],help='document sizes, relative to the real ones')
+    args = parser.parse_args()
+
+    ok = True
+    for kind,module in MODULES.items():
+        for scale in args.scales:
+            text = make_export(kind,scale,same_shared=kind == 'guidelines')
+            t0 = time.perf_counter()
+            inline = module.convert(text)
+            dt_inline = time.perf_counter() - t0
+            lazy = {'url':'out.cards.json'}
+            t0 = time.perf_counter()
+            page = module.convert(text,lazy=lazy)
+            dt_lazy = time.perf_counter() - t0
+            bundle = dump_bundle(lazy['bundle'])
+            same = fill(page,lazy['bundle']) == inline
+            missed = unfilled(page,lazy['bundle'])
+            ok = ok and same and len(missed) == 0
+            print('%s x%g: inline %.1f kB (%.1f kB gz), %.2f s' % ((kind,scale)+sizes(inline)+(dt_inline,)))
+            print('    lazy: page %.1f kB (%.1f kB gz) + bundle %.1f kB (%.1f kB gz), %.2f s; %d cards, %d bodies; %s'\
+                  % (sizes(page)+sizes(bundle)+(dt_lazy,len(lazy['bundle']['cards']),len(lazy['bundle']['bodies']),\
+                     'fills in to the same page' if same else 'NOT THE SAME PAGE')))
+            print('    without jquery: %s' % ('every button finds its placeholder' if len(missed) == 0\
+                  else '%d BUTTONS FIND NO PLACEHOLDER, eg %s' % (len(missed),missed[:3])))
+    if not ok:
+        sys.exit(1)
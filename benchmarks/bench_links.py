@@ -0,0 +1,115 @@
+import os, sys
+import re
+import time
+from argparse import ArgumentParser
+
+sys.path.insert(0,os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from links import AnchorIndex
+from make_export import Export
+import parse_google_doc
+
+####
+# links between sections and documents: two synthetic guidelines-like exports where some of
+# the links go to headings in the same doc (#h.xxx), some to headings in the other one (through
+# google's redirect to docs.google.com) and a few to headings that don't exist. Indexes both,
+# converts both against the index (like batch_convert.py), and checks that every rewritten
+# link points at a card id that is in the page it names, and that only the missing headings
+# were reported as unresolved. Both exports also have a section with the same stock heading id
+# (google reuses ids like h.gjdgxs across docs): a #h. link to it has to open the card in its
+# own page, and a link from the other doc has to be reported (it can't tell which doc is meant)
+# rather than sent to the wrong card
+#
+# usage: python benchmarks/bench_links.py [--scale 1] [--xref 0.3]
+####
+
+PAGES = ['out_a.html','out_b.html']
+STOCK = 'h.gjdgxs'
+H2 = '<ol class="c2 lst-kix_h-0" start="1"><li class="c4 li-bullet-0"><h2'
+XLINK = 'https://www.google.com/url?q=https://docs.google.com/document/d/1seismicaDoc/edit%%23heading%%3D%s'\
+        '&amp;sa=D&amp;source=editors&amp;ust=1650000000000&amp;usg=AOvVaw0abc'
+
+def page_ids(out):
+    """
+    the ids in an output page
+    """
+    return set(re.findall(r' id="([^"]*)"',out))
+
+def with_stock(text,title,links):
+    """
+    an export with a section headed title, with the heading id STOCK, put in before its second
+    h2 section; links are the hrefs of links to put in it
+    """
+    k = text.index(H2,text.index(H2)+1)
+    sect = '%s id="%s" style="display:inline"><span>%s</span></h2></li></ol><p>%s</p>' \
+           % (H2,STOCK,title,' '.join('<a href="%s">link %d</a>' % (h,j) for j,h in enumerate(links)))
+    return text[:k] + sect + text[k:]
+
+if __name__ == '__main__':
+    parser = ArgumentParser()
+    parser.add_argument('--scale',type=float,default=1,help='document size, relative to the real one')
+    parser.add_argument('--xref',type=float,default=0.3,help='fraction of links that go to headings')
+    args = parser.parse_args()
+
+    exa = Export(seed=0,xref=args.xref)
+    texta = exa.guidelines(args.scale)
+    textb = Export(seed=1,xref=args.xref,other=exa.h2ids,idbase=10**6).guidelines(args.scale)
+    texta = with_stock(texta,'Welcome to A',['#%s' % STOCK])
+    textb = with_stock(textb,'Welcome to B',['#%s' % STOCK,XLINK % STOCK])
+
+    index = AnchorIndex()
+    t0 = time.perf_counter()
+    for page,text in zip(PAGES,[texta,textb]):
+        index.add(page,parse_google_doc.index_text(text))
+    print('index: %d anchors in %.3f s' % (sum(len(a) for a in index.anchors.values()),time.perf_counter()-t0))
+
+    outs = {}; unresolved = []
+    for page,text in zip(PAGES,[texta,textb]):
+        t0 = time.perf_counter()
+        outs[page] = parse_google_doc.convert(text,index=index,page=page,unresolved=unresolved)
+        print('%s: %.3f s' % (page,time.perf_counter()-t0))
+
+    ok = True
+    counts = {'card':0,'other page':0}
+    missing = set(u['href'] for u in unresolved)
+    ids = {page:page_ids(out) for page,out in outs.items()}
+    for page,out in outs.items():
+        for href in re.findall(r'<a [^>]*href="([^"]*)"',out):
+            if href in missing:
+                continue
+            if href.startswith('#') and not href.startswith('#ftnt'):
+                target = (page,href[1:]); counts['card'] += 1
+            elif href.split('#')[0] in PAGES:
+                target = tuple(href.split('#')); counts['other page'] += 1
+            else:
+                continue
+            if target[1] not in ids[target[0]]:
+                print('%s: link to %s goes nowhere' % (page,href))
+                ok = False
+        toggles = len(re.findall(r'<a [^>]*data-toggle="collapse"',out))
+        if toggles != len([h for h in re.findall(r'<a [^>]*href="(#[^"]*)"',out) if h not in missing \
+                           and not h.startswith('#ftnt')]):
+            print('%s: not every link to a card opens it' % page)
+            ok = False
+    print('links to cards on the same page: %d, to the other page: %d, unresolved: %d' \
+          % (counts['card'],counts['other page'],len(unresolved)))
+    wrong = [u for u in unresolved if 'missing' not in u['href'] and u['href'] != XLINK.replace('&amp;','&') % STOCK]
+    if len(wrong) > 0:
+        print('%d links reported as unresolved that should have resolved, eg %s' % (len(wrong),wrong[0]['href']))
+        ok = False
+
+    # the stock heading id: each page's own link opens its own card, the one between docs is reported
+    for page,title in zip(PAGES,['welcome-to-a','welcome-to-b']):
+        if not re.search(r'<a data-target="#%s" data-toggle="collapse" href="#%s">link 0</a>' % (title,title),outs[page]):
+            print('%s: the link to %s in its own doc does not open its own card' % (page,STOCK))
+            ok = False
+    ambiguous = [u for u in unresolved if u['href'] == XLINK.replace('&amp;','&') % STOCK]
+    xhref = re.search(r'<a [^>]*href="([^"]*)"[^>]*>link 1</a>',outs['out_b.html']).group(1)
+    if len(ambiguous) != 1 or not xhref.startswith('https://docs.google.com/'):
+        print('the link to %s in the other doc was not reported' % STOCK)
+        ok = False
+    else:
+        print('stock heading id %s: links in each doc open their own card; the one between docs: %s' \
+              % (STOCK,ambiguous[0]['problem']))
+    if not ok:
+        sys.exit(1)
+    print('all links resolved to cards that exist')
@@ -0,0 +1,110 @@
+import os, sys
+import time
+import random
+from itertools import accumulate
+from argparse import ArgumentParser
+
+sys.path.insert(0,os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from gdoc_utils import load_soup
+from parse_google_doc import card_body
+from outline import lone_section
+
+####
+# time the <ol> repair in card_body on one h2 section with a long, fragmented numbered list
+# (sub-lists and paragraphs between the chunks, like in the policies), against the old version
+# that recomputed every <ol>'s start and length after each fix, and check the output is the same
+#
+# usage: python benchmarks/bench_lists.py [--chunks 1000]
+####
+
+def fragmented_section(nchunks=1000,seed=0):
+    """
+    an h2 section whose numbered list google has split into nchunks pieces, with sub-lists,
+    bullet lists and paragraphs in between
+    """
+    rng = random.Random(seed)
+    out = ['<ol start="1"><li><h2>section</h2></li></ol>']
+    start = 1
+    for c in range(nchunks):
+        n = rng.randrange(1,4)
+        out.append('<ol start="%d">%s</ol>' % (start,'<li>item</li>'*n))
+        start += n
+        r = rng.random()
+        if r < 0.4:
+            out.append('<ol start="1">%s</ol>' % ('<li>sub</li>'*rng.randrange(1,3)))
+        elif r < 0.6:
+            out.append('<ul><li>bullet</li></ul>')
+        elif r < 0.9:
+            out.append('<p>paragraph %d</p>' % c)
+    out.append('<ol start="%d"><li>last</li></ol>' % start)
+    return '<html><body>%s</body></html>' % ''.join(out)
+
+def _ol_info_old(idivtext):
+    ols = idivtext.find_all('ol',recursive=False)
+    lis = [len(ol.find_all('li',recursive=False)) for ol in ols]
+    sts = [int(ol.attrs['start']) for ol in ols]
+    return ols, sts, lis
+
+def _whose_old(sts,lis):
+    return [n + 1 == s for n,s in zip(list(accumulate(lis))[:-1],sts[1:])]
+
+def nest_in_between_old(idivtext):
+    ols = idivtext.find_all('ol',recursive=False)
+    for io in range(len(ols)-1):
+        if ols[io].next_sibling.name != 'ol':
+            for g in ols[io].next_siblings:
+                if g == ols[io+1]:
+                    break
+                ols[io].append(g.extract())
+    return idivtext
+
+def repair_old(idivtext):
+    """
+    the old <ol> repair: fix the first mis-nested <ol>, then recompute everything, until done
+    """
+    ol_list,sts,lis = _ol_info_old(idivtext)
+    whose = _whose_old(sts,lis)
+    while not all(whose):
+        olstart = ol_list[whose.index(False)]
+        iadd = True
+        while iadd:
+            toadd = olstart.next_sibling.extract()
+            if toadd.name == 'ol':
+                iadd = False
+            olstart.append(toadd)
+        ol_list,sts,lis = _ol_info_old(idivtext)
+        whose = _whose_old(sts,lis)
+    return nest_in_between_old(idivtext)
+
+if __name__ == '__main__':
+    parser = ArgumentParser()
+    parser.add_argument('--chunks',type=int,default=1000,help='number of pieces the list is split into')
+    args = parser.parse_args()
+
+    text = fragmented_section(args.chunks)
+
+    soup = load_soup(text)
+    ingredients = soup.body.find_all(recursive=False)
+    t0 = time.perf_counter()
+    new = str(card_body(soup,ingredients,lone_section(ingredients)))
+    print('%-8s %8.3f s  (%d top-level elements)' % ('sweep',time.perf_counter()-t0,len(ingredients)))
+
+    # the old card_body, minus the repair, is just moving things in: do that, then time the repair
+    soup = load_soup(text)
+    ingredients = soup.body.find_all(recursive=False)
+    idivtext = soup.new_tag('div'); idivtext.attrs['class'] = 'card-body'
+    for k in range(1,len(ingredients)):
+        ing = ingredients[k]
+        if ing.name == 'ul' and ingredients[k-1].name == 'ol':
+            idivtext.find_all('ol')[-1].append(ing.extract())
+        else:
+            idivtext.append(ing)
+    idivtext.find('ol').attrs['start'] = '1'
+    t0 = time.perf_counter()
+    old = str(repair_old(idivtext))
+    print('%-8s %8.3f s' % ('old',time.perf_counter()-t0))
+
+    if new != old:
+        print('outputs differ!')
+        sys.exit(1)
+    print('outputs identical')
@@ -0,0 +1,68 @@
+import os, sys
+import re
+import time
+import random
+from argparse import ArgumentParser
+
+sys.path.insert(0,os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from minify import minify, same_dom, gzipped
+from make_export import make_export
+import parse_google_doc
+import parse_faq
+
+####
+# --minify on synthetic exports of both kinds: how long minifying takes, the page size before
+# and after (plain and gzipped), and that the minified page is the same document (same_dom)
+#
+# the converted pages have next to no whitespace between tags, so --messy also checks copies
+# with whitespace runs (spaces, tabs, newlines, &nbsp;) sprinkled between tags and in the text,
+# plus a <pre>, a <textarea> and a <script> whose whitespace has to come through untouched
+#
+# usage: python benchmarks/bench_minify.py [--scales 1 10] [--messy 5]
+####
+
+MODULES = {'guidelines':parse_google_doc,'faq':parse_faq}
+KEEP = '<pre>  two  spaces\n\tand a tab</pre><textarea>  as\n typed </textarea>'\
+       '<script>var s = "a  b";  if (1 < 2) {}</script>'
+
+def messy(out,seed):
+    """
+    a copy of a page with extra whitespace between tags and in the text, and some elements that
+    keep theirs
+    """
+    rng = random.Random(seed)
+    def ws(m):
+        return m.group(0) + rng.choice(['',' ','  ','\n','\n  ','\t',' \xa0 '])
+    out = re.sub(r'>(?=[<\w])',ws,out)
+    out = re.sub(r' (?=\w)',lambda m: rng.choice([' ','   ',' \n ']),out)
+    return out.replace('<body>','<body>'+KEEP,1)
+
+if __name__ == '__main__':
+    parser = ArgumentParser()
+    parser.add_argument('--scales',type=float,nargs='+',default=[1,10],help='document sizes, relative to the real ones')
+    parser.add_argument('--messy',type=int,default=5,help='number of whitespace-sprinkled copies to check per page')
+    args = parser.parse_args()
+
+    ok = True
+    for kind,module in MODULES.items():
+        for scale in args.scales:
+            out = module.convert(make_export(kind,scale))
+            t0 = time.perf_counter()
+            small = minify(out)
+            dt = time.perf_counter() - t0
+            same = same_dom(out,small)
+            ok = ok and same
+            full,gz,sgz = len(out.encode()),len(gzipped(out.encode())),len(gzipped(small.encode()))
+            print('%s x%g: %.3f s; %.1f kB -> %.1f kB (%.0f%% smaller), gzipped %.1f kB -> %.1f kB; %s'\
+                  % (kind,scale,dt,full/1e3,len(small.encode())/1e3,100.*(full-len(small.encode()))/full,\
+                     gz/1e3,sgz/1e3,'same document' if same else 'DIFFERENT DOCUMENT'))
+            for k in range(args.messy):
+                page = messy(out,k)
+                small = minify(page)
+                if not same_dom(page,small) or KEEP not in small:
+                    print('    messy copy %d: minified page is not the same document' % k)
+                    ok = False
+            if args.messy > 0:
+                print('    %d messy copies: %.1f kB -> %.1f kB' % (args.messy,len(page)/1e3,len(small)/1e3))
+    if not ok:
+        sys.exit(1)
@@ -0,0 +1,118 @@
+import os, sys
+import re
+import time
+from argparse import ArgumentParser
+
+sys.path.insert(0,os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from gdoc_utils import load_soup, strip_comments
+from outline import Outline
+from make_export import make_export
+import parse_google_doc
+
+####
+# outlining a guidelines export (outline.Outline: the h1s, the h2 sections under each, their
+# slugs/ids and what's in them) against the old get_h1_h2, which searched every element for
+# an h1 and then an h2, and then picked each h1's h2s out of the whole list of them, on
+# synthetic exports with thousands of headings. Checks that both find the same sections with
+# the same slugs, and that the card ids in the converted page are unique, with and without
+# --nest-h3 (on an export where some sections have h3s), that search results there name an h2
+# card (the one that opens), and that empty headings (which cleaning takes out) don't change
+# the page
+#
+# usage: python benchmarks/bench_outline.py [--scales 10 100] [--repeat 3]
+####
+
+def get_h1_h2_old(ingredients):
+    """
+    the old get_h1_h2, and the h2 spans under each h1 the way convert worked them out
+    """
+    hdr1 = []; hdr2 = []
+    hdr1_text = []; hdr2_text = []
+    for i,ing in enumerate(ingredients):
+        if bool(ing.h1) or ing.name == 'h1':
+            hdr1.append(i)
+            gettext = ing.text.strip().lower()
+            gettext = re.sub(r'[^\w\s]','',gettext)
+            hdr1_text.append(gettext.replace(' ','-'))
+        elif bool(ing.h2):
+            hdr2.append(i)
+            gettext = ing.text.strip().lower()
+            gettext = re.sub(r'[^\w\s]','',gettext)
+            hdr2_text.append(gettext.replace(' ','-'))
+    hdr1.append(len(ingredients))
+    spans = []
+    for i in range(len(hdr1)-1):
+        inside = [k for k in range(len(hdr2)) if hdr1[i] < hdr2[k] < hdr1[i+1]]
+        bounds = [hdr2[k] for k in inside] + [hdr1[i+1]]
+        spans.append([(bounds[j],bounds[j+1],hdr2_text[k]) for j,k in enumerate(inside)])
+    return hdr1_text,spans
+
+def best(f,repeat):
+    """
+    best time of repeat calls to f, and what it returned
+    """
+    dt = None
+    for k in range(repeat):
+        t0 = time.perf_counter()
+        out = f()
+        t = time.perf_counter() - t0
+        dt = t if dt == None else min(dt,t)
+    return dt,out
+
+def unique_ids(page):
+    """
+    whether every id in a converted page (cards, their headers, accordions, and anything in
+    the bodies) is different
+    """
+    ids = re.findall(r'\bid="([^"]*)"',page)
+    return len(ids) == len(set(ids))
+
+if __name__ == '__main__':
+    parser = ArgumentParser()
+    parser.add_argument('--scales',type=float,nargs='+',default=[10,100],help='document sizes, relative to the real ones')
+    parser.add_argument('--repeat',type=int,default=3,help='runs to time (the best is shown)')
+    args = parser.parse_args()
+
+    ok = True
+    for scale in args.scales:
+        soup = load_soup(make_export('guidelines',scale))
+        soup.head.extract()
+        ingredients = strip_comments(soup).body.find_all(recursive=False)
+        dt_old,(h1text,spans) = best(lambda: get_h1_h2_old(ingredients),args.repeat)
+        dt_new,outline = best(lambda: Outline(ingredients),args.repeat)
+        new = [[(s.start,s.end,s.slug) for s in h1.children] for h1 in outline.h1s]
+        same = new == spans and [h1.slug for h1 in outline.h1s] == h1text
+        ok = ok and same
+        print('guidelines x%g: %d elements, %d h2s: get_h1_h2 %.3f s, Outline %.3f s; %s'\
+              % (scale,len(ingredients),len(outline.sections()),dt_old,dt_new,'same sections' if same else 'DIFFERENT SECTIONS'))
+
+    # ids in whole pages, and nested accordions for h3s
+    text = make_export('guidelines',2,h3=0.4)
+    for nest_h3 in (False,True):
+        search = {'url':'out.search.json'}
+        page = parse_google_doc.convert(text,nest_h3=nest_h3,search=search)
+        good = unique_ids(page)
+        # search results open the card they name: it has to be an h2 card, not one inside it
+        parents = dict((c,p) for p,c in re.findall(r'class="collapse" data-parent="#acc_([^"]*)" id="([^"]*)"',page))
+        tops = set(c for c,p in parents.items() if p not in parents)
+        hits = all(doc[0] in tops for doc in search['index']['docs'])
+        ok = ok and good and hits
+        print('guidelines x2 with h3s%s: %d cards, %d accordions, %s, %s' % (', --nest-h3' if nest_h3 else '',\
+              page.count('class="card"'),page.count('class="accordion"'),'ids unique' if good else 'REPEATED IDS',\
+              'search hits on h2 cards' if hits else 'SEARCH HITS ON NESTED CARDS'))
+
+    # blank heading-styled lines (google exports an empty <h1>/<h2> for those): cleaning takes
+    # them out, so the page has to come out as if they weren't there
+    text = make_export('guidelines',1)
+    blanks = text
+    for tag in ('h2','h1','h2'):
+        k = blanks.index('<p class="c3">',len(blanks)//3 if tag == 'h1' else blanks.index('<h2'))
+        blanks = blanks[:k] + '<%s class="c7"><span class="c3"></span></%s>' % (tag,tag) + blanks[k:]
+    try:
+        good = parse_google_doc.convert(blanks) == parse_google_doc.convert(text)
+    except ValueError:  # (a heading went missing in outline.locate)
+        good = False
+    ok = ok and good
+    print('guidelines x1 with empty h1/h2s: %s' % ('same page as without them' if good else 'NOT THE SAME PAGE'))
+    if not ok:
+        sys.exit(1)
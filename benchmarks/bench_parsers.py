@@ -0,0 +1,61 @@
+import os, sys
+import time
+import tracemalloc
+from argparse import ArgumentParser
+
+sys.path.insert(0,os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from gdoc_utils import available_parsers, load_soup, read_export
+import parse_google_doc
+import parse_faq
+
+####
+# parse the same google export with each installed bs4 backend and report wall time and
+# peak (python) memory, then check that the converted output is identical for every backend
+# (which covers the <ol> repair in parse_google_doc and the Q/A detection in parse_faq)
+#
+# usage: python benchmarks/bench_parsers.py -f combined_doc.html [--faq] [-n 3]
+####
+
+def time_parse(text,parser,repeat=3):
+    """
+    best-of-repeat wall time and tracemalloc peak for parsing text with one backend
+    """
+    best = None
+    for r in range(repeat):
+        t0 = time.perf_counter()
+        soup = load_soup(text,parser=parser)
+        dt = time.perf_counter() - t0
+        if best == None or dt < best: best = dt
+        del soup
+    tracemalloc.start()
+    soup = load_soup(text,parser=parser)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return best, peak, len(soup.find_all(True))
+
+if __name__ == '__main__':
+    parser = ArgumentParser()
+    parser.add_argument('--ifile','-f',metavar='ifile',type=str,required=True,help='path to input file')
+    parser.add_argument('--faq',action='store_true',help='input is the faq (use parse_faq)')
+    parser.add_argument('--repeat','-n',type=int,default=3,help='number of timed parses per backend')
+    args = parser.parse_args()
+
+    text = read_export(args.ifile)  # (as the scripts read it: utf-8, or the .html in google's .zip)
+    module = parse_faq if args.faq else parse_google_doc
+
+    print('%-12s %10s %12s %8s %10s' % ('parser','parse [s]','peak [MB]','tags','total [s]'))
+    outputs = {}
+    for p in available_parsers():
+        dt, peak, ntags = time_parse(text,p,repeat=args.repeat)
+        t0 = time.perf_counter()
+        outputs[p] = module.convert(text,parser=p)
+        total = time.perf_counter() - t0
+        print('%-12s %10.3f %12.1f %8d %10.3f' % (p,dt,peak/1e6,ntags,total))
+
+    # the output has to be the same whichever backend we used
+    ref = outputs['html.parser']
+    bad = [p for p in outputs.keys() if outputs[p] != ref]
+    if len(bad) > 0:
+        print('output differs from html.parser for: %s' % ', '.join(bad))
+        sys.exit(1)
+    print('output identical for: %s' % ', '.join(outputs.keys()))
@@ -0,0 +1,86 @@
+import os, sys
+import re
+import time
+import zipfile
+import tempfile
+import tracemalloc
+from argparse import ArgumentParser
+
+sys.path.insert(0,os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from gdoc_utils import read_export
+from minify import same_dom
+from make_export import make_export
+import parse_google_doc
+import parse_faq
+
+####
+# reading exports (gdoc_utils.read_export) on a synthetic guidelines export: time and peak
+# memory (tracemalloc; the mapped file itself isn't counted, since it's the os's page cache)
+# for the memory-mapped .html, the same file read with a plain open().read(), and the .zip
+# google gives you. Checks that all three give the same text, and that copies of exports of
+# both kinds with line breaks between the elements are read whole and convert to the same
+# documents (the scripts used to read only the first line)
+#
+# usage: python benchmarks/bench_read.py [--scales 1 10 30] [--repeat 3]
+####
+
+def plain_read(path):
+    """
+    the file's text with a plain read, for comparison
+    """
+    f = open(path,'r',encoding='utf-8')
+    text = f.read()
+    f.close()
+    return text
+
+def measure(read,path,repeat):
+    """
+    best time and peak memory (bytes) to read a file
+    """
+    best = None
+    for k in range(repeat):
+        t0 = time.perf_counter()
+        text = read(path)
+        dt = time.perf_counter() - t0
+        best = dt if best == None else min(best,dt)
+        del text
+    tracemalloc.start()
+    text = read(path)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return best,peak,text
+
+if __name__ == '__main__':
+    parser = ArgumentParser()
+    parser.add_argument('--scales',type=float,nargs='+',default=[1,10,30],help='document sizes, relative to the real ones')
+    parser.add_argument('--repeat',type=int,default=3,help='reads to time (the best is shown)')
+    args = parser.parse_args()
+
+    ok = True
+    tmp = tempfile.mkdtemp()
+    html = os.path.join(tmp,'export.html'); zipped = os.path.join(tmp,'export.zip')
+    for scale in args.scales:
+        text = make_export('guidelines',scale)
+        f = open(html,'w',encoding='utf-8'); f.write(text); f.close()
+        z = zipfile.ZipFile(zipped,'w',compression=zipfile.ZIP_DEFLATED)
+        z.write(html,'export.html'); z.close()
+        print('guidelines x%g: %.1f kB (%.1f kB zipped)' % (scale,os.path.getsize(html)/1e3,os.path.getsize(zipped)/1e3))
+        for name,read,path in [('read()',plain_read,html),('mmap',read_export,html),('zip',read_export,zipped)]:
+            dt,peak,got = measure(read,path,args.repeat)
+            print('    %-8s %.4f s  %6.1f MB peak  (%.1f MB of text)' % (name,dt,peak/1e6,sys.getsizeof(got)/1e6))
+            if got != text:
+                print('    %s: not the same text' % name)
+                ok = False
+
+    # line breaks between the elements, like a hand-edited or re-saved export
+    for kind,module in [('guidelines',parse_google_doc),('faq',parse_faq)]:
+        text = make_export(kind,1)
+        broken = re.sub(r'(</(?:style|head|p|h1|h2|ol|ul|table|div)>)',r'\1\n',text)
+        f = open(html,'w',encoding='utf-8'); f.write(broken); f.close()
+        got = read_export(html)
+        same = got == broken and same_dom(module.convert(text),module.convert(got))
+        print('%s export with %d line breaks: %s' % (kind,broken.count('\n'),'read whole, same document' if same else 'NOT THE SAME'))
+        ok = ok and same
+    os.remove(html); os.remove(zipped); os.rmdir(tmp)
+    if not ok:
+        sys.exit(1)
@@ -0,0 +1,88 @@
+import os, sys
+import gzip
+import time
+import random
+from argparse import ArgumentParser
+
+sys.path.insert(0,os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from search import dump_index, query
+from gdoc_utils import load_soup
+from profiling import StageTimer
+from make_export import make_export
+import parse_google_doc
+import parse_faq
+
+####
+# the search index (--search) on synthetic exports of both kinds: time to build it (the
+# 'search' stage), its size as json and gzipped next to the page's, and how long queries take
+# (search.py's query, which does the same as search.js), for one- and two-word queries made
+# from words that are in the document, the last one cut short like while typing. Checks that
+# every card in the index is one search.js can open: the first element with its id (what
+# getElementById finds) has to be a card's collapse div, on guidelines pages with and without
+# --nest-h3 as well as FAQ pages
+#
+# usage: python benchmarks/bench_search.py [--scales 1 10] [--queries 200]
+####
+
+MODULES = {'guidelines':parse_google_doc,'faq':parse_faq}
+
+def make_queries(index,n,seed=0):
+    """
+    n queries of one or two indexed words, the last one a prefix
+    """
+    rng = random.Random(seed)
+    terms = sorted(index['terms'].keys())
+    qs = []
+    for k in range(n):
+        words = [rng.choice(terms) for i in range(rng.randrange(1,3))]
+        words[-1] = words[-1][:max(2,len(words[-1])-rng.randrange(3))]
+        qs.append(' '.join(words))
+    return qs
+
+def unopened(page,index):
+    """
+    the card ids in the index that don't name a collapse div in the page, going by the first
+    element with each id the way the browser does
+    """
+    first = {}
+    for tag in load_soup(page,'html5lib').find_all(id=True):
+        first.setdefault(tag['id'],tag)
+    return [doc[0] for doc in index['docs'] if doc[0] not in first or first[doc[0]].name != 'div'\
+            or 'collapse' not in first[doc[0]].get('class',[])]
+
+if __name__ == '__main__':
+    parser = ArgumentParser()
+    parser.add_argument('--scales',type=float,nargs='+',default=[1,10],help='document sizes, relative to the real ones')
+    parser.add_argument('--queries',type=int,default=200,help='number of queries to time')
+    args = parser.parse_args()
+
+    ok = True
+    for kind,module in MODULES.items():
+        for scale in args.scales:
+            text = make_export(kind,scale)
+            search = {}; timer = StageTimer()
+            out = module.convert(text,search=search,timer=timer)
+            build = [st['seconds'] for st in timer.stages if st['name'] == 'search'][0]
+            index = search['index']
+            js = dump_index(index).encode()
+            page = out.encode()
+            qs = make_queries(index,args.queries)
+            t0 = time.perf_counter()
+            hits = sum(len(query(index,q)) for q in qs)
+            qtime = (time.perf_counter() - t0)/len(qs)
+            print('%s x%g: %d cards, %d terms; index %.3f s, %.1f kB (%.1f kB gz) vs page %.1f kB (%.1f kB gz);'\
+                  ' %.2f ms/query, %.1f hits' % (kind,scale,len(index['docs']),len(index['terms']),build,\
+                  len(js)/1e3,len(gzip.compress(js))/1e3,len(page)/1e3,len(gzip.compress(page))/1e3,\
+                  qtime*1e3,hits/len(qs)))
+
+    # clicking a result opens its card
+    for kind,module,options in (('guidelines',parse_google_doc,{}),('guidelines',parse_google_doc,{'nest_h3':True}),\
+                                ('faq',parse_faq,{})):
+        search = {}
+        page = module.convert(make_export(kind,1,h3=0.4),search=search,**options)
+        missed = unopened(page,search['index'])
+        ok = ok and len(missed) == 0
+        print('%s%s: %s' % (kind,', --nest-h3' if options else '','every hit opens its card' if len(missed) == 0\
+              else '%d HITS OPEN NOTHING, eg %s' % (len(missed),missed[:3])))
+    if not ok:
+        sys.exit(1)
@@ -0,0 +1,163 @@
+import os, sys
+import io
+import signal
+import time
+import json
+import zipfile
+import threading
+from argparse import ArgumentParser
+from urllib.error import HTTPError
+from urllib.request import urlopen
+
+sys.path.insert(0,os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from service import ConversionService, make_server, convert_text, request_conversion
+from make_export import make_export
+
+####
+# the conversion service (service.py) on localhost, with client threads sending synthetic
+# exports of both kinds: latency of the first request for each (converted in the pool) and of
+# the repeats (from the cache), and the metrics the service reports. Checks that
+#   - every page that comes back is the one convert_text gives for that export and options,
+#     cold, cached, and for a .zip of the export
+#   - the cache hit rate is what the mix of requests says it should be
+#   - bad options get a 400, and a service with a full queue says 503 rather than queueing
+#   - after its worker is killed while it's idle, the service starts a new one and carries on
+#
+# usage: python benchmarks/bench_service.py [--scales 1 3] [--clients 4] [--repeat 5] [--jobs 2]
+####
+
+def percentile(values,p):
+    """
+    the p-th percentile (0-1) of a list of numbers
+    """
+    values = sorted(values)
+    return values[min(len(values)-1,int(p*len(values)))]
+
+def zipped(text):
+    """
+    an export as google's .zip of it
+    """
+    buf = io.BytesIO()
+    with zipfile.ZipFile(buf,'w') as z:
+        z.writestr('export.html',text)
+    return buf.getvalue()
+
+def status_of(f):
+    """
+    the http status of what f() asks the service for (200 if it doesn't raise)
+    """
+    try:
+        f()
+        return 200
+    except HTTPError as e:
+        return e.code
+
+if __name__ == '__main__':
+    parser = ArgumentParser()
+    parser.add_argument('--scales',type=float,nargs='+',default=[1,3],help='document sizes, relative to the real ones')
+    parser.add_argument('--clients',type=int,default=4,help='client threads sending requests at once')
+    parser.add_argument('--repeat',type=int,default=5,help='times each client asks for each page')
+    parser.add_argument('--jobs','-j',type=int,default=2,help='worker processes in the service')
+    args = parser.parse_args()
+
+    # the requests: each export with a couple of option sets
+    requests = []
+    for scale in args.scales:
+        for kind in ('guidelines','faq'):
+            text = make_export(kind,scale)
+            requests.append((text,kind,{}))
+            requests.append((text,kind,{'minify':True}))
+    want = [convert_text(text,kind,options) for text,kind,options in requests]
+
+    service = ConversionService(workers=args.jobs)
+    service.warm()
+    server = make_server(service,port=0)
+    url = 'http://%s:%d' % server.server_address[:2]
+    threading.Thread(target=server.serve_forever,daemon=True).start()
+
+    ok = True
+    cold = []; warm = []; wrong = []
+    lock = threading.Lock()
+    def client(k):
+        for r in range(args.repeat):
+            for j,(text,kind,options) in enumerate(requests):
+                t0 = time.perf_counter()
+                out = request_conversion(text,url,kind=kind,**options)
+                dt = time.perf_counter() - t0
+                with lock:
+                    (cold if r == 0 else warm).append(dt)
+                    if out != want[j]:
+                        wrong.append((j,r))
+    t0 = time.perf_counter()
+    threads = [threading.Thread(target=client,args=(k,)) for k in range(args.clients)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    wall = time.perf_counter() - t0
+    nreq = args.clients*args.repeat*len(requests)
+    print('%d requests (%d pages, %d clients, %d workers) in %.2f s: %.1f requests/s' \
+          % (nreq,len(requests),args.clients,args.jobs,wall,nreq/wall))
+    print('    first round: p50 %.1f ms, p90 %.1f ms; repeats: p50 %.1f ms, p90 %.1f ms' \
+          % (1e3*percentile(cold,.5),1e3*percentile(cold,.9),1e3*percentile(warm,.5),1e3*percentile(warm,.9)))
+
+    # a .zip of an export gives the same page (from the cache, since it's the same export)
+    zip_same = request_conversion(zipped(requests[0][0]),url,kind=requests[0][1]) == want[0]
+    with urlopen(url+'/metrics.json') as resp:
+        snap = json.load(resp)
+    with urlopen(url+'/metrics') as resp:
+        text = resp.read().decode('utf-8')
+    cache = snap['cache']
+    misses_ok = cache['miss'] == len(requests)
+    print('    cache: %d hits, %d shared, %d misses (hit rate %.3f), %d pages in it; queue depth at most %d' \
+          % (cache['hit'],cache['shared'],cache['miss'],cache['hit_rate'],cache['entries'],snap['queue']['max_depth']))
+    print('    prometheus text: %d lines, e.g. %s' % (len(text.splitlines()),\
+          [l for l in text.splitlines() if l.startswith('convert_cache_hit_ratio')][0]))
+    ok = ok and len(wrong) == 0 and zip_same and misses_ok and snap['queue']['depth'] == 0
+    print('    %s; %s; %s' % ('every page right' if len(wrong) == 0 else 'WRONG PAGES: %s' % wrong[:5],\
+          '.zip gives the same page' if zip_same else '.zip GIVES A DIFFERENT PAGE',\
+          'one conversion per page' if misses_ok else 'PAGES CONVERTED MORE THAN ONCE'))
+
+    # bad options, and a service that's full
+    bad = [status_of(lambda: request_conversion(requests[0][0],url,kind='guidelines',chunk=10)),\
+           status_of(lambda: request_conversion(requests[0][0],url,kind='nope')),\
+           status_of(lambda: request_conversion(requests[0][0],url,kind='guidelines',parser='nope'))]
+    server.shutdown(); server.server_close(); service.close()
+
+    service = ConversionService(workers=1,max_pending=1)
+    service.warm()
+    server = make_server(service,port=0)
+    url = 'http://%s:%d' % server.server_address[:2]
+    threading.Thread(target=server.serve_forever,daemon=True).start()
+    text = make_export('guidelines',max(args.scales))
+    statuses = []
+    def busy(k):
+        s = status_of(lambda: request_conversion(text.replace('</body>','<p>%d</p></body>' % k),url,kind='guidelines'))
+        with lock:
+            statuses.append(s)
+    threads = [threading.Thread(target=busy,args=(k,)) for k in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    server.shutdown(); server.server_close(); service.close()
+    rejects_ok = bad == [400,400,400] and statuses.count(200) >= 1 and statuses.count(503) >= 1
+    ok = ok and rejects_ok
+    print('    bad options: %s; 4 at once with room for 1: %s; %s' % (bad,sorted(statuses),\
+          'rejected as they should be' if rejects_ok else 'NOT REJECTED AS THEY SHOULD BE'))
+
+    # a worker that dies between requests (killed, out of memory)
+    service = ConversionService(workers=1)
+    service.warm()
+    for proc in list(service.pool._processes.values()):
+        os.kill(proc.pid,signal.SIGKILL)
+    time.sleep(0.5)
+    try:
+        recovered = service.convert(requests[0][0],requests[0][1])[0] == want[0]
+    except Exception:
+        recovered = False
+    service.close()
+    ok = ok and recovered
+    print('    worker killed while idle: %s' % ('new pool, page right' if recovered else 'NOT RECOVERED'))
+    if not ok:
+        sys.exit(1)
@@ -0,0 +1,70 @@
+import os, sys
+import time
+import tracemalloc
+from argparse import ArgumentParser
+
+sys.path.insert(0,os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from gdoc_utils import load_soup
+from make_export import make_export
+import parse_google_doc
+
+####
+# sections that appear under several h1s (the shared ones in make_export, with --same-shared
+# contents) with parse_google_doc's two options for them: shared='copy' (the html repeated) and
+# shared='ref' (written once, repeats filled in by a script in the page). Reports time, peak
+# memory and page size for each, and checks that doing what the script does to the 'ref'
+# page gives the same document as the 'copy' one
+#
+# usage: python benchmarks/bench_shared.py [--scales 1 10]
+####
+
+def run(text,shared):
+    """
+    best of two wall times, tracemalloc peak and output for one conversion
+    """
+    best = None
+    for r in range(2):
+        t0 = time.perf_counter()
+        out = parse_google_doc.convert(text,shared=shared)
+        dt = time.perf_counter() - t0
+        if best == None or dt < best: best = dt
+    tracemalloc.start()
+    parse_google_doc.convert(text,shared=shared)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return best, peak, out
+
+def fill_refs(page):
+    """
+    a 'ref' page after the script in it has run (as html, without the script and the labels)
+    """
+    soup = load_soup(page)
+    for d in soup.select('.card-body[data-same-as]'):
+        src = soup.select_one('.card-body[data-shared="%s"]' % d.attrs['data-same-as'])
+        for c in src.contents:
+            d.append(c.__copy__())
+        del d.attrs['data-same-as']
+    for d in soup.select('.card-body[data-shared]'):
+        del d.attrs['data-shared']
+    soup.body.find_all('script')[-1].decompose()
+    return str(soup)
+
+if __name__ == '__main__':
+    parser = ArgumentParser()
+    parser.add_argument('--scales',type=float,nargs='+',default=[1,10],help='document sizes, relative to the real one')
+    args = parser.parse_args()
+
+    ok = True
+    for scale in args.scales:
+        text = make_export('guidelines',scale,same_shared=True)
+        print('x%g (%.1f kB in)' % (scale,len(text)/1e3))
+        outs = {}
+        for shared in ['copy','ref']:
+            dt,peak,outs[shared] = run(text,shared)
+            print('    %-5s %8.3f s %8.1f MB peak %9.1f kB out' % (shared,dt,peak/1e6,len(outs[shared].encode())/1e3))
+        if fill_refs(outs['ref']) != str(load_soup(outs['copy'])):
+            print('    filled-in ref page differs from copy page!')
+            ok = False
+    if not ok:
+        sys.exit(1)
+    print('ref pages match copy pages once filled in')
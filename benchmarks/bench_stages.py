@@ -0,0 +1,122 @@
+import os, sys
+import json
+import time
+import platform
+import subprocess
+from argparse import ArgumentParser
+
+sys.path.insert(0,os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from gdoc_utils import add_parser_arg, default_parser
+from profiling import profile_convert
+from search import dump_index
+from make_export import make_export
+import parse_google_doc
+import parse_faq
+
+####
+# time and memory-profile each stage of both converters (parse, stylesheet, comments, anchors,
+# clean, outline, sections/cards, search index, render) on synthetic exports at 1x, 10x and
+# 100x the size of the real documents, with no caches; also the size of the search index
+#
+# results are saved as json in benchmarks/results/<git commit>.json, so runs from different
+# commits can be compared with --compare (eg --compare benchmarks/results/abc1234.json)
+# the stages are profiled the same way as with --profile on the scripts (see profiling.py): times
+# are from a run without tracemalloc, memory (peak during the stage, and still allocated after
+# it) from a second run with it
+#
+# usage: python benchmarks/bench_stages.py [--scales 1 10 100] [--kind guidelines faq] [--compare old.json]
+####
+
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)),'results')
+
+MODULES = {'guidelines':parse_google_doc,'faq':parse_faq}
+
+def git_commit():
+    """
+    short hash of the checked-out commit (with -dirty if there are changes), or 'unknown'
+    """
+    top = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    try:
+        rev = subprocess.run(['git','rev-parse','--short','HEAD'],cwd=top,capture_output=True,\
+                             text=True,check=True).stdout.strip()
+        dirty = subprocess.run(['git','status','--porcelain','--untracked-files=no'],cwd=top,\
+                               capture_output=True,text=True,check=True).stdout.strip()
+    except (OSError,subprocess.CalledProcessError):
+        return 'unknown'
+    return rev + ('-dirty' if dirty != '' else '')
+
+def run_stages(kind,text,parser,memory=True):
+    """
+    convert text (with a search index) with profiling.profile_convert (timed, and if memory
+    once more under tracemalloc); returns the list of stages, the output size and the size of
+    the search index
+    """
+    search = {}
+    out,report = profile_convert(MODULES[kind].convert,text,{'parser':parser,'search':search},memory=memory)
+    return report['stages'], len(out.encode()), len(dump_index(search['index']).encode())
+
+def find_run(results,kind,scale):
+    """
+    the run for kind and scale in a loaded results file, if there is one
+    """
+    for run in results.get('runs',[]):
+        if run['kind'] == kind and run['scale'] == scale:
+            return run
+
+def print_run(run,old=None):
+    """
+    print one run's stages, with the ratio to the same stage in an old run if given
+    """
+    print('%s x%g: %.1f kB in, %.1f kB out, %.1f kB search index, %.3f s' % (run['kind'],run['scale'],\
+                run['bytes_in']/1e3,run['bytes_out']/1e3,run.get('bytes_index',0)/1e3,run['seconds']))
+    oldst = {}
+    if old != None:
+        oldst = {st['name']:st for st in old['stages']}
+        oldst['total'] = {'seconds':old['seconds']}
+    rows = run['stages'] + [{'name':'total','seconds':run['seconds']}]
+    for st in rows:
+        line = '    %-12s %9.3f s' % (st['name'],st['seconds'])
+        if 'peak_mb' in st:
+            line += ' %9.1f MB peak %9.1f MB after' % (st['peak_mb'],st['current_mb'])
+        if st['name'] in oldst and oldst[st['name']]['seconds'] > 0:
+            line += '   (x%.2f vs old)' % (st['seconds']/oldst[st['name']]['seconds'])
+        print(line)
+
+if __name__ == '__main__':
+    parser = ArgumentParser()
+    parser.add_argument('--scales',type=float,nargs='+',default=[1,10,100],help='document sizes, relative to the real ones')
+    parser.add_argument('--kind',choices=list(MODULES.keys()),nargs='+',default=list(MODULES.keys()),\
+                    help='which converters to run')
+    add_parser_arg(parser)
+    parser.add_argument('--seed',type=int,default=0,help='random seed for the synthetic exports')
+    parser.add_argument('--no-memory',dest='memory',action='store_false',help="skip the tracemalloc run")
+    parser.add_argument('--compare',type=str,default=None,help='results file from an earlier run to compare to')
+    parser.add_argument('--ofile','-o',type=str,default=None,\
+                    help='where to save the results (default: %s/<commit>.json)' % RESULTS_DIR)
+    args = parser.parse_args()
+
+    old = None
+    if args.compare != None:
+        f = open(args.compare,'r')
+        old = json.load(f)
+        f.close()
+        print('comparing to %s (commit %s)' % (args.compare,old.get('commit')))
+
+    results = {'commit':git_commit(),'date':time.strftime('%Y-%m-%d %H:%M:%S'),\
+               'python':platform.python_version(),'parser':args.parser or default_parser(),'runs':[]}
+    for kind in args.kind:
+        MODULES[kind].convert(make_export(kind,1,args.seed),parser=args.parser)  # warm up
+        for scale in args.scales:
+            text = make_export(kind,scale,args.seed)
+            stages, nout, nindex = run_stages(kind,text,args.parser,memory=args.memory)
+            run = {'kind':kind,'scale':scale,'bytes_in':len(text.encode()),'bytes_out':nout,'bytes_index':nindex,\
+                   'seconds':sum(st['seconds'] for st in stages),'stages':stages}
+            results['runs'].append(run)
+            print_run(run,find_run(old,kind,scale) if old != None else None)
+
+    ofile = args.ofile or os.path.join(RESULTS_DIR,'%s.json' % results['commit'])
+    os.makedirs(os.path.dirname(os.path.abspath(ofile)),exist_ok=True)
+    f = open(ofile,'w')
+    json.dump(results,f,indent=1)
+    f.close()
+    print('saved %s' % ofile)
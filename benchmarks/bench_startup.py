@@ -0,0 +1,87 @@
+import os, sys
+import time
+import subprocess
+from argparse import ArgumentParser
+
+####
+# startup time of the scripts: import each one with python -X importtime (from the top of the
+# repo, like running it) and check the cumulative import time of the script and of each of our
+# modules against a budget, and that nothing heavy that is only needed sometimes (numpy,
+# pandas, cssutils) gets imported up front. bs4 (and the lxml/html5lib builders it loads when
+# they are installed) is most of what's left, and is counted in gdoc_utils
+#
+# times are the best of --repeat runs, in ms; --slack scales the budgets for slow machines
+# exits with 1 if anything is over budget or a heavy module was imported
+#
+# usage: python benchmarks/bench_startup.py [--repeat 5] [--slack 1]
+####
+
+TOP = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+SCRIPTS = ['parse_google_doc','parse_faq','batch_convert']
+
+BUDGETS = {'parse_google_doc':400,'parse_faq':400,'batch_convert':400,\
+           'gdoc_utils':300,'css_translate':25,'cleaner':10,'profiling':25,\
+           'accordion':10,'section_cache':10,'watch':10}  # ms, cumulative
+
+HEAVY = ('numpy','pandas','cssutils')  # should only be imported when they're used
+
+def importtime(module):
+    """
+    {module name: cumulative import time in ms} for one `python -X importtime -c "import module"`
+    (only the first import of each module is listed, so shared dependencies count for whichever
+    module imported them first)
+    """
+    proc = subprocess.run([sys.executable,'-X','importtime','-c','import %s' % module],cwd=TOP,\
+                          capture_output=True,text=True,check=True)
+    times = {}
+    for line in proc.stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        self_us,cumul_us,name = line[len('import time:'):].split('|')
+        times[name.strip()] = int(cumul_us)/1e3
+    return times
+
+def wall_time(code):
+    """
+    wall time in ms to start python and run code
+    """
+    t0 = time.perf_counter()
+    subprocess.run([sys.executable,'-c',code],cwd=TOP,check=True)
+    return (time.perf_counter() - t0)*1e3
+
+if __name__ == '__main__':
+    parser = ArgumentParser()
+    parser.add_argument('--repeat',type=int,default=5,help='runs per script (the fastest is used)')
+    parser.add_argument('--slack',type=float,default=1.,help='multiply the budgets by this')
+    args = parser.parse_args()
+
+    bare = min(wall_time('pass') for r in range(args.repeat))
+    print('python startup: %.1f ms' % bare)
+
+    failed = []
+    for script in SCRIPTS:
+        best = {}
+        for r in range(args.repeat):
+            for name,ms in importtime(script).items():
+                best[name] = min(ms,best.get(name,ms))
+        wall = min(wall_time('import %s' % script) for r in range(args.repeat))
+        print('%s: %.1f ms to import (%.1f ms wall, %.1f ms over bare python)' % (script,best[script],\
+                    wall,wall-bare))
+        for name in sorted(BUDGETS,key=lambda n: -best.get(n,0)):
+            if name not in best or (name in SCRIPTS and name != script):
+                continue
+            budget = BUDGETS[name]*args.slack
+            over = best[name] > budget
+            print('    %-18s %8.1f ms  (budget %.0f)%s' % (name,best[name],budget,'  OVER' if over else ''))
+            if over:
+                failed.append('%s: %s over budget' % (script,name))
+        heavy = [h for h in HEAVY if h in best]
+        if len(heavy) > 0:
+            print('    imports %s at startup' % ', '.join(heavy))
+            failed.append('%s: imports %s' % (script,', '.join(heavy)))
+
+    if len(failed) > 0:
+        print('FAILED: ' + '; '.join(failed))
+        sys.exit(1)
+    print('all within budget')
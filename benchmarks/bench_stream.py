@@ -0,0 +1,109 @@
+import os, sys
+import io
+import json
+import shutil
+import tarfile
+import tempfile
+import subprocess
+from argparse import ArgumentParser
+
+sys.path.insert(0,os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from make_export import make_export
+
+####
+# memory of the card-by-card build (convert(..., out=f), what the scripts do unless they
+# minify) against the build it replaced, which kept every card's tags in the soup until the end
+# and then rendered the whole page to one string: the converters of an older commit (by default
+# the one before the streaming change, taken out of git into a temporary directory) are run on
+# the same synthetic exports as this tree's, building a string and streamed
+#
+# each conversion runs in a process of its own under tracemalloc. Shown for each are the wall
+# time, the overall peak (usually the bs4 parse, which none of this changes), the peak once
+# the soup is cleaned (the sections/cards and render stages) and what is still allocated at the
+# end. Checks that this tree writes the same bytes streamed as it builds as a string.
+#
+# usage: python benchmarks/bench_stream.py [--scales 1 10 30] [--before 81c63a5]
+####
+
+TOP = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MODULES = {'guidelines':'parse_google_doc','faq':'parse_faq'}
+BUILD = ('sections','cards','render')  # the stages after the soup is cleaned and outlined
+
+# one conversion, in a process of its own: argv is tree, module, export, output, stream or string
+MEASURE = '''
+import sys, json, time, tracemalloc
+sys.path.insert(0,sys.argv[1])
+from profiling import StageTimer
+module = __import__(sys.argv[2])
+f = open(sys.argv[3],'r',encoding='utf-8'); text = f.read(); f.close()
+timer = StageTimer()
+tracemalloc.start()
+t0 = time.perf_counter()
+f = open(sys.argv[4],'w')
+if sys.argv[5] == 'stream':
+    module.convert(text,timer=timer,out=f)
+else:
+    out = module.convert(text,timer=timer)
+    f.write(out)
+f.close()
+dt = time.perf_counter() - t0
+print(json.dumps({'seconds':dt,'stages':timer.stages}))
+'''
+
+def checkout(rev,tmp):
+    """
+    the files of an older commit, in a directory under tmp (None if git can't give them)
+    """
+    try:
+        data = subprocess.run(['git','archive',rev],cwd=TOP,capture_output=True,check=True).stdout
+    except (OSError,subprocess.CalledProcessError):
+        return None
+    tree = os.path.join(tmp,rev)
+    with tarfile.open(fileobj=io.BytesIO(data)) as tar:
+        tar.extractall(tree)
+    return tree
+
+def run(tree,kind,ifile,ofile,stream):
+    """
+    convert ifile to ofile with the converter in tree, streamed or not; returns (seconds, overall
+    peak, peak after cleaning, allocated at the end) in MB
+    """
+    res = subprocess.run([sys.executable,'-c',MEASURE,tree,MODULES[kind],ifile,ofile,\
+                          'stream' if stream else 'string'],capture_output=True,text=True,check=True)
+    got = json.loads(res.stdout.strip().splitlines()[-1])
+    stages = got['stages']
+    peak = max(st['peak_mb'] for st in stages)
+    build = max(st['peak_mb'] for st in stages if st['name'] in BUILD)
+    return got['seconds'],peak,build,stages[-1]['current_mb']
+
+if __name__ == '__main__':
+    parser = ArgumentParser()
+    parser.add_argument('--scales',type=float,nargs='+',default=[1,10,30],help='document sizes, relative to the real ones')
+    parser.add_argument('--before',type=str,default='81c63a5',\
+                    help="commit with the old build to compare to (default: the one before streaming; '' for none)")
+    args = parser.parse_args()
+
+    ok = True
+    tmp = tempfile.mkdtemp()
+    old = checkout(args.before,tmp) if args.before != '' else None
+    if args.before != '' and old == None:
+        print('(no git checkout of %s here, so only this tree is measured)' % args.before)
+    paths = [('before, string',old,False)] if old != None else []
+    paths += [('string',TOP,False),('streamed',TOP,True)]
+    for kind in MODULES:
+        for scale in args.scales:
+            ifile = os.path.join(tmp,'export.html')
+            f = open(ifile,'w',encoding='utf-8'); f.write(make_export(kind,scale)); f.close()
+            pages = {}
+            for name,tree,stream in paths:
+                ofile = os.path.join(tmp,'out.html')
+                dt,peak,build,held = run(tree,kind,ifile,ofile,stream)
+                print('%s x%g, %-16s %.2f s, peak %.1f MB, after cleaning %.1f MB, held at the end %.1f MB' \
+                      % (kind,scale,name+':',dt,peak,build,held))
+                f = open(ofile,'rb'); pages[name] = f.read(); f.close()
+            if pages['streamed'] != pages['string']:
+                print('    streamed output is not the same')
+                ok = False
+    shutil.rmtree(tmp)
+    if not ok:
+        sys.exit(1)
@@ -0,0 +1,334 @@
+import random
+from argparse import ArgumentParser
+
+####
+# make synthetic google-docs html exports of any size, for benchmarking the converters
+#
+# the output looks like what google gives us for the guidelines and the FAQ: one long line,
+# a big inline stylesheet of .c# rules (plus list counters etc), <h1> audiences with h2
+# sections wrapped in single-item <ol>s, numbered lists split into fragments with start=...
+# (with stray paragraphs, sub-lists and bullet lists in between), tables without <thead>,
+# ?q=-wrapped links, comments and footnotes (refs in the text, divs at the end), h6 and empty
+# paragraphs, and for the FAQ "Q." / "A." paragraphs
+#
+# usage: python benchmarks/make_export.py [--kind guidelines|faq] [--scale 1] [--seed 0] [--same-shared] [--h3 0] [--categories 0]
+#        -o out.html
+# scale 1 is about the size of the real documents (~200 kB guidelines, ~40 FAQ questions)
+####
+
+WORDS = ('seismica journal article review reviewer author editor manuscript data code '\
+         'preprint policy open access license submission earthquake fault rupture model '\
+         'community diamond figure table reference citation ethics conflict interest '\
+         'report decision revision handling section software availability repository '\
+         'must should may please ensure consider provide include describe follow').split()
+ACCENTS = ['é','–','’','ü','&amp;','&nbsp;']
+
+AUDIENCES = ['Authors','Reviewers','Editors','Editorial Policies','Copy Editors']
+SHARED = ['Conflicts of interest','Data and code availability','Use of AI tools']  # in every audience
+
+class Export:
+    """
+    a synthetic export being built up; call guidelines() or faq() once for the html
+    """
+    def __init__(self,seed=0,nclasses=40,xref=0.,other=(),idbase=0):
+        self.rng = random.Random(seed)
+        # xref is the fraction of links that go to headings instead of websites: in this doc
+        # (#h.xxx), or in another doc (a docs.google.com link) if other has that doc's h2 ids;
+        # idbase keeps this doc's heading ids apart from the other's
+        self.xref = xref; self.other = list(other); self.idbase = idbase
+        self.h2ids = []
+        self.nclasses = max(nclasses,12)
+        self.footnote_ok = True
+        self.ncmnt = 0; self.nftnt = 0; self.nhid = 0; self.nlist = 0
+        self.comments = []; self.footnotes = []
+        # fixed roles for a few classes, the rest are random
+        self.plain = 0; self.bold = 1; self.ital = 2; self.under = 8; self.mark = 9
+
+    def words(self,n):
+        """
+        n random words, sometimes with an accent or entity thrown in
+        """
+        w = [self.rng.choice(WORDS) for i in range(n)]
+        if self.rng.random() < 0.2:
+            w.insert(self.rng.randrange(len(w)),self.rng.choice(ACCENTS))
+        return ' '.join(w)
+
+    def cls(self):
+        """
+        one of the random .c# classes
+        """
+        return self.rng.randrange(10,self.nclasses)
+
+    def hid(self):
+        """
+        a google-like heading id
+        """
+        self.nhid += 1
+        return 'h.%08x' % ((self.nhid+self.idbase)*2654435761 % 2**32)
+
+    def style(self):
+        """
+        the inline stylesheet: an @import, list counters, and the .c# rules
+        """
+        rules = ["@import url('https://themes.googleusercontent.com/fonts/css?kit=abc123');",\
+                 'ol{margin:0;padding:0}table td,table th{padding:0}']
+        for l in range(4):
+            rules.append('ol.lst-kix_l%d-0{list-style-type:none}' % l)
+            rules.append('.lst-kix_l%d-0>li:before{content:"" counter(lst-ctn-kix_l%d-0,decimal) ". "}' % (l,l))
+            rules.append('.lst-kix_l%d-0>li{counter-increment:lst-ctn-kix_l%d-0}' % (l,l))
+        fixed = {0:'color:#000000;font-weight:400;text-decoration:none;vertical-align:baseline;'\
+                   'font-size:11pt;font-family:"Arial";font-style:normal',\
+                 1:'color:#000000;font-weight:700;text-decoration:none;vertical-align:baseline;'\
+                   'font-size:11pt;font-family:"Arial";font-style:normal',\
+                 2:'font-style:italic',\
+                 8:'color:#1155cc;text-decoration:underline',\
+                 9:'background-color:#ff0'}
+        opts = ['font-weight:700','font-style:italic','text-decoration:underline',\
+                'background-color:#ff0','font-weight:400','font-style:normal',\
+                'color:#000000','padding-top:0pt','margin-left:36pt','line-height:1.15',\
+                'orphans:2','widows:2','text-align:left','height:11pt']
+        for c in range(self.nclasses):
+            if c in fixed:
+                body = fixed[c]
+            else:
+                body = ';'.join(self.rng.sample(opts,self.rng.randrange(1,5)))
+            rules.append('.c%d{%s}' % (c,body))
+        rules.append('.title{padding-top:0pt;color:#000000;font-size:26pt}')
+        rules.append('h1{padding-top:20pt;font-size:20pt}h2{padding-top:18pt;font-size:16pt}')
+        return ''.join(rules)
+
+    def link(self):
+        """
+        a link wrapped by google's redirect (https://www.google.com/url?q=...)
+        """
+        if self.xref > 0 and self.rng.random() < self.xref:
+            return self.xlink()
+        target = 'https://seismica.org/%s/%s%%3Fid%%3D%d' % (self.rng.choice(WORDS),\
+                    self.rng.choice(WORDS),self.rng.randrange(100))
+        return '<span class="c%d"><a class="c%d" href="https://www.google.com/url?q=%s&amp;sa=D'\
+               '&amp;source=editors&amp;ust=1650000000000&amp;usg=AOvVaw0abc">%s</a></span>'\
+               % (self.under,self.cls(),target,self.words(2))
+
+    def xlink(self):
+        """
+        a link to a heading: an earlier one in this doc, one in the other doc, or (1 in 20) one
+        that isn't anywhere
+        """
+        r = self.rng.random()
+        if r < 0.05 or (len(self.h2ids) == 0 and len(self.other) == 0):
+            href = '#h.missing%d' % self.rng.randrange(1000)
+        elif len(self.other) == 0 or (r < 0.55 and len(self.h2ids) > 0):
+            href = '#%s' % self.rng.choice(self.h2ids)
+        else:
+            href = 'https://www.google.com/url?q=https://docs.google.com/document/d/1seismicaDoc/edit%%23heading%%3D%s'\
+                   '&amp;sa=D&amp;source=editors&amp;ust=1650000000000&amp;usg=AOvVaw0abc' % self.rng.choice(self.other)
+        return '<span class="c%d"><a class="c%d" href="%s">%s</a></span>' % (self.under,self.cls(),href,self.words(2))
+
+    def run(self):
+        """
+        one run of text: a classed span, a link, or a comment/footnote ref
+        """
+        r = self.rng.random()
+        if r < 0.5:
+            return '<span class="c%d">%s </span>' % (self.plain,self.words(self.rng.randrange(3,15)))
+        if r < 0.62:
+            return '<span class="c%d">%s</span>' % (self.bold,self.words(2))
+        if r < 0.72:
+            return '<span class="c%d">%s</span>' % (self.ital,self.words(2))
+        if r < 0.77:
+            return '<span class="c%d">%s</span>' % (self.mark,self.words(3))
+        if r < 0.85:
+            return self.link()
+        if r < 0.90:
+            self.ncmnt += 1
+            n = self.ncmnt
+            self.comments.append('<div class="c99"><p class="c4"><a href="#cmnt_ref%d" id="cmnt%d">[%d]</a>'\
+                                 '<span class="c0">%s</span></p></div>' % (n,n,n,self.words(8)))
+            return '<sup><a href="#cmnt%d" id="cmnt_ref%d">[%d]</a></sup>' % (n,n,n)
+        if r < 0.93 and self.footnote_ok:
+            self.nftnt += 1
+            n = self.nftnt
+            self.footnotes.append('<div><p class="c4"><a href="#ftnt_ref%d" id="ftnt%d">[%d]</a>'\
+                                  '<span class="c0">&nbsp;%s</span></p></div>' % (n,n,n,self.words(6)))
+            return '<sup><a href="#ftnt%d" id="ftnt_ref%d">[%d]</a></sup>' % (n,n,n)
+        if r < 0.96:
+            return '<span class="c%d">%s </span>' % (self.cls(),self.words(4))
+        return '<span class="c0"><a href="mailto:info@seismica.org">info@seismica.org</a></span>'
+
+    def para(self,cls='c3'):
+        """
+        a paragraph of a few runs
+        """
+        return '<p class="%s">%s</p>' % (cls,''.join(self.run() for i in range(self.rng.randrange(1,6))))
+
+    def li(self):
+        """
+        a list item of a few runs
+        """
+        return '<li class="c4 li-bullet-0">%s</li>' % ''.join(self.run() for i in range(self.rng.randrange(1,4)))
+
+    def ol_run(self):
+        """
+        a numbered list split into fragments the way google does it, sometimes with stray
+        paragraphs, sub-lists (start=1 again) and bullet lists in between
+        """
+        self.nlist += 1
+        lst = 'lst-kix_l%d' % (self.nlist % 4)
+        out = []; start = 1
+        for frag in range(self.rng.randrange(1,4)):
+            n = self.rng.randrange(1,5)
+            out.append('<ol class="c2 %s-0%s" start="%d">%s</ol>' % (lst,' start' if frag == 0 else '',\
+                        start,''.join(self.li() for i in range(n))))
+            start += n
+            r = self.rng.random()
+            if r < 0.3:
+                out.append(self.para('c9'))
+            elif r < 0.5:
+                out.append('<ol class="c2 %s-1 start" start="1">%s</ol>' % (lst,\
+                            ''.join(self.li() for i in range(self.rng.randrange(1,3)))))
+            elif r < 0.6:
+                out.append('<ul class="c2 lst-kix_u%d-0 start">%s</ul>' % (self.nlist % 3,\
+                            ''.join(self.li() for i in range(2))))
+        # close the run with a fragment that carries on the numbering, so nothing dangles
+        n = self.rng.randrange(1,3)
+        out.append('<ol class="c2 %s-0" start="%d">%s</ol>' % (lst,start,''.join(self.li() for i in range(n))))
+        return ''.join(out)
+
+    def table(self):
+        """
+        a table with no <thead> (the first row is the header), after an anchor like google's
+        """
+        rows = []
+        for r in range(self.rng.randrange(2,6)):
+            cells = ''.join('<td class="c11" colspan="1" rowspan="1"><p class="c3">%s</p></td>' % self.run()\
+                            for i in range(3))
+            rows.append('<tr class="c6">%s</tr>' % cells)
+        return '<a id="t.%d"></a><table class="c15"><tbody>%s</tbody></table>' % (self.nhid,''.join(rows))
+
+    def h2(self,title):
+        """
+        an h2 heading, in a one-item <ol> since the headings in the docs are numbered
+        """
+        self.h2ids.append(self.hid())
+        return '<ol class="c2 lst-kix_h-0" start="1"><li class="c4 li-bullet-0"><h2 id="%s" '\
+               'style="display:inline"><span class="c%d">%s</span></h2></li></ol>' % (self.h2ids[-1],self.bold,title)
+
+    def section(self,title,h3=0.):
+        """
+        an h2 section: heading, then a mix of paragraphs, lists, tables, h6 and empty paragraphs;
+        with probability h3 it carries on with a few h3 subsections like that
+        """
+        out = self.h2(title) + self.section_body()
+        if h3 > 0 and self.rng.random() < h3:
+            for k in range(self.rng.randrange(2,5)):
+                out += '<h3 class="c7" id="%s"><span class="c%d">%s</span></h3>' % (self.hid(),\
+                       self.plain,'%s %d' % (title.split()[0],k+1)) + self.section_body()
+        return out
+
+    def section_body(self):
+        """
+        the contents of an h2 section, after the heading
+        """
+        out = [self.para()]
+        for i in range(self.rng.randrange(2,8)):
+            r = self.rng.random()
+            if r < 0.45:
+                out.append(self.para())
+            elif r < 0.7:
+                out.append(self.ol_run())
+            elif r < 0.78:
+                out.append(self.table())
+            elif r < 0.85:
+                out.append('<h6 class="c3" id="%s"><span class="c%d">%s</span></h6>' % (self.hid(),\
+                            self.bold,self.words(3)))
+                out.append(self.para())
+            elif r < 0.92:
+                out.append('<p class="c3 c5"><span class="c0"></span></p>')
+            else:
+                out.append('<ul class="c2 lst-kix_u0-0 start">%s</ul>' % ''.join(self.li() for i in range(3)))
+        return ''.join(out)
+
+    def guidelines(self,scale=1,same_shared=False,h3=0.):
+        """
+        html for a guidelines/policies-like document: a logo, a title, and an h1 per audience
+        with 9*scale sections each, 3 of them the shared ones (which show up in every audience)
+        same_shared=True gives the shared sections the same contents in every audience (like a
+        section copied and pasted in the doc), instead of different contents under the same title
+        h3 is the fraction of (not shared) sections that have h3 subsections
+        """
+        shared = {}
+        body = ['<p class="c3"><span style="overflow:hidden;display:inline-block"><img alt="" '\
+                'src="images/image1.png" title=""></span></p>',\
+                '<p class="c12 title" id="h.title"><span class="c%d">Seismica Guidelines</span></p>' % self.bold]
+        nsec = max(int(9*scale)-len(SHARED),1)
+        for aud in AUDIENCES[:len(AUDIENCES) if scale >= 1 else 2]:
+            body.append('<h1 class="c7" id="%s"><span class="c%d">%s</span></h1>' % (self.hid(),self.plain,aud))
+            body.append(self.para())
+            for s in range(nsec):
+                body.append(self.section('%s %d %s' % (aud,s+1,self.words(3)),h3=h3))
+            for s in SHARED:
+                if same_shared:
+                    if s not in shared:
+                        shared[s] = self.section_body()
+                    body.append(self.h2(s) + shared[s])
+                else:
+                    body.append(self.section(s))
+        return self.wrap(body)
+
+    def faq(self,npairs=40,categories=0):
+        """
+        html for an FAQ-like document: npairs "Q." paragraphs, each followed by an "A." paragraph
+        and maybe a couple more; categories > 0 puts the questions under that many h2 headings
+        """
+        self.footnote_ok = False  # footnote divs would end up in the last answer
+        body = ['<p class="c12 title" id="h.title"><span class="c%d">Seismica FAQ</span></p>' % self.bold,\
+                self.para()]
+        for q in range(npairs):
+            if categories > 0 and (q == 0 or q*categories//npairs != (q-1)*categories//npairs):
+                body.append('<h2 class="c7" id="%s"><span class="c%d">%s</span></h2>' % (self.hid(),self.plain,\
+                            self.words(2).capitalize()))
+            body.append('<p class="c3"><span class="c%d">Q. %s?</span></p>' % (self.bold,\
+                        self.words(self.rng.randrange(4,10))))
+            body.append('<p class="c3"><span class="c%d">A. </span>%s</p>' % (self.bold,\
+                        ''.join(self.run() for i in range(3))))
+            for i in range(self.rng.randrange(0,3)):
+                body.append('<p class="c3"><span class="c0">%s </span><span class="c%d">%s</span></p>'\
+                            % (self.words(8),self.bold,'note '+self.words(2)))
+        return self.wrap(body)
+
+    def wrap(self,body):
+        """
+        the whole document around the body elements, with footnotes and comments at the end
+        """
+        body.append('<hr class="c14">')
+        body.extend(self.footnotes)
+        body.extend(self.comments)
+        return '<html><head><meta content="text/html; charset=UTF-8" http-equiv="content-type">'\
+               '<style type="text/css">%s</style></head><body class="c20 doc-content">%s</body></html>'\
+               % (self.style(),''.join(body))
+
+def make_export(kind='guidelines',scale=1,seed=0,same_shared=False,h3=0.,categories=0):
+    """
+    the html text of a synthetic export of either kind, scale times the size of the real one
+    same_shared and h3: see Export.guidelines, categories: see Export.faq
+    """
+    ex = Export(seed=seed)
+    if kind == 'faq':
+        return ex.faq(max(int(40*scale),1),categories=categories)
+    return ex.guidelines(scale,same_shared=same_shared,h3=h3)
+
+if __name__ == '__main__':
+    parser = ArgumentParser()
+    parser.add_argument('--kind',choices=['guidelines','faq'],default='guidelines',help='kind of document')
+    parser.add_argument('--scale',type=float,default=1,help='size relative to the real document')
+    parser.add_argument('--seed',type=int,default=0,help='random seed')
+    parser.add_argument('--same-shared',action='store_true',help='same contents for the shared sections in every audience')
+    parser.add_argument('--h3',type=float,default=0.,help='fraction of sections with h3 subsections')
+    parser.add_argument('--categories',type=int,default=0,help='number of category headings in an faq')
+    parser.add_argument('--ofile','-o',type=str,required=True,help='path to output file')
+    args = parser.parse_args()
+
+    f = open(args.ofile,'w')
+    f.write(make_export(args.kind,args.scale,args.seed,same_shared=args.same_shared,h3=args.h3,\
+                        categories=args.categories))
+    f.close()
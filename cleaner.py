@@ -0,0 +1,165 @@
+from bs4 import Tag
+
+from gdoc_utils import chain_index, swap_span, decompose_all
+from links import Linker, AnchorIndex
+
+####
+# tree cleaning in one depth-first walk instead of a find_all() over the whole document for
+# each kind of fix (spans, h6, empty body elements, <a>, <sup>, then links and tables in the
+# card bodies)
+#
+# a Cleaner holds a list of rules, each a handler for some tag names that runs either on the
+# way down (pre) or on the way back up (post, after everything inside the tag has been done).
+# handlers return True if they changed the tag, and the Cleaner counts those per rule. A tag
+# that a handler removes (or defers, to be decomposed all at once at the end of the run) gets
+# no more handlers, and a tag removed on the way down isn't descended into.
+#
+# the rules in soup_cleaner are ordered so the output is the same as running them one after
+# another over the whole tree:
+#   - spans and h6 are done post, so the <a>/<sup> checks see their insides already cleaned
+#   - empty top-level elements are checked pre, before any <a>/<sup> inside them is removed;
+#     spans/h6 that are going to be unwrapped are looked through ("dissolve"), so their
+#     children count as top-level like they would after unwrapping
+#   - empty <a>s go immediately but empty <sup>s are deferred, since all the <a>s used to be
+#     removed before any <sup> was looked at
+# strip_comments stays a separate pass before this: which divs are comments depends on the
+# whole document, and the <a>/<sup> checks depend on comment refs being gone
+####
+
+class Cleaner:
+    """
+    a set of cleaning rules applied in a single depth-first walk
+    """
+    def __init__(self):
+        self.pre = []; self.post = []
+        self.dissolving = []  # predicates for tags that will be unwrapped
+        self.counts = {}
+        self._gone = set(); self._deferred = []
+
+    def rule(self,label,names,handler,post=True,top=False):
+        """
+        add a rule: handler(tag) runs on tags whose name is in names (all tags if None), on the
+        way back up (post) or down; top=True only runs it on top-level elements
+        """
+        if names != None:
+            names = frozenset(names)
+        (self.post if post else self.pre).append((label,names,top,handler))
+        self.counts.setdefault(label,0)
+
+    def dissolve(self,pred):
+        """
+        mark tags for which pred(tag) is true as going to be unwrapped by some rule, so their
+        children are treated as top-level when they are
+        """
+        self.dissolving.append(pred)
+
+    def defer(self,tag):
+        """
+        decompose tag at the end of the run (no more rules see it)
+        """
+        self._gone.add(id(tag))
+        self._deferred.append(tag)
+
+    def _apply(self,rules,tag,istop):
+        """
+        run rules on a tag; return whether it is still there afterwards
+        """
+        for label,names,top,handler in rules:
+            if (names != None and tag.name not in names) or (top and not istop):
+                continue
+            if handler(tag):
+                self.counts[label] += 1
+            if tag.parent == None or id(tag) in self._gone:
+                return False
+        return True
+
+    def run(self,root,top=None):
+        """
+        clean everything inside root; the children of top (default: root) are the top-level
+        elements for rules with top=True
+        """
+        if top == None:
+            top = root
+        self._gone = set(); self._deferred = []
+        # entries: (tag, whether its parent is effectively top, whether this is the way back up)
+        # (on the way back up the middle one is whether the tag itself is top-level)
+        stack = [(c,root is top,False) for c in reversed(root.contents) if isinstance(c,Tag)]
+        while len(stack) > 0:
+            tag,under,up = stack.pop()
+            if up:
+                self._apply(self.post,tag,under)
+                continue
+            melts = any(pred(tag) for pred in self.dissolving)
+            if not self._apply(self.pre,tag,under and not melts):
+                continue
+            stack.append((tag,under and not melts,True))
+            inner = tag is top or (under and melts)
+            stack.extend((c,inner,False) for c in reversed(tag.contents) if isinstance(c,Tag))
+        decompose_all(self._deferred)
+        self._gone = set(); self._deferred = []
+        return root
+
+def soup_cleaner(soup,translate={},h6=True,notext=True,aempty=True,sup=True):
+    """
+    the cleaning for a whole (comment-stripped) soup, to be run on it with top=soup.body:
+    translate spans' classes to tags (see gdoc_utils.clean_spans), unwrap h6, and get rid of
+    various kinds of empty tags that tend to show up in these files
+    h6 and sup are mainly in the guidelines; notext and aempty are in both, probably?
+    """
+    cl = Cleaner()
+    chain = chain_index(translate)
+
+    def span(tag):
+        swap_span(soup,tag,chain(tag.attrs.get('class',())))
+        return True
+    def unwrap(tag):
+        tag.unwrap()
+        return True
+    def empty_top(tag):
+        if tag.text == '':
+            cl.defer(tag)
+            return True
+    def empty_a(tag):
+        if tag.string == None:
+            tag.decompose()
+            return True
+    def empty_sup(tag):
+        if tag.string == None:
+            cl.defer(tag)
+            return True
+
+    cl.dissolve(lambda tag: tag.name == 'span' and len(chain(tag.attrs.get('class',()))) == 0)
+    cl.rule('span',['span'],span)
+    if h6:
+        cl.dissolve(lambda tag: tag.name == 'h6')
+        cl.rule('h6',['h6'],unwrap)
+    if notext:
+        cl.rule('notext',None,empty_top,post=False,top=True)
+    if aempty:
+        cl.rule('a',['a'],empty_a)
+    if sup:
+        cl.rule('sup',['sup'],empty_sup)
+    return cl
+
+def body_cleaner(tables=True,linker=None):
+    """
+    the cleaning for a finished card body: rewrite links (unwrap the ones google has wrapped
+    with extra stuff, point the ones to headings at our cards; see links.Linker, by default one
+    for a document on its own), and (if tables) border the tables
+    """
+    cl = Cleaner()
+    if linker == None:
+        linker = Linker(AnchorIndex())
+
+    def border(style):
+        def handler(tag):
+            tag.attrs['style'] = style
+            return True
+        return handler
+
+    cl.rule('link',None,linker.fix)
+    if tables:
+        cl.rule('table',['table'],border("border:1px solid black;border-collapse:collapse"))
+        cl.rule('th',['th'],border("border:1px solid black"))
+        cl.rule('td',['td'],border("border:1px solid black"))
+    return cl
@@ -0,0 +1,430 @@
+import os
+import re
+import json
+import shutil
+import hashlib
+from html import unescape
+from argparse import ArgumentParser
+
+from gdoc_utils import write_atomic
+from minify import gzipped, write_gzipped
+from lazy import bundle_path
+from search import index_path
+
+####
+# a css stage run on the finished pages (python css_optimize.py out_*.html, or
+# batch_convert.py --optimize-css):
+#   - hoisting: the card bodies put the same style="..." on every table, th and td (the
+#     borders from cleaner.body_cleaner). A style that comes up more than once across the
+#     pages (and their --lazy bundles) becomes a class, gs-<hash of the style>, and its rule
+#     is added to the end of a generated copy of stylesheet.css. A style attribute outranks
+#     any rule in a stylesheet, so the declarations in those rules are !important, which keeps
+#     them ahead of the theme's (eg bootstrap's .table td) the way the attribute was
+#   - purging: stylesheet.css is layered on top of a bootstrap theme, of which the accordion
+#     pages use a small part. The theme (a saved copy of the css OJS serves, given with
+#     --theme) and the generated stylesheet are put together in that order, and any rule
+#     with a selector that asks for a tag, class, id or attribute none of the pages have is
+#     dropped. What's left is minified and written as stylesheet.min.css, with a .gz
+#
+# selectors are matched loosely: every tag/class/id/attribute a selector names has to be in
+# the pages somewhere, not on the elements its combinators say. Pseudo-classes (and whatever
+# is inside :not() and the like) are left out of that, so a rule is only dropped when it can't
+# apply. Classes the scripts add or toggle (bootstrap's collapse, search.js) are counted as
+# used (KEEP), and so is anything in the pages given with --also: the rules in stylesheet.css
+# are for OJS's own header, navigation and footer, which aren't in our pages, so purging for
+# the whole site needs a saved OJS page there. The pages are written to --odir (with .gz
+# copies of those that had them, and their search indexes copied over), so running it again
+# on the same inputs gives the same files
+####
+
+STYLE_PREFIX = 'gs-'
+# classes, tags and attributes that show up once the page's scripts have run: bootstrap's
+# collapse (show, collapsing, collapsed) and search.js's box and result list
+KEEP = {'classes':{'show','collapsing','collapsed','form-control','list-unstyled'},\
+        'tags':{'html','head','body','tbody','input','ul','li','a','small'},'ids':set(),'attrs':set()}
+GROUPS = ('@media','@supports','@document','@-moz-document','@layer','@container')  # at-rules with rules in them
+
+_tag_re = re.compile(r'<(script|style)\b.*?</\1\s*>|<([a-zA-Z][\w:-]*)((?:\s+[^\s=/>]+(?:\s*=\s*(?:"[^"]*"|\'[^\']*\'|[^\s>]+))?)*)\s*(/?)>',\
+                     re.S | re.I)
+_attr_re = re.compile(r'(\s+)([^\s=/>]+)(?:(\s*=\s*)("[^"]*"|\'[^\']*\'|[^\s>]+))?')
+_string_re = re.compile(r'"(?:\\.|[^"\\])*"|\'(?:\\.|[^\'\\])*\'',re.S)
+_comment_re = re.compile(r'("(?:\\.|[^"\\])*"|\'(?:\\.|[^\'\\])*\')|/\*.*?\*/',re.S)
+_pseudo_re = re.compile(r'::?[\w-]+(?:\((?:[^()]|\([^()]*\))*\))?')
+
+def start_tags(html):
+    """
+    the start tags in a page, as (match, lowercased name, [(attribute, value)]), with values
+    unquoted and unescaped; skips whatever is inside <script> and <style>
+    """
+    for m in _tag_re.finditer(html):
+        if m.group(2) == None:
+            continue
+        attrs = []
+        for a in _attr_re.finditer(m.group(3) or ''):
+            v = a.group(4) or ''
+            if v[:1] in ('"',"'"):
+                v = v[1:-1]
+            attrs.append((a.group(2).lower(),unescape(v)))
+        yield m,m.group(2).lower(),attrs
+
+def normal_style(style):
+    """
+    a style attribute's declarations in one form (whitespace squashed, no empty ones), so the
+    same style written two ways gets one class
+    """
+    decls = [re.sub(r'\s+',' ',d).strip() for d in style.split(';')]
+    return ';'.join(re.sub(r'\s*:\s*',':',d,count=1) for d in decls if d != '')
+
+def style_class(style):
+    """
+    the class a (normalized) style is hoisted to; it depends only on the style, so it's the
+    same in every page and every run
+    """
+    return STYLE_PREFIX + hashlib.sha1(style.encode('utf-8')).hexdigest()[:8]
+
+def count_styles(html,counts):
+    """
+    add the number of times each (normalized) style attribute comes up in a page to counts
+    """
+    for m,name,attrs in start_tags(html):
+        for a,v in attrs:
+            if a == 'style':
+                style = normal_style(v)
+                counts[style] = counts.get(style,0) + 1
+
+def hoist_styles(html,classes):
+    """
+    the page with the style attributes in classes (normalized style -> class name) swapped for
+    the class, added to any the element already has; the rest of the markup is left alone
+    """
+    out = []; pos = 0
+    for m,name,attrs in start_tags(html):
+        styles = [normal_style(v) for a,v in attrs if a == 'style']
+        if len(styles) != 1 or styles[0] not in classes:
+            continue
+        cls = classes[styles[0]]
+        parts = []; done = False
+        for a in _attr_re.finditer(m.group(3)):
+            attr = a.group(2).lower()
+            if attr == 'style':
+                if any(b == 'class' for b,v in attrs):
+                    continue
+                parts.append('%sclass="%s"' % (a.group(1),cls))
+            elif attr == 'class' and not done:
+                v = a.group(4) or ''
+                q = v[:1] if v[:1] in ('"',"'") else '"'
+                v = v[1:-1] if v[:1] in ('"',"'") else v
+                parts.append('%sclass%s%s%s%s' % (a.group(1),a.group(3) or '=',q,(v+' '+cls).strip(),q))
+                done = True
+            else:
+                parts.append(a.group(0))
+        out.append(html[pos:m.start(3)])
+        out.append(''.join(parts))
+        pos = m.end(3)
+    out.append(html[pos:])
+    return ''.join(out)
+
+def hoisted_css(classes):
+    """
+    the rules for the hoisted classes (normalized style -> class name), to go at the end of
+    the stylesheet
+    """
+    rules = []
+    for style,cls in sorted(classes.items(),key=lambda sc: sc[1]):
+        decls = [d if d.replace(' ','').endswith('!important') else d + ' !important' for d in style.split(';')]
+        rules.append('.%s {\n  %s;\n}\n' % (cls,';\n  '.join(decls)))
+    return '\n/* generated by css_optimize.py: style attributes from the pages, as classes */\n' + '\n'.join(rules)
+
+def used_selectors(html,used):
+    """
+    add the tags, classes, ids and attribute names in a page to used (a dict of sets, like KEEP)
+    """
+    for m,name,attrs in start_tags(html):
+        used['tags'].add(name)
+        for a,v in attrs:
+            used['attrs'].add(a)
+            if a == 'class':
+                used['classes'].update(v.split())
+            elif a == 'id':
+                used['ids'].add(v)
+
+def _close(css,pos):
+    """
+    the position of the } that closes the block starting at pos (just after its {)
+    """
+    depth = 1; n = len(css)
+    while pos < n:
+        c = css[pos]
+        if c in ('"',"'"):
+            m = _string_re.match(css,pos)
+            pos = m.end() if m else pos + 1
+            continue
+        if c == '{':
+            depth += 1
+        elif c == '}':
+            depth -= 1
+            if depth == 0:
+                return pos
+        pos += 1
+    return n
+
+def _items(css,pos):
+    """
+    the rules and at-rules from pos up to the } that ends the block they're in (or the end),
+    and where that is
+    """
+    items = []; start = pos; n = len(css)
+    while pos < n:
+        c = css[pos]
+        if c in ('"',"'"):
+            m = _string_re.match(css,pos)
+            pos = m.end() if m else pos + 1
+            continue
+        if c == ';' or c == '{':
+            prelude = css[start:pos].strip()
+            if c == ';':
+                body = None
+            elif prelude.lower().startswith(GROUPS):
+                body,pos = _items(css,pos+1)
+            else:
+                end = _close(css,pos+1)
+                body,pos = css[pos+1:end],end
+            if prelude != '' or body != None:
+                items.append((prelude,body))
+            start = pos = pos + 1
+            continue
+        if c == '}':
+            return items,pos
+        pos += 1
+    return items,pos
+
+def parse_css(css):
+    """
+    a stylesheet as a list of (prelude, body): for a rule, its selectors and declarations;
+    for an at-rule with rules in it (@media and the like, see GROUPS) a list of those; for
+    one that ends in ; (@import, @charset) None; other at-rules (@font-face, @keyframes) keep
+    their block as it is. Comments are taken out
+    """
+    css = _comment_re.sub(lambda m: m.group(1) or '',css)
+    items,pos = _items(css,0)
+    while pos < len(css):  # a stray }
+        more,pos = _items(css,pos+1)
+        items += more
+    return items
+
+def selector_needs(selector):
+    """
+    the tags, classes, ids and attribute names a selector can't match without (a dict of sets),
+    or None if it's beyond what's checked here (escaped characters), so it's kept
+    """
+    if '\\' in selector:
+        return None
+    s = _string_re.sub('""',selector)
+    s = _pseudo_re.sub(' ',s) if ':' in s else s
+    needs = {'attrs':set(re.findall(r'\[\s*([^\s~|^$*=\]]+)',s))}
+    s = re.sub(r'\[[^\]]*\]',' ',s)
+    needs['classes'] = set(re.findall(r'\.(-?[_a-zA-Z][\w-]*)',s))
+    needs['ids'] = set(re.findall(r'#([\w-]+)',s))
+    s = re.sub(r'[.#][\w-]+',' ',s)
+    needs['tags'] = set(t.lower() for t in re.findall(r'(?:^|(?<=[\s>+~(,]))([a-zA-Z][\w-]*)',s))
+    needs['attrs'] = set(a.lower() for a in needs['attrs'])
+    return needs
+
+def _matches(selector,used):
+    """
+    whether a selector might match something with what's in used
+    """
+    needs = selector_needs(selector)
+    return needs == None or all(needs[k] <= used[k] for k in needs)
+
+def purge(items,used):
+    """
+    the parsed stylesheet without the rules none of whose selectors can match anything in used,
+    and with the selectors that can't match taken out of the rest; @media (etc) blocks that
+    end up empty go too, other at-rules stay
+    """
+    out = []
+    for prelude,body in items:
+        if prelude.startswith('@'):
+            if isinstance(body,list):
+                body = purge(body,used)
+                if len(body) == 0:
+                    continue
+            out.append((prelude,body))
+            continue
+        selectors = [s for s in split_selectors(prelude) if _matches(s,used)]
+        if len(selectors) > 0:
+            out.append((','.join(selectors),body))
+    return out
+
+def split_selectors(prelude):
+    """
+    the selectors in a comma-separated list (commas in strings and brackets don't count)
+    """
+    out = []; depth = 0; start = 0; pos = 0; n = len(prelude)
+    while pos < n:
+        c = prelude[pos]
+        if c in ('"',"'"):
+            m = _string_re.match(prelude,pos)
+            pos = m.end() if m else pos + 1
+            continue
+        if c in '([':
+            depth += 1
+        elif c in ')]':
+            depth -= 1
+        elif c == ',' and depth == 0:
+            out.append(prelude[start:pos].strip())
+            start = pos + 1
+        pos += 1
+    out.append(prelude[start:].strip())
+    return [s for s in out if s != '']
+
+def _squeeze(text,around):
+    """
+    text with its whitespace squashed to single spaces, and taken out next to any character
+    in around; strings are left alone
+    """
+    strings = []
+    def keep(m):
+        strings.append(m.group(0))
+        return '\x00%d\x00' % (len(strings)-1)
+    text = _string_re.sub(keep,text)
+    text = re.sub(r'\s+',' ',text).strip()
+    text = re.sub(r' ?([%s]) ?' % re.escape(around),r'\1',text)
+    return re.sub(r'\x00(\d+)\x00',lambda m: strings[int(m.group(1))],text)
+
+def minify_css(items):
+    """
+    a parsed stylesheet written out with nothing a browser needs left in: no comments, spare
+    whitespace, last semicolons in blocks, or empty rules
+    """
+    out = []
+    for prelude,body in items:
+        if prelude.startswith('@'):
+            head = _squeeze(prelude,',')
+        else:
+            head = ','.join(_squeeze(s,'>+~,') for s in split_selectors(prelude))
+        if body == None:
+            out.append(head + ';')
+        elif isinstance(body,list):
+            inner = minify_css(body)
+            if inner != '':
+                out.append('%s{%s}' % (head,inner))
+        else:
+            decls = _squeeze(body,':;,{}!').replace(';}','}').rstrip(';')
+            if decls != '':
+                out.append('%s{%s}' % (head,decls))
+    return ''.join(out)
+
+def optimize(pages,stylesheet,odir,themes=(),also=(),keep=(),min_count=2):
+    """
+    run the stage (see above) on a list of page files: write the pages (and their --lazy
+    bundles) with the repeated styles hoisted, the generated stylesheet.css and the purged
+    stylesheet.min.css to odir; stylesheet is our stylesheet.css, themes the css it goes on
+    top of, also any other html whose selectors count as used, and keep more class names
+    to count as used
+    returns a dict of sizes in bytes (before and after, the pages counting their bundles) for the
+    report
+    """
+    texts = {}; bundles = {}; counts = {}
+    for page in pages:
+        with open(page,encoding='utf-8') as f:
+            texts[page] = f.read()
+        count_styles(texts[page],counts)
+        if os.path.isfile(bundle_path(page)):
+            with open(bundle_path(page),encoding='utf-8') as f:
+                bundles[page] = json.load(f)
+            for body in bundles[page]['bodies']:
+                count_styles(body,counts)
+    classes = {style:style_class(style) for style,n in counts.items() if n >= min_count}
+
+    os.makedirs(odir,exist_ok=True)
+    used = {k:set(v) for k,v in KEEP.items()}
+    used['classes'].update(keep)
+    sizes = {'pages':0,'pages_hoisted':0,'styles':sum(counts[s] for s in classes),'classes':len(classes)}
+    for page in pages:
+        text = hoist_styles(texts[page],classes)
+        used_selectors(text,used)
+        sizes['pages'] += len(texts[page].encode('utf-8'))
+        sizes['pages_hoisted'] += len(text.encode('utf-8'))
+        out = os.path.join(odir,os.path.basename(page))
+        (write_gzipped if os.path.isfile(page+'.gz') else write_atomic)(out,text)
+        if page in bundles:
+            bundle = bundles[page]
+            bundle['bodies'] = [hoist_styles(body,classes) for body in bundle['bodies']]
+            for body in bundle['bodies']:
+                used_selectors(body,used)
+            data = json.dumps(bundle,separators=(',',':'),ensure_ascii=False)
+            with open(bundle_path(page),encoding='utf-8') as f:
+                sizes['pages'] += len(f.read().encode('utf-8'))
+            sizes['pages_hoisted'] += len(data.encode('utf-8'))
+            (write_gzipped if os.path.isfile(bundle_path(page)+'.gz') else write_atomic)(bundle_path(out),data)
+        for ext in ('','.gz'):
+            if os.path.isfile(index_path(page)+ext):
+                shutil.copyfile(index_path(page)+ext,index_path(out)+ext)
+    for extra in also:
+        with open(extra,encoding='utf-8') as f:
+            used_selectors(f.read(),used)
+
+    with open(stylesheet,encoding='utf-8') as f:
+        ours = f.read()
+    generated = ours + (hoisted_css(classes) if len(classes) > 0 else '')
+    write_atomic(os.path.join(odir,os.path.basename(stylesheet)),generated)
+    sheets = []
+    for theme in themes:
+        with open(theme,encoding='utf-8') as f:
+            sheets.append(f.read())
+    sheets.append(generated)
+    items = []
+    for k,css in enumerate(sheets):
+        items += [(p,b) for p,b in parse_css(css) if k == 0 or not p.lower().startswith('@charset')]
+    kept = purge(items,used)
+    small = minify_css(kept)
+    write_gzipped(os.path.join(odir,re.sub(r'\.css$','',os.path.basename(stylesheet))+'.min.css'),small)
+    sizes['css'] = sum(len(css.encode('utf-8')) for css in sheets[:-1]) + len(ours.encode('utf-8'))
+    sizes['css_min'] = len(small.encode('utf-8'))
+    sizes['css_gz'] = len(gzipped(small.encode('utf-8')))
+    sizes['rules'] = _count(items); sizes['rules_kept'] = _count(kept)
+    return sizes
+
+def _count(items):
+    """
+    the number of rules in a parsed stylesheet, counting those inside @media (etc)
+    """
+    return sum(_count(body) if isinstance(body,list) else 1 for prelude,body in items)
+
+def print_savings(sizes):
+    """
+    a few lines on what the stage saved
+    """
+    print('hoisted %d style attributes into %d classes: pages %.1f kB -> %.1f kB (%.0f%% smaller)' \
+          % (sizes['styles'],sizes['classes'],sizes['pages']/1e3,sizes['pages_hoisted']/1e3,\
+             100.*(sizes['pages']-sizes['pages_hoisted'])/max(sizes['pages'],1)))
+    print('css: %.1f kB -> %.1f kB purged and minified (%.0f%% smaller, %d of %d rules kept), %.1f kB gzipped' \
+          % (sizes['css']/1e3,sizes['css_min']/1e3,100.*(sizes['css']-sizes['css_min'])/max(sizes['css'],1),\
+             sizes['rules_kept'],sizes['rules'],sizes['css_gz']/1e3))
+
+def add_css_args(argparser):
+    """
+    add the options for the stage's inputs to a script's ArgumentParser
+    """
+    argparser.add_argument('--stylesheet',type=str,\
+                    default=os.path.join(os.path.dirname(os.path.abspath(__file__)),'stylesheet.css'),\
+                    help='our stylesheet, that the hoisted classes are added to (default: stylesheet.css here)')
+    argparser.add_argument('--theme',type=str,nargs='*',default=[],\
+                    help='css that stylesheet.css goes on top of (eg a saved copy of the bootstrap theme), to purge along with it')
+    argparser.add_argument('--also',type=str,nargs='*',default=[],\
+                    help='other html whose tags and classes count as used (eg a saved OJS page, for the header and footer)')
+    argparser.add_argument('--keep',type=str,nargs='*',default=[],help='more class names to keep rules for')
+
+if __name__ == '__main__':
+    parser = ArgumentParser()
+    parser.add_argument('pages',type=str,nargs='+',help='converted pages (out_*.html)')
+    parser.add_argument('--odir','-o',type=str,default='css_build',help='directory to write the pages and stylesheets to')
+    add_css_args(parser)
+    args = parser.parse_args()
+    assert all(os.path.isfile(p) for p in args.pages),'page does not exist'
+    assert os.path.abspath(args.odir) not in [os.path.dirname(os.path.abspath(p)) for p in args.pages],\
+           '--odir has to be somewhere other than the pages'
+
+    print_savings(optimize(args.pages,args.stylesheet,args.odir,themes=args.theme,also=args.also,keep=args.keep))
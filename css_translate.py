@@ -0,0 +1,151 @@
+import os
+import re
+import json
+import hashlib
+
+from gdoc_utils import write_atomic
+
+####
+# figure out which html tags the .c# classes in google's inline stylesheet should turn into
+# (eg .c5{font-weight:700} -> <strong>)
+#
+# class_translate does it with a full cssutils parse, which is slow (and noisy) on google's big
+# stylesheets when we only care about a handful of properties on the .c# rules. fast_translate
+# pulls out just those with regexes; translate_table uses it (falling back to cssutils if the
+# css has anything it doesn't understand) and caches the result on disk by a hash of the css.
+####
+
+TRANSLATE_VERSION = 1  # bump if the extraction changes, so cached tables are ignored
+
+_memo = {}  # tables already worked out in this process (eg in --watch mode), by cache key
+
+_comment_re = re.compile(r'/\*.*?\*/',re.S)
+_import_re = re.compile(r'@(import|charset)[^;]*;')
+_rule_re = re.compile(r'([^{}]*)\{([^{}]*)\}')
+_class_re = re.compile(r'^\.[A-Za-z_][\w-]*$')
+_hex6_re = re.compile(r'#([0-9a-fA-F])\1([0-9a-fA-F])\2([0-9a-fA-F])\3\b')
+
+def class_translate(sheet,css_keys,match='.c'):
+    """
+    scan a stylesheet for (.c#) rules and pick out a particular set of css keys
+    return dict of (.c#) keys and html tags that they should get, based on input css_keys dict
+    """
+    translate = {}
+    for rule in sheet:  # loop all rules
+        try:
+            if rule.selectorText.startswith(match):  # find rules matching name criterion
+                ruledict = {}
+                for k in css_keys.keys():  # find style tags that match css_keys top level
+                    if k in rule.style.keys():
+                        ruledict[k] = rule.style[k]
+                rulelist = []
+                if ruledict != {}:
+                    for k in ruledict.keys():  # check whether tag contents need to be translated
+                        if ruledict[k] in css_keys[k].keys():
+                            rulelist.append(css_keys[k][ruledict[k]])
+                if len(rulelist) > 0:
+                    # if tag needs translation, translate it
+                    # NOTE we strip leading . from the rule name
+                    translate[rule.selectorText.split('.')[-1]] = rulelist
+        except AttributeError:
+            pass  # no selectorText, probably the link at the top
+    return translate
+
+def cssutils_translate(css,css_keys,match='.c'):
+    """
+    class_translate on the text of a stylesheet, parsed with cssutils
+    """
+    import cssutils as csu
+    return class_translate(csu.parseString(css),css_keys,match=match)
+
+def _declarations(block):
+    """
+    {property:value} for the declarations in a rule, the way cssutils would report them:
+    names lowercased, whitespace collapsed, !important dropped (but respected), and #aabbcc
+    colors shortened to #abc
+    """
+    decl = {}; important = set()
+    for d in block.split(';'):
+        if ':' not in d:
+            continue
+        name,value = d.split(':',1)
+        name = name.strip().lower()
+        value = ' '.join(value.split())
+        imp = value.lower().endswith('!important')
+        if imp:
+            value = value[:-len('!important')].rstrip()
+        elif name in important:
+            continue  # an earlier !important wins
+        if imp:
+            important.add(name)
+        decl[name] = _hex6_re.sub(r'#\1\2\3',value)
+    return decl
+
+def fast_translate(css,css_keys,match='.c'):
+    """
+    same result as class_translate, but only reads the simple .c# rules out of the css text
+    raises ValueError for anything it can't be sure about (@media blocks, compound selectors
+    starting with the match string), so the caller can fall back to cssutils
+    """
+    css = _import_re.sub('',_comment_re.sub('',css))
+    if '@' in css:
+        raise ValueError('at-rules in stylesheet')
+    translate = {}
+    end = 0
+    for m in _rule_re.finditer(css):
+        if css[end:m.start()].strip() != '':
+            raise ValueError('could not split stylesheet into rules')
+        end = m.end()
+        sel = m.group(1).strip()
+        if not sel.startswith(match):
+            continue
+        if not _class_re.match(sel):
+            raise ValueError('compound selector %s' % sel)
+        decl = _declarations(m.group(2))
+        rulelist = []
+        for k in css_keys.keys():  # same order as class_translate
+            if k in decl and decl[k] in css_keys[k].keys():
+                rulelist.append(css_keys[k][decl[k]])
+        if len(rulelist) > 0:
+            translate[sel[1:]] = rulelist
+    if css[end:].strip() != '':
+        raise ValueError('could not split stylesheet into rules')
+    return translate
+
+def translate_table(css,css_keys,match='.c',cache_dir=None,check=False):
+    """
+    {class:[tag names]} for the text of a stylesheet: from memory or the disk cache in cache_dir
+    if we have seen this css before, else from fast_translate (or cssutils if that can't handle it)
+    check=True also runs cssutils and uses its answer (with a warning) if the two disagree
+    """
+    key = hashlib.sha1(json.dumps([TRANSLATE_VERSION,css,css_keys,match]).encode()).hexdigest()
+    if key in _memo and not check:
+        return dict(_memo[key])
+    cfile = None
+    if cache_dir != None:
+        cfile = os.path.join(cache_dir,'translate_%s.json' % key)
+        if os.path.isfile(cfile) and not check:
+            try:
+                f = open(cfile,'r')
+                translate = dict(json.load(f))
+                f.close()
+                _memo[key] = translate
+                return dict(translate)
+            except ValueError:
+                pass  # broken cache file, just redo it
+
+    try:
+        translate = fast_translate(css,css_keys,match=match)
+    except ValueError:
+        translate = cssutils_translate(css,css_keys,match=match)
+    else:
+        if check:
+            slow = cssutils_translate(css,css_keys,match=match)
+            if list(slow.items()) != list(translate.items()):
+                print('WARNING: fast stylesheet translation differs from cssutils, using cssutils')
+                translate = slow
+
+    if cfile != None:
+        write_atomic(cfile,json.dumps(list(translate.items())))  # list keeps the order
+    _memo[key] = translate
+    return dict(translate)
@@ -0,0 +1,278 @@
+import io
+import os
+import re
+import mmap
+import zipfile
+import tempfile
+from contextlib import contextmanager
+from bs4 import BeautifulSoup, NavigableString
+
+####
+# shared bits for the scripts that parse google-exported html (parse_google_doc.py, parse_faq.py)
+####
+
+CACHE_DIR = '.cache'  # where cached stylesheet tables and rendered sections go
+
+# html parser backends that bs4 knows about, fastest first
+PARSERS = ('lxml','html.parser','html5lib')
+
+KINDS = ('guidelines','faq')  # kinds of document, one script for each
+
+def available_parsers():
+    """
+    list the parser backends that are actually installed here
+    """
+    avail = []
+    for p in PARSERS:
+        if p == 'html.parser':
+            avail.append(p)  # always there, it's in the stdlib
+            continue
+        try:
+            __import__(p)
+            avail.append(p)
+        except ImportError:
+            pass
+    return avail
+
+def default_parser():
+    """
+    pick lxml if it is installed since it is much faster than python's html.parser
+    """
+    return available_parsers()[0]
+
+def read_export(ifile):
+    """
+    read the text of a google-exported html file, or of the html file in the .zip that google
+    gives you for "download as html" (decompressed as it's read, nothing is unpacked to disk)
+    a plain .html file is memory-mapped and decoded straight from the mapping, so there's no
+    bytes copy of it on the way; either way the whole file is read, however many lines it has
+    """
+    if ifile.lower().endswith('.zip'):
+        z = zipfile.ZipFile(ifile)
+        names = [n for n in z.namelist() if n.lower().endswith('.html')]
+        if len(names) == 0:
+            z.close()
+            raise ValueError('no html file in %s' % ifile)
+        f = io.TextIOWrapper(z.open(names[0]),encoding='utf-8')
+        text = f.read()
+        f.close()
+        z.close()
+        return text
+    f = open(ifile,'rb')
+    if os.fstat(f.fileno()).st_size == 0:  # can't map an empty file
+        f.close()
+        return ''
+    m = mmap.mmap(f.fileno(),0,access=mmap.ACCESS_READ)
+    with memoryview(m) as view:
+        text = str(view,'utf-8')
+    m.close()
+    f.close()
+    return text
+
+def guess_kind(ifile,text):
+    """
+    guess whether an export is the faq or guidelines/policies: faq if the filename says so,
+    or if there are no h1 headings but several Q. paragraphs
+    """
+    if 'faq' in os.path.basename(ifile).lower():
+        return 'faq'
+    if '<h1' not in text and len(re.findall(r'>Q\. ',text)) > 1:
+        return 'faq'
+    return 'guidelines'
+
+def out_name(ifile):
+    """
+    output file name for an input file: out_<input name>.html
+    """
+    return 'out_%s.html' % os.path.splitext(os.path.basename(ifile))[0]
+
+@contextmanager
+def atomic_file(path,mode='w'):
+    """
+    a file to write path through: it's a temporary file in the same directory that is renamed
+    to path when the with block ends (and removed if it raises), so nothing reading the file
+    (or another process writing it) ever sees it half-written
+    """
+    pdir = os.path.dirname(path)
+    if pdir != '':
+        os.makedirs(pdir,exist_ok=True)
+    fd,tmp = tempfile.mkstemp(dir=pdir or '.',prefix='.tmp_')
+    mask = os.umask(0); os.umask(mask)
+    try:
+        os.chmod(tmp,0o666 & ~mask)  # mkstemp makes it private; give it the usual permissions
+        f = os.fdopen(fd,mode)
+        with f:
+            yield f
+        os.replace(tmp,path)
+    except BaseException:
+        os.unlink(tmp)
+        raise
+
+def write_atomic(path,text):
+    """
+    write text (or bytes) to a file in one go, via atomic_file
+    """
+    with atomic_file(path,'wb' if isinstance(text,bytes) else 'w') as f:
+        f.write(text)
+
+def load_soup(text,parser=None):
+    """
+    parse the text of a google-exported html file to a soup with the chosen parser backend
+    (or the default one if parser is None)
+    """
+    if parser == None:
+        parser = default_parser()
+    return BeautifulSoup(text,parser)
+
+def shell_html(soup):
+    """
+    serialize the html skeleton of a soup with an empty body (no class), for the output
+    document to be built in; the body is swapped out just long enough to do that
+    """
+    body = soup.body
+    blank = soup.new_tag('body')
+    body.replace_with(blank)
+    skeleton = str(soup)
+    blank.replace_with(body)
+    return skeleton
+
+def style_text(header):
+    """
+    get the css text out of the <style> tag in a (extracted) header
+    .text doesn't work for every backend: html5lib leaves it as a plain string that get_text skips
+    """
+    return ''.join(s for s in header.style.descendants if isinstance(s,NavigableString))
+
+def decompose_all(tags):
+    """
+    decompose a bunch of tags at once (skipping any that are inside another one in the list)
+    tags with the same parent are taken out last-first with their position passed to extract(),
+    since otherwise bs4 searches the parent's contents for each one, which gets quadratic when
+    there are lots of them in a long <body>
+    """
+    byparent = {}
+    for t in tags:
+        if t.parent != None:
+            byparent.setdefault(id(t.parent),(t.parent,[]))[1].append(t)
+    for parent,kids in byparent.values():
+        wanted = set(id(t) for t in kids)
+        pos = [(i,c) for i,c in enumerate(parent.contents) if id(c) in wanted]
+        for i,t in reversed(pos):
+            if not t.decomposed:
+                t.extract(_self_index=i)
+                t.decompose()
+
+def _is_comment_div(div,cmt_class):
+    """
+    whether a div has the comment class, matching the way find_all(class_=cmt_class) does:
+    any one of the classes in the list, or (cmt_class None) no class at all
+    """
+    classes = div.attrs.get('class')
+    if cmt_class == None:
+        return classes == None
+    return classes != None and any(c in classes for c in cmt_class)
+
+def strip_comments(soup):
+    """
+    decompose divs and <a>s from comments, in one walk over the tree
+    the comment divs are recognised by the class of the first div that holds an element with a
+    cmnt... id (assume all comments are the same class, seems safe); that's the outermost div
+    around the first such element that is in a div at all
+    """
+    divs = []; cmnts = []
+    for tag in soup.find_all(True):
+        if tag.name == 'div':
+            divs.append(tag)
+        ident = tag.attrs.get('id')
+        if ident != None and ident.startswith('cmnt'):
+            cmnts.append(tag)
+
+    cmt_class = None; container = None
+    for a in cmnts:
+        for p in a.parents:
+            if p.name == 'div':
+                container = p  # keep going up to the outermost one
+        if container != None:
+            break
+    if container != None:
+        cmt_class = container.attrs.get('class')
+    # NOTE if no comment is inside a div (or there are none), cmt_class stays None and divs with
+    # no class get stripped, which is what find_all('div',class_=None) always did
+    if container == None or cmt_class != None:
+        decompose_all([div for div in divs if _is_comment_div(div,cmt_class)])
+    decompose_all(cmnts)
+    return soup
+
+def chain_index(translate):
+    """
+    index class_translate output ({class:[tag names]}) once, and return a lookup from a span's
+    class list to its whole chain of wrapper tag names (outermost first)
+    chains are memoized per distinct class list, so each span only costs one dict lookup
+    """
+    rank = {k:i for i,k in enumerate(translate.keys())}  # stylesheet order sets nesting order
+    memo = {}
+    def lookup(classes):
+        key = tuple(classes)
+        if key not in memo:
+            hits = sorted(set(c for c in key if c in rank),key=rank.get)
+            memo[key] = [a for c in hits for a in translate[c]]
+        return memo[key]
+    return lookup
+
+def clean_spans(soup,translate={}):
+    """
+    get rid of empty span elements (mostly in guidelines) and translate any classes that 
+    we can figure out (also mostly in guidelines)
+    translate is the output of class_translate; each span gets its full nest of wrapper tags
+    (eg <strong><em>) in one step
+    """
+    chain = chain_index(translate)
+    for sp in soup.find_all('span'):
+        swap_span(soup,sp,chain(sp.attrs.get('class',())))
+    return soup
+
+def swap_span(soup,sp,names):
+    """
+    replace a span with a nest of the tags in names (outermost first), or just unwrap it
+    """
+    if len(names) > 0:
+        outer = inner = soup.new_tag(names[0])
+        for a in names[1:]:
+            tag = soup.new_tag(a)
+            inner.append(tag)
+            inner = tag
+        sp.replace_with(outer)
+        inner.append(sp)
+    sp.unwrap()
+
+def add_cache_args(argparser):
+    """
+    add the options for cached stylesheet tables (and sections) to a script's ArgumentParser
+    """
+    argparser.add_argument('--rebuild',action='store_true',help='ignore anything cached (cold rebuild)')
+    argparser.add_argument('--no-cache',dest='use_cache',action='store_false',\
+                    help="don't use or write any caches")
+    argparser.add_argument('--css-check',action='store_true',\
+                    help='cross-check the fast stylesheet reader against cssutils')
+    return argparser
+
+def add_parser_arg(argparser):
+    """
+    add the --parser option to a script's ArgumentParser
+    """
+    argparser.add_argument('--parser','-p',choices=PARSERS,default=None,\
+                    help='html parser backend for bs4 (default: lxml if installed, else html.parser)')
+    return argparser
+
+def add_stats_arg(argparser):
+    """
+    add the option to print the cleaning rule counts to a script's ArgumentParser
+    """
+    argparser.add_argument('--stats',action='store_true',help='print how many tags each cleaning rule changed')
+
+def print_stats(stats):
+    """
+    print the counts from convert(stats=...), one rule per line
+    """
+    for label,n in stats.items():
+        print('%-12s %d' % (label,n))
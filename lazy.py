@@ -0,0 +1,50 @@
+import re
+import json
+
+####
+# lazy-loaded card bodies (--lazy): the page has only the accordions and card headers, with an
+# empty placeholder for each card body, and the bodies go in a json bundle next to the page
+# (out_x.cards.json). A short script in the page (accordion.LAZY_SCRIPT) fetches the bundle the
+# first time a card is opened and puts the card's body in. Readers mostly open one or two
+# cards, so the page they load is a fraction of the size, and the rest only comes if it's
+# wanted. It needs javascript and a web server (fetch() doesn't read file:// urls), so the
+# all-inline page stays the default, and is still what goes into OJS.
+#
+# the bundle is compact json:
+#   {"v":1, "bodies":[card body html, ...], "cards":{card id: place in bodies}}
+# with each body the whole <div class="card-body"> that the placeholder is swapped for; a
+# body that comes up under several cards (a repeated section) is only in there once
+####
+
+BUNDLE_VERSION = 1
+
+def build_bundle(cards):
+    """
+    the bundle for a list of (card id, card body html)
+    """
+    bodies = []; where = {}; places = {}
+    for card_id,body in cards:
+        if body not in places:
+            places[body] = len(bodies)
+            bodies.append(body)
+        where[card_id] = places[body]
+    return {'v':BUNDLE_VERSION,'bodies':bodies,'cards':where}
+
+def dump_bundle(bundle):
+    """
+    the bundle as compact json
+    """
+    return json.dumps(bundle,separators=(',',':'),ensure_ascii=False)
+
+def bundle_path(ofile):
+    """
+    where the bundle for an output file goes: out_x.html -> out_x.cards.json
+    """
+    return re.sub(r'\.html?$','',ofile) + '.cards.json'
+
+def add_lazy_arg(argparser):
+    """
+    add the --lazy option to a script's ArgumentParser
+    """
+    argparser.add_argument('--lazy',action='store_true',\
+                    help='put the card bodies in a json bundle next to the output, loaded when a card is first opened')
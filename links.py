@@ -0,0 +1,222 @@
+import json
+import functools
+import urllib.parse
+
+from gdoc_utils import read_export, guess_kind, out_name
+
+####
+# links between sections and between documents
+#
+# google exports links to a heading or bookmark in the same doc as href="#h.xxxx" / "#id.xxxx",
+# and links to one in another doc (wrapped in the https://www.google.com/url?q=... redirect
+# like every other external link) as https://docs.google.com/document/d/<doc>/edit#heading=h.xxxx.
+# None of those ids mean anything in our output, where each h2 section is a collapsed card
+# with an id made from its heading.
+#
+# an AnchorIndex maps every id in each document of a run to the card (or accordion) it ends up
+# in; each script adds its document to it in one pass before the cards are built (see
+# anchor_targets in parse_google_doc.py and parse_faq.py), and batch_convert.py indexes all of
+# its documents first so links between them work. A Linker then rewrites one document's links
+# against the index, with each distinct href resolved only once: links to a card on the same
+# page get data-toggle/data-target so the card opens, links to another document point at its
+# output page, and the ones that don't go anywhere are kept for a report.
+#
+# the ids are only unique within a document (google hands out the same stock heading ids, eg
+# h.gjdgxs, in many docs), so they're kept per page: a #h.xxxx link only looks in its own
+# document. A link to another doc names it by google's doc id, which nothing in an export says
+# is which of our pages, so it goes to the one document in the run with that heading id, and is
+# reported as unresolved if more than one has it rather than guessing.
+####
+
+@functools.lru_cache(maxsize=4096)  # (the same links come up again and again)
+def unwrap(href):
+    """
+    the target of a link wrapped in google's redirect (https://www.google.com/url?q=<url>&...)
+    """
+    return urllib.parse.unquote(href.split('?q=')[1].split('&')[0])
+
+def element_ids(tags):
+    """
+    the ids of some tags and of everything in them
+    """
+    ids = []
+    for t in tags:
+        if t.has_attr('id'):
+            ids.append(t.attrs['id'])
+        ids.extend(d.attrs['id'] for d in t.find_all(id=True))
+    return ids
+
+class AnchorIndex:
+    """
+    where each anchor id in a set of documents ends up: {page: {id: (target id, whether the
+    target is a collapsed card)}}, page being the output file of the document (None for the one
+    being converted when there's only one)
+    """
+    def __init__(self):
+        self.anchors = {}
+
+    def add(self,page,targets):
+        """
+        add (or replace) one document's anchors: targets is {anchor id: (target id, collapsed)}
+        """
+        self.anchors[page] = dict(targets)
+
+    def find(self,anchor,page):
+        """
+        (target id, collapsed) for an anchor id in the document written to page, or None if it
+        doesn't have it
+        """
+        return self.anchors.get(page,{}).get(anchor)
+
+    def pages_with(self,anchor):
+        """
+        the pages whose documents have an anchor id
+        """
+        return [page for page,targets in self.anchors.items() if anchor in targets]
+
+class Linker:
+    """
+    resolves the links in one document (written to page) against an AnchorIndex
+    fix is a cleaner rule handler that rewrites a link; scan resolves the links in a section
+    ahead of that and notes any that don't go anywhere in unresolved
+    """
+    def __init__(self,index,page=None):
+        self.index = index
+        self.page = page
+        self.memo = {}  # href: (new href or None to leave it, card to open or None, problem or None, anchor looked up)
+        self.unresolved = []  # {page, section, href, text, problem}
+
+    def resolve(self,href):
+        """
+        what to do with one href (memoized)
+        """
+        if href not in self.memo:
+            self.memo[href] = self._resolve(href)
+        return self.memo[href]
+
+    def _resolve(self,href):
+        if href.startswith('#'):
+            anchor = href[1:]
+            if anchor.startswith(('ftnt','cmnt')):
+                return None, None, None, None  # footnotes (and comments) stay as they are
+            found = self.index.find(anchor,self.page)
+            if found == None:
+                return None, None, 'no heading or bookmark %s in this document' % anchor, anchor
+            return self._target(self.page,found,anchor)
+        if '?q=' not in href:
+            return None, None, None, None  # mailto etc
+        url = unwrap(href)
+        parts = urllib.parse.urlsplit(url)
+        if parts.netloc == 'docs.google.com' and parts.path.startswith('/document/'):
+            key,_,anchor = parts.fragment.partition('=')
+            if key in ('heading','bookmark') and anchor != '':
+                pages = self.index.pages_with(anchor)
+                if len(pages) == 0:
+                    return url, None, 'heading %s is not in any document in this run' % anchor, anchor
+                if len(pages) > 1:  # (the doc id doesn't say which of them it is)
+                    return url, None, 'heading %s is in more than one document in this run (%s)' \
+                           % (anchor,', '.join(str(p) for p in pages)), anchor
+                return self._target(pages[0],self.index.find(anchor,pages[0]),anchor)
+            return url, None, 'link to a google doc, not to one of the converted pages', None
+        return url, None, None, None
+
+    def _target(self,page,found,anchor):
+        target,card = found
+        if page == self.page:
+            return '#%s' % target, '#%s' % target if card else None, None, anchor
+        return '%s#%s' % (page,target), None, None, anchor
+
+    def scan(self,tags,section):
+        """
+        resolve the links in some tags (the ingredients of a section), noting the ones that
+        don't resolve under section; returns [(href, new href, card)] for the links that went
+        through the index (so a cached section can be keyed on where its links point)
+        """
+        deps = []
+        for t in tags:
+            for a in ([t] if t.has_attr('href') else []) + t.find_all(href=True):
+                href = a.attrs['href']
+                new,card,problem,anchor = self.resolve(href)
+                if problem != None:
+                    self.unresolved.append({'page':self.page,'section':section,'href':href,\
+                                            'text':a.text.strip(),'problem':problem})
+                if anchor != None:
+                    deps.append((href,new,card))
+        return deps
+
+    def detached(self):
+        """
+        a copy for fixing links somewhere else (eg in a worker process): it has no index, only
+        the hrefs resolved so far, so scan the tags it's going to fix first
+        """
+        sub = Linker(None,self.page)
+        sub.memo = dict(self.memo)
+        return sub
+
+    def fix(self,tag):
+        """
+        rewrite a tag's href (if it has one that needs it); returns whether it changed
+        """
+        href = tag.attrs.get('href')
+        if href == None:
+            return False
+        new,card = self.resolve(href)[:2]
+        if new == None:
+            return False
+        tag.attrs['href'] = new
+        if card != None:
+            tag.attrs['data-target'] = card
+            tag.attrs['data-toggle'] = 'collapse'
+        return True
+
+def index_file(ifile,kind=None,parser=None):
+    """
+    the anchor targets of an export, for AnchorIndex.add (parses it as far as the script for
+    its kind does before building cards)
+    """
+    text = read_export(ifile)
+    if kind == None:
+        kind = guess_kind(ifile,text)
+    if kind == 'faq':
+        import parse_faq as module
+    else:
+        import parse_google_doc as module
+    return module.index_text(text,parser=parser)
+
+def link_docs(index,docs,parser=None):
+    """
+    add other exports to an index, so links to them resolve: docs are paths, or path=page to
+    say where the document's output goes (default out_<input name>.html)
+    """
+    for doc in docs:
+        ifile,_,page = doc.partition('=')
+        index.add(page or out_name(ifile),index_file(ifile,parser=parser))
+
+def print_unresolved(unresolved,limit=10):
+    """
+    short summary of the links that don't go anywhere
+    """
+    if len(unresolved) == 0:
+        return
+    print('%d links could not be resolved:' % len(unresolved))
+    for u in unresolved[:limit]:
+        print('    %s: %s (%s)' % (u['section'],u['href'],u['problem']))
+    if len(unresolved) > limit:
+        print('    ... (see --link-report)')
+
+def write_unresolved(ofile,unresolved):
+    """
+    save the list of links that don't go anywhere as json
+    """
+    f = open(ofile,'w')
+    json.dump(unresolved,f,indent=1)
+    f.close()
+
+def add_link_args(argparser):
+    """
+    add the --link-docs/--link-report options to a script's ArgumentParser
+    """
+    argparser.add_argument('--link-docs',type=str,nargs='+',default=[],metavar='EXPORT[=PAGE]',\
+                    help='other exports that links can point to (their pages default to out_<name>.html)')
+    argparser.add_argument('--link-report',type=str,default=None,metavar='FILE',\
+                    help='save the links that could not be resolved to FILE (json)')
@@ -0,0 +1,272 @@
+import re
+import gzip
+
+from gdoc_utils import write_atomic
+
+####
+# minified output (--minify): the pages are str() of the soup, so they carry markup that a
+# browser doesn't need. This takes out what the html spec says can go without changing the
+# document the browser builds:
+#   - comments
+#   - runs of whitespace in text, squashed to one space (whitespace-only text between two
+#     block-level tags goes altogether)
+#   - quotes around attribute values that don't need them, ="" on empty ones, and the / on
+#     void elements (<br/> -> <br>)
+#   - end tags the parser puts in by itself: </li> before another <li> or the end of the
+#     list, </p> before a block or the end of its parent, </td>, </th>, </tr>, </thead>,
+#     </tbody>, </body>, </html>
+# everything inside <pre>, <textarea>, <script>, <style> (and inline svg/math) is copied as it
+# is, so whitespace that means something is never touched. An end tag is only dropped when
+# nothing in the element would have closed it early (eg a <div> inside a <p>), since then the
+# parser's idea of where it ends isn't ours.
+#
+# same_dom parses two pages the way a browser does (html5lib) and compares the trees, which is
+# what --minify-check does with the page before and after. A .gz of each file written (at the
+# highest level, with no timestamp so the same page gives the same bytes) goes next to it, for
+# servers that send precompressed files (nginx gzip_static and the like).
+####
+
+VOID = frozenset(('area','base','br','col','embed','hr','img','input','link','meta','param','source','track','wbr'))
+RAW = frozenset(('pre','textarea','script','style','svg','math'))
+BLOCK = frozenset(('html','head','body','title','meta','link','script','style','div','p','ul','ol','li',\
+                   'dl','dt','dd','table','caption','colgroup','col','thead','tbody','tfoot','tr','td','th',\
+                   'h1','h2','h3','h4','h5','h6','hr','blockquote','pre','section','article','aside','nav',\
+                   'header','footer','figure','figcaption','form','fieldset','address','main'))
+# start tags that close an open <p> (not <table>: the pages have no doctype, and in quirks mode
+# a table goes inside the p)
+P_CLOSERS = frozenset(('address','article','aside','blockquote','div','dl','fieldset','figcaption','figure',\
+                       'footer','form','h1','h2','h3','h4','h5','h6','header','hr','main','nav','ol','p',\
+                       'pre','section','ul'))
+P_PARENTS = frozenset(('a','audio','del','ins','map','noscript','video'))  # </p> has to stay in these
+CELLS = ('td','th','tr','thead','tbody','tfoot')
+
+_token = re.compile(r'<!--.*?-->|<![^>]*>|<(/?)([a-zA-Z][^\s/>]*)((?:[^>"\']|"[^"]*"|\'[^\']*\')*)>|[^<]+|<',re.S)
+_attr = re.compile(r'([^\s=/>]+)(?:\s*=\s*("[^"]*"|\'[^\']*\'|[^\s>]+))?')
+_space = re.compile(r'[ \t\n\r\f]+')  # html whitespace: not \xa0 (&nbsp;), which python's \s includes
+_bare = re.compile(r'[^ \t\n\r\f"\'=<>`]+$')
+
+def _tag(end,name,rest):
+    """
+    a start or end tag with its attributes unquoted where they can be
+    """
+    if end:
+        return '</%s>' % name
+    out = ['<',name]
+    for a,v in _attr.findall(rest):
+        if v[:1] in ('"',"'"):
+            v = v[1:-1]
+        if v == '':
+            out.append(' '+a)
+        elif _bare.match(v):
+            out.append(' %s=%s' % (a,v))
+        else:
+            out.append(' %s="%s"' % (a,v.replace('"','&quot;')))
+    out.append('>')
+    return ''.join(out)
+
+def tokens(html):
+    """
+    split html into [(kind, name, markup)]: kind is 'start', 'end', 'text' or 'raw' (kept as it
+    is: doctypes, and elements whose contents mustn't change), name the lowercased tag name
+    """
+    toks = []; pos = 0; n = len(html)
+    low = html.lower() if re.search(r'<(pre|textarea|script|style|svg|math)\b',html,re.I) else html
+    while pos < n:
+        m = _token.match(html,pos)
+        pos = m.end()
+        s = m.group(0)
+        if m.group(2) == None:
+            if s.startswith('<!--'):
+                continue
+            toks.append(('raw' if s.startswith('<!') else 'text',None,s))
+            continue
+        end,name = m.group(1) == '/',m.group(2).lower()
+        if not end and name in RAW:
+            close = low.find('</%s' % name,pos) if name != 'pre' else _pre_end(low,pos)
+            close = n if close < 0 else html.index('>',close) + 1
+            toks.append(('raw',name,s+html[pos:close]))
+            pos = close
+            continue
+        toks.append(('end' if end else 'start',name,_tag(end,name,m.group(3))))
+    return toks
+
+def _pre_end(low,pos):
+    """
+    where the </pre> for a <pre> that starts before pos is, in the lowercased html (a pre can
+    have pres in it)
+    """
+    depth = 1
+    for m in re.compile(r'<(/?)pre[\s>]').finditer(low,pos):
+        depth += -1 if m.group(1) else 1
+        if depth == 0:
+            return m.start()
+    return -1
+
+def _squash(toks):
+    """
+    squash the whitespace in text tokens, dropping it between block-level tags
+    """
+    out = []
+    for k,(kind,name,s) in enumerate(toks):
+        if kind == 'text' and len(out) > 0 and out[-1][0] == 'text':
+            s = out.pop()[2] + s  # a comment that went away can leave two strings side by side
+        if kind == 'text':
+            s = _space.sub(' ',s)
+            if s == ' ':
+                before = out[-1] if len(out) > 0 else None
+                after = toks[k+1] if k+1 < len(toks) else None
+                if (before == None or before[1] in BLOCK) and (after == None or after[1] in BLOCK):
+                    continue
+        out.append((kind,name,s))
+    return out
+
+def _closed_early(stack,name):
+    """
+    mark the open elements that a <name> start tag would end (so their end tags stay)
+    """
+    if name in P_CLOSERS:
+        for e in stack:
+            if e[0] == 'p':
+                e[1] = True
+    if name == 'li':
+        for e in reversed(stack):
+            if e[0] == 'li':
+                e[1] = True
+                break
+            if e[0] in BLOCK and e[0] not in ('address','div','p'):
+                break
+    if name in CELLS:
+        for e in reversed(stack):
+            if e[0] == 'table':
+                break
+            if e[0] in CELLS:
+                e[1] = True
+
+def _optional(name,parent,after):
+    """
+    whether </name> can go when the next token is after (None at the end)
+    """
+    if after == None:
+        return name in ('li','p','td','th','tr','tbody','body','html')
+    kind,nxt = after[0],after[1]
+    if name == 'html':
+        return False
+    if name == 'body':
+        return kind == 'end' and nxt == 'html'
+    if kind == 'end':
+        if name == 'p':
+            return parent not in P_PARENTS
+        return name in ('li','td','th','tr','tbody')
+    if kind != 'start':
+        return False
+    if name == 'p':
+        return nxt in P_CLOSERS
+    return nxt in {'li':('li',),'td':('td','th'),'th':('td','th'),'tr':('tr',),\
+                   'thead':('tbody','tfoot'),'tbody':('tbody','tfoot')}.get(name,())
+
+def minify(html):
+    """
+    the same page with the markup it doesn't need taken out (see above)
+    """
+    toks = _squash(tokens(html))
+    out = []; stack = []  # [name, has to keep its end tag]
+    for k,(kind,name,s) in enumerate(toks):
+        if kind == 'start':
+            _closed_early(stack,name)
+            if name not in VOID:
+                stack.append([name,False])
+        elif kind == 'end':
+            keep = True; parent = None
+            for j in range(len(stack)-1,-1,-1):
+                if stack[j][0] == name:
+                    keep = stack[j][1]
+                    parent = stack[j-1][0] if j > 0 else None
+                    del stack[j:]
+                    break
+            if not keep and _optional(name,parent,toks[k+1] if k+1 < len(toks) else None):
+                continue
+        out.append(s)
+    return ''.join(out)
+
+def _tree(node,keep=False):
+    """
+    a comparable version of a parsed node: (name, attributes, children) for tags, squashed text
+    for strings (unless keep, inside a pre etc), whitespace between block-level tags and
+    comments left out
+    """
+    from bs4 import Tag, Comment, Doctype
+    keep = keep or node.name in RAW
+    kids = []
+    children = list(node.children)
+    for k,c in enumerate(children):
+        if isinstance(c,Tag):
+            kids.append(_tree(c,keep))
+        elif isinstance(c,Doctype):
+            kids.append('<!%s>' % c)
+        elif not isinstance(c,Comment):
+            s = str(c) if keep else _space.sub(' ',str(c))
+            if s == ' ':
+                before = children[k-1] if k > 0 else node
+                after = children[k+1] if k+1 < len(children) else node
+                if all(isinstance(t,Tag) and t.name in BLOCK for t in (before,after)):
+                    continue
+            if len(kids) > 0 and isinstance(kids[-1],str):
+                kids[-1] += s  # the strings either side of a comment
+            else:
+                kids.append(s)
+    attrs = sorted((a,' '.join(v) if isinstance(v,list) else v) for a,v in getattr(node,'attrs',{}).items())
+    return (node.name,attrs,kids)
+
+def same_dom(a,b):
+    """
+    whether two pages give the same document in a browser (parsed with html5lib, which does
+    what browsers do with end tags that aren't there)
+    """
+    from bs4 import BeautifulSoup
+    return _tree(BeautifulSoup(a,'html5lib')) == _tree(BeautifulSoup(b,'html5lib'))
+
+def gzipped(data):
+    """
+    gzip data reproducibly (no timestamp), at the highest level since it's done once per page
+    """
+    return gzip.compress(data,compresslevel=9,mtime=0)
+
+def write_minified(path,text,check=False):
+    """
+    write a page minified, with a .gz next to it; check compares the minified page to the
+    original with same_dom first (ValueError if they differ)
+    returns (original size, minified size, gzipped size) in bytes
+    """
+    small = minify(text)
+    if check and not same_dom(text,small):
+        raise ValueError('minified html for %s is not the same document' % path)
+    data = small.encode('utf-8')
+    gz = gzipped(data)
+    write_atomic(path,data)
+    write_atomic(path+'.gz',gz)
+    return len(text.encode('utf-8')),len(data),len(gz)
+
+def write_gzipped(path,text):
+    """
+    write a file (eg a search index) with a .gz next to it
+    """
+    data = text.encode('utf-8')
+    write_atomic(path,data)
+    write_atomic(path+'.gz',gzipped(data))
+
+def print_sizes(path,sizes):
+    """
+    one line on how much minifying saved
+    """
+    full,small,gz = sizes
+    print('%s: %.1f kB -> %.1f kB minified (%.0f%% smaller), %.1f kB gzipped' \
+          % (path,full/1e3,small/1e3,100.*(full-small)/max(full,1),gz/1e3))
+
+def add_minify_args(argparser):
+    """
+    add the --minify/--minify-check options to a script's ArgumentParser
+    """
+    argparser.add_argument('--minify',action='store_true',\
+                    help='write minified html, with a precompressed .gz next to each file')
+    argparser.add_argument('--minify-check',action='store_true',\
+                    help='--minify, checking that the minified page parses to the same document (needs html5lib)')
@@ -0,0 +1,191 @@
+import re
+
+####
+# the outline of a guidelines/policies doc: its h1s, the h2 sections under each, and (with
+# depth=3) the h3 sections under those, found in one pass over the top-level elements of the
+# body instead of searching each element for each kind of heading and slicing the h2 list for
+# every h1
+#
+# each heading's text and slug (the text as an id: lowercased, punctuation out, spaces to -)
+# are worked out once. The card/accordion ids are the slugs made unique: a heading that comes
+# up again (the same section under several h1s, or two headings that happen to read the same)
+# gets -2, -3... on the end, so each card opens on its own. The plain slug stays the section's
+# name for spotting repeated sections (see shared in parse_google_doc.convert)
+#
+# each section also has the positions of its <table>s, <ol>s and stray <ul>s, for card_body.
+# Positions are in a list of elements, and cleaning the soup takes out empty top-level
+# elements, so locate() finds everything again in the new list; the headings are matched up by
+# identity, so nothing about them is worked out twice
+####
+
+HEADINGS = ('h1','h2','h3')
+
+def slugify(title,words=None):
+    """
+    the slug for a heading's text; with words, just the first that many words of it (any
+    whitespace between them, not only spaces, goes to one -)
+    """
+    slug = re.sub(r'[^\w\s]','',title.lower())
+    if words != None:
+        return '-'.join(slug.split()[:words])
+    return slug.replace(' ','-')  # (spaces mess with acc)
+
+def unique(slug,taken):
+    """
+    slug, or slug-2, slug-3... if that's been handed out already; taken is a dict of the ids
+    handed out so far, to the next number to try for each
+    """
+    n = taken.get(slug)
+    if n == None:
+        taken[slug] = 2
+        return slug
+    new = '%s-%d' % (slug,n)
+    while new in taken:
+        n += 1
+        new = '%s-%d' % (slug,n)
+    taken[slug] = n + 1
+    taken[new] = 2
+    return new
+
+def heading_level(ing,names=HEADINGS):
+    """
+    the level of the heading in a top-level element (1 for an h1 etc), or None if there isn't
+    one; the heading can be the element or be inside it (google puts numbered h2s in one-item
+    <ol>s), and if there are several the highest level wins
+    walks the descendants itself: a loop checking names is several times faster than bs4's
+    find(), which goes through its general-purpose matching for every tag
+    """
+    if ing.name in names:
+        return int(ing.name[1])
+    level = None
+    for t in ing.descendants:
+        if t.name in names:  # (strings have name None)
+            if t.name == 'h1':
+                return 1
+            level = min(level or 9,int(t.name[1]))
+    return level
+
+class Section:
+    """
+    one heading and the elements after it, up to the next heading at the same level or above
+    level is 1-3; start is the position of the heading among the top-level elements, end that
+    of whatever comes after the section, and mark the end of its own elements (where its first
+    child starts, or end); title is the heading text, slug its slug and id the unique one (for
+    an h1, the id of its accordion; for an h2/h3, that of its card's collapse div), head the id
+    of its card's header, and acc the id of the nested accordion of an h2 with h3s
+    tables, ols and uls are the positions of the section's own <table>s, <ol>s, and <ul>s that
+    come right after an <ol> (sub-lists google split off, which go back in the <ol>)
+    """
+    def __init__(self,level,title):
+        self.level = level
+        self.title = title
+        self.slug = slugify(title)
+        self.id = None; self.head = None; self.acc = None
+        self.children = []
+        self.start = None; self.end = None; self.mark = None
+        self.tables = []; self.ols = []; self.uls = []
+
+    def add(self,ingredients,k):
+        """
+        note ingredients[k], one of the section's own elements, if card_body wants to know
+        where it is
+        """
+        name = ingredients[k].name
+        if name == 'table':
+            self.tables.append(k)
+        elif name == 'ol':
+            self.ols.append(k)
+        elif name == 'ul' and k-1 > self.start and ingredients[k-1].name == 'ol':
+            self.uls.append(k)
+
+    def close(self,k):
+        """
+        end the section at position k
+        """
+        self.end = k
+        if self.mark == None:
+            self.mark = k
+
+def lone_section(ingredients,level=2):
+    """
+    a Section for a list of elements that are one section on their own, heading first (eg a
+    section's html parsed again in a worker process)
+    """
+    sect = Section(level,ingredients[0].text.strip() if len(ingredients) > 0 else '')
+    sect.start = 0
+    for k in range(1,len(ingredients)):
+        sect.add(ingredients,k)
+    sect.close(len(ingredients))
+    return sect
+
+class Outline:
+    """
+    the sections of a document (see above), from ingredients, the top-level elements of its
+    body: h1s is the list of h1 Sections, with their h2s as children (and theirs, with depth=3)
+    h2s before the first h1, and h3s before the first h2 under an h1, are just elements, and
+    headings with no text at all aren't headings
+    """
+    def __init__(self,ingredients,depth=2):
+        self.depth = depth
+        self.h1s = []
+        self._heads = []  # (heading element, Section) in document order
+        names = HEADINGS[:depth]
+        stack = []  # the open section at each level
+        for ing in ingredients:
+            level = heading_level(ing,names)
+            if level == None or level > len(stack)+1:
+                continue
+            text = ing.text
+            if text == '':
+                continue  # a blank heading-styled line, which cleaning takes out (cleaner's notext)
+            sect = Section(level,text.strip())
+            del stack[level-1:]
+            (stack[-1].children if level > 1 else self.h1s).append(sect)
+            stack.append(sect)
+            self._heads.append((ing,sect))
+
+        taken = {}
+        for ing,sect in self._heads:
+            sect.id = unique('acc_%s' % sect.slug if sect.level == 1 else sect.slug,taken)
+        for ing,sect in self._heads:
+            if sect.level == 2 and len(sect.children) > 0:
+                sect.acc = unique('acc_%s' % sect.id,taken)
+        for ing,sect in self._heads:
+            if sect.level > 1:
+                sect.head = unique('heading-%s' % sect.id,taken)  # (not the card's id: links open that)
+        self.locate(ingredients)
+
+    def sections(self,level=2):
+        """
+        all the Sections at a level, in document order
+        """
+        return [sect for ing,sect in self._heads if sect.level == level]
+
+    def locate(self,ingredients):
+        """
+        (re)find the positions of everything in ingredients, which has the same heading
+        elements as the list the outline was made from but maybe not the rest
+        """
+        heads = {id(ing):sect for ing,sect in self._heads}
+        for ing,sect in self._heads:
+            sect.start = None; sect.end = None; sect.mark = None
+            sect.tables = []; sect.ols = []; sect.uls = []
+        stack = []; found = 0
+        for k,ing in enumerate(ingredients):
+            sect = heads.get(id(ing))
+            if sect == None:
+                if len(stack) > 0:
+                    stack[-1].add(ingredients,k)
+                continue
+            for s in stack[sect.level-1:]:
+                s.close(k)
+            del stack[sect.level-1:]
+            if len(stack) > 0 and stack[-1].mark == None:
+                stack[-1].mark = k  # its first child
+            sect.start = k
+            stack.append(sect)
+            found += 1
+        for s in stack:
+            s.close(len(ingredients))
+        if found < len(heads):
+            raise ValueError('%d headings are missing from the elements' % (len(heads)-found))
@@ -1,10 +1,18 @@
-import numpy as np
-from bs4 import BeautifulSoup
-import cssutils as csu
-from copy import copy
+from gdoc_utils import read_export, load_soup, shell_html, style_text, strip_comments, add_parser_arg, add_cache_args, add_stats_arg, print_stats, default_parser, write_atomic, atomic_file, guess_kind, CACHE_DIR
+from css_translate import translate_table
+from cleaner import soup_cleaner, body_cleaner
+from profiling import lap, section, tick, profile_convert, write_report, print_report, add_profile_args
+from accordion import card_open, accordion_open, heading, Page, lazy_body, lazy_script, search_box, CARD_CLOSE, ACCORDION_CLOSE
+from watch import watch, newest, pick, add_watch_args
+from links import AnchorIndex, Linker, element_ids, link_docs, print_unresolved, write_unresolved, add_link_args
+from search import build_index, dump_index, index_path, add_search_arg
+from minify import write_minified, write_gzipped, print_sizes, add_minify_args
+from outline import HEADINGS, slugify, unique
+from lazy import build_bundle, dump_bundle, bundle_path, add_lazy_arg
 from argparse import ArgumentParser
 import re
-import urllib
+import time
+import itertools
 import os, sys
 
 ####
@@ -38,103 +46,99 @@ import os, sys
 #
 ####
 
-def strip_comments(soup,cmt_class):
-    """
-    decompose divs and <a>s from comments
-    """
-    for div in soup.find_all('div',class_=cmt_class):
-        div.decompose()
-    for a in soup.find_all(id=re.compile('^cmnt')):
-        a.decompose()
-    return soup
+CHUNK = 50  # questions per accordion, within each category if there are any (0 for one accordion each)
 
-def find_comment_class(soup):
+def classify(ing):
     """
-    figure out what the css tag is for divs around comments so we can strip all of them out
+    what a top-level element is, in one walk over it: ('Q', question) for a question (its
+    first <strong> starts with Q), ('A', strong) for the start of an answer (the <strong> "A."
+    that gets taken out), ('cat', title) for a heading (h1-h3) that starts a category of
+    questions, and (None, None) for anything else (more of an answer, or what comes before the
+    first question)
     """
-    divs = soup.find_all('div')
-    for d in divs:
-        aas = d.find_all(id=re.compile('^cmnt'))
-        if len(aas) > 0:
-            return d.attrs['class']  # assume all comments are the same class (seems safe)
-
-def clean_soup(soup,h6=True,notext=True,aempty=True,sup=True):
+    first = None; heading = False
+    for t in itertools.chain((ing,),ing.descendants):
+        if t.name == 'strong' and first == None:
+            first = t.text
+            if first.startswith('Q'):
+                return 'Q',re.sub(r'^Q\.? ?','',ing.text.strip())
+            if first.startswith('A'):
+                return 'A',t
+        elif t.name in HEADINGS:
+            heading = True
+    if heading:
+        return 'cat',ing.text.strip()
+    return None,None
+
+def get_Q_A(ingredients,chunk=CHUNK):
     """
-    clean up various kinds of empty tags that tend to show up in these files
-    h6 and sup are mainly in the guidelines; notext and aempty are in both, probably?
+    the structure of the faq, classifying each element once: returns the accordions as
+    [(accordion id, category title, position of the category heading, end of its intro,
+    [(start, end, question, card id)])] (title, position and intro None for an accordion that
+    doesn't start a category), each question running from its element at ingredients[start]
+    up to (not including) ingredients[end], and the category's intro (anything between its
+    heading and its first question) from the element after the heading up to the intro's end,
+    and {position: <strong>} for the "A." at the start of each answer
+    category headings each start an accordion, and the questions (in each category, or all of
+    them if there are none) are split into accordions of chunk each, so opening a card doesn't
+    have the page go through thousands: a category with more carries on in more accordions
+    under its heading (an faq with just a title heading is one big category).
+    Card ids are slugs of the questions (made unique, along with the accordion ids), so they
+    stay put when questions are added or moved
     """
-    if h6:
-        for h in soup.find_all('h6'):
-            h.unwrap()
-
-    ingredients = soup.body.find_all(recursive=False)
-    if notext:
-        for ing in ingredients:
-            if ing.text == None or ing.text == '':
-                ing.decompose()
-    if aempty:
-        for a in soup.find_all('a'):
-            if a.string == None:
-                a.decompose()
-    if sup:
-        for s in soup.find_all('sup'):
-            if s.string == None:
-                s.decompose()
-    return soup
-
-def clean_spans(soup,translate={}):
-    """
-    get rid of empty span elements (mostly in guidelines) and translate any classes that 
-    we can figure out (also mostly in guidelines)
-    """
-    for sp in soup.find_all('span'):
-        for k in translate.keys():
-            if 'class' in sp.attrs and k in sp.attrs['class']:
-                for a in translate[k]:
-                    sp.wrap(copy(a))
-        sp.unwrap()
-    return soup
-
+    marks = []  # (position, question or None for a category heading, category title)
+    answers = {}
+    title = None
+    for k,ing in enumerate(ingredients):
+        kind,what = classify(ing)
+        if kind == 'Q':
+            marks.append((k,what,title))
+        elif kind == 'A' and len(marks) > 0:
+            answers[k] = what
+        elif kind == 'cat':
+            title = what
+            marks.append((k,None,title))  # (ends the question before it)
+
+    groups = []; taken = {}
+    base = None  # accordion id of the category the questions are in
+    bounds = [k for k,question,title in marks] + [len(ingredients)]
+    for j,(k,question,title) in enumerate(marks):
+        if question == None:
+            base = unique('acc_%s' % slugify(title,words=8),taken)
+            groups.append((base,title,k,bounds[j+1],[]))
+            continue
+        if len(groups) == 0 or (chunk > 0 and len(groups[-1][4]) >= chunk):
+            groups.append((unique(base or 'acc_%d' % len(groups),taken),None,None,None,[]))
+        card = unique('q-%s' % slugify(question,words=8),taken)  # the first few words are plenty
+        groups[-1][4].append((k,bounds[j+1],question,card))
+    return groups,answers
 
-def get_Q_A(ingredients):
+def anchor_targets(ingredients,groups):
     """
-    from a soup, extract indices of <strong>Q</strong> and <strong>A</strong> lines
-    these will be used to set up accordions
+    for links.AnchorIndex: {id: (target id, collapsed)} for every id in a question or its
+    answer, pointing at its card, or in a category heading or its intro, pointing at its
+    accordion (groups as from get_Q_A)
     """
-    Qind = []; Aind = []
-    for i,ing in enumerate(ingredients):
-        if bool(ing.strong):
-            if ing.strong.text.startswith('Q'):
-                Qind.append(i)
-            if ing.strong.text.startswith('A'):
-                Aind.append(i)
-    return Qind,Aind
-
-def class_translate(sheet,css_keys,match='.c'):
+    targets = {}
+    for acc_id,title,k,intro,questions in groups:
+        if k != None:
+            for a in element_ids(ingredients[k:intro]):
+                targets[a] = (acc_id,False)
+        for start,end,question,card in questions:
+            for a in element_ids(ingredients[start:end]):
+                targets[a] = (card,True)
+    return targets
+
+def index_text(text,parser=None):
     """
-    scan a stylesheet for (.c#) rules and pick out a particular set of css keys
-    return dict of (.c#) keys and html tags that they should get, based on input css_keys dict
+    anchor_targets for the text of an export (for indexing other documents in a run)
     """
-    translate = {}
-    for rule in sheet:  # loop all rules
-        try:
-            if rule.selectorText.startswith(match):  # find rules matching name criterion
-                ruledict = {}
-                for k in css_keys.keys():  # find style tags that match css_keys top level
-                    if k in rule.style.keys():
-                        ruledict[k] = rule.style[k]
-                rulelist = []
-                if ruledict != {}:
-                    for k in ruledict.keys():  # check whether tag contents need to be translated
-                        if ruledict[k] in css_keys[k].keys():
-                            rulelist.append(css_keys[k][ruledict[k]])
-                if len(rulelist) > 0:
-                    # if tag needs translation, translate it
-                    # NOTE we strip leading . from the rule name
-                    translate[rule.selectorText.split('.')[-1]] = rulelist
-        except AttributeError:
-            pass  # no selectorText, probably the link at the top
-    return translate
+    soup = load_soup(text,parser=parser)
+    header = soup.head.extract()
+    soup = strip_comments(soup)
+    soup_cleaner(soup,translate=translate_table(style_text(header),css_keys)).run(soup,top=soup.body)
+    ingredients = soup.body.find_all(recursive=False)
+    return anchor_targets(ingredients,get_Q_A(ingredients)[0])
 
 # here are some css tags that we want to translate, and how we want to translate them
 # NOTE <u> is maybe not best practice? Also here I think it only applies to hyperlinks.
@@ -143,139 +147,217 @@ css_keys = {'font-weight':{'700':'strong'},\
             'text-decoration':{'underline':'u'},\
             'background-color':{'#ff0':'mark'}}
 
-def _has_href(tag):
+def convert(text,parser=None,css_cache=None,css_check=False,stats=None,timer=None,index=None,page=None,\
+            unresolved=None,search=None,out=None,chunk=CHUNK,lazy=None):
     """
-    function to pass to find_all() to get all hyperlinks
+    run the whole conversion on the text of a google-exported html file
+    parser picks the bs4 backend (see gdoc_utils.load_soup); returns the output html as a string,
+    or writes it to out (a file open for writing) card by card as they're done and returns None
+    css_cache is a directory to cache the stylesheet translation in (None for no caching), and
+    css_check cross-checks the fast stylesheet reader against cssutils
+    stats is an optional dict that gets the number of tags each cleaning rule changed, and timer
+    an optional profiling.StageTimer to time each stage (and section)
+    index is a links.AnchorIndex of the other documents in a run that links can point to (this
+    one is added to it), page the name of this document's output file in it, and unresolved an
+    optional list that gets the links that don't go anywhere (see links.Linker)
+    search is an optional dict that gets a search index of the cards (search.build_index) under
+    'index'; if it has a 'url' for that index, a search box for it goes at the top of the page
+    chunk is how many questions go in each accordion (0 for all of a category's in one), see
+    get_Q_A
+    lazy is an optional dict with the 'url' of a bundle of the card bodies (see lazy.py): the
+    page then only has placeholders for them, filled in from the bundle as cards are opened, and
+    the bundle goes in lazy['bundle']
     """
-    return tag.has_attr('href')
-
-if __name__ == '__main__':
-
-    # start by exporting google doc as html and extracting the html file from the zip archive
-    # (we don't need any image files afaik)
-
-    # filename  can be set by command line args
-    # if not  present, we ask for the info via input()
-    parser = ArgumentParser()
-    parser.add_argument('--ifile','-f',metavar='ifile',type=str,help='path to input file')
-    args = parser.parse_args()
-
-    ifile = args.ifile
-    if ifile == None:
-        ifile = input('Enter path to input file: ') or 'Seismica_FAQ.html'
-    assert os.path.isfile(ifile),'file does not exist'
-
-    # set ofile names
-    ofile = 'out_faq.html'
-
-    # then:
-    f = open(ifile,'r') # open html file
-    text = f.readline()  # google docs outputs html as one single line, weirdly
-    f.close()
-    soup = BeautifulSoup(text,'html.parser')  # parse to a soup
+    soup = load_soup(text,parser=parser)  # parse to a soup
     header = soup.head.extract()
     if bool(soup.img): soup.img.decompose()  # get rid of the header image (seismica logo)
         # (only for guidelines, but doesn't hurt ed pol b/c there are no images in it)
+    lap(timer,'parse',[soup])
 
     # deal with css style in header, to some extent
-    style = csu.parseString(header.style.text)  # parses to CSSStyleSheet object
     # we will only look at .c# styles, and find italics, bold, and underline
     #   [info on what is looked for/translated is in css_keys before __main__]
     # we're skipping all the hyper-specific list element formatting at the moment
-    translate_tags = class_translate(style,css_keys)
-    translate = {}  # need to actually make soup tags to wrap things in; do this outside of function
-    for k in translate_tags.keys():
-        translate[k] = []
-        for a in translate_tags[k]:
-            translate[k].append(soup.new_tag(a))
+    # (the table is cached in css_cache by a hash of the css, see css_translate.translate_table)
+    translate = translate_table(style_text(header),css_keys,cache_dir=css_cache,check=css_check)
+    lap(timer,'stylesheet',[soup])
 
     # figure out what the comment div class name is, strip out comments
-    cmt_class = find_comment_class(soup)
-    soup = strip_comments(soup,cmt_class=cmt_class)
-
-    # clean up span formatting, translate to html tags since we can't use css header
-    soup = clean_spans(soup,translate=translate)
-
-    # clean out empty tags etc
-    soup = clean_soup(soup)  # not all apply to ed pol, but that's actually fine
+    soup = strip_comments(soup)
+    lap(timer,'comments',[soup])
 
-    # make a copy of the soup and empty it so we can add things back in
-    bowl = copy(soup)
-    bowl.body.clear()
-    del bowl.body['class']  # for neatness
+    # clean up span formatting, translate to html tags since we can't use css header,
+    # and clean out empty tags etc (all in one walk, see cleaner.py)
+    cleaner = soup_cleaner(soup,translate=translate)
+    cleaner.run(soup,top=soup.body)
+    lap(timer,'clean',[soup])
 
-    # set up generic accordion tags that can be modified later
-    span = bowl.new_tag('span'); span.attrs['class'] = 'pull-left'; span.string = 'heading here'
-    button = bowl.new_tag('button')
-    button.attrs = {'class':"btn btn-lg btn-light btn-block collapsed",\
-                    'type':'button',\
-                    'data-toggle':'collapse',\
-                    'data-target':'#collapse01',\
-                    'aria-expanded':'false',\
-                    'aria-controls':'collapse01'}
-    h2 = bowl.new_tag('h2'); h2.attrs['class'] = 'mb-0'
-    divhead = bowl.new_tag('div'); divhead.attrs = {'id':'heading01','class':'card-header'}
-    divcoll = bowl.new_tag('div')
-    divcoll.attrs = {'id':'collapse01','class':'collapse','aria-labelledby':'heading01',\
-                    'data-parent':'#accid'}
-    divtext = bowl.new_tag('div'); divtext.attrs['class'] = 'card-body';# divtext.string = 'text here'
-    card = bowl.new_tag('div'); card.attrs['class'] = 'card'
+    # skeleton of the output document; the body gets filled in with an accordion from templates,
+    # each card written out (to out, if there is a file to write to) as soon as it's done
+    doc = Page(shell_html(soup),out)
+    if search != None and search.get('url') != None:
+        doc.write(search_box(search['url']))
 
     # go through body of soup element-wise, and deal with each in turn
     ingredients = soup.body.find_all(recursive=False)  # reset list
 
-    # run through ingredients and map out where the headers and such are for overall structure
-    Qind,Aind = get_Q_A(ingredients)
-    Qind.append(len(ingredients))
-
-    # start building the accordion
-    acc_id = 'acc_0'
-    accord = bowl.new_tag('div'); accord.attrs = {'id':acc_id,'class':'accordion'}
-    bowl.body.append(accord)  # we'll insert elements as they are made
-    ic = 0  # counter for collapsible headings
-    for i in range(len(Qind)-1):  # looping questions
-        # put in h1 header for marking
-        ing = ingredients[Qind[i]]  # get the question element
-
-        # go through the A markers, and between each, preserve whatever's there
-        icard = copy(card)
-        accord.append(icard)
-        ispan = copy(span); ispan.string = ing.text.strip().split('Q. ')[1]
-        icard.insert(0,ispan)
-        ibutton = copy(button)
-        ibutton.attrs['data-target'] = '#collapse%02d' % ic
-        ibutton.attrs['aria-controls'] = 'collapse%02d' % ic
-        ispan.wrap(ibutton)
-        ih2 = copy(h2); ibutton.wrap(ih2)
-        idivhead = copy(divhead); idivhead.attrs['id'] = 'heading%02d' % ic
-        ih2.wrap(idivhead)
+    # run through ingredients and map out where the questions, answers and categories are
+    groups,answers = get_Q_A(ingredients,chunk=chunk)
+
+    # map where every id ends up, for the links to them
+    if index == None:
+        index = AnchorIndex()
+    index.add(page,anchor_targets(ingredients,groups))
+    linker = Linker(index,page)
+    tidy = body_cleaner(tables=False,linker=linker)  # links in the card bodies
+    lap(timer,'outline',[soup])
+
+    cards = []  # (card id, question, category, card body) for the search index
+    bodies = []  # (card id, card body) for the lazy bundle
+    for acc_id,title,k,intro,questions in groups:  # looping categories (or chunks of questions)
+        if title != None:
+            doc.write(heading('h1',title))
+            # whatever comes between the heading and the first question goes under the heading
+            linker.scan(ingredients[k+1:intro],acc_id)
+            for j in range(k+1,intro):
+                tidy.run(ingredients[j])
+                doc.write(str(ingredients[j]))
+                ingredients[j].decompose()  # (out of the way, like the questions below)
+        # start building the accordion
+        doc.write(accordion_open(acc_id))
+        for start,end,question,card in questions:  # looping questions
+            doc.write(card_open('heading-%s' % card,card,acc_id,question))
+            section(timer,card)
+            linker.scan(ingredients[start:end],card)  # note links that go nowhere
+            idivtext = soup.new_tag('div'); idivtext.attrs['class'] = 'card-body'
+
+            # go through the answer, and preserve whatever's there
+            for j in range(start+1,end):
+                if j in answers:
+                    answers[j].extract()  # the "A."
+                idivtext.append(ingredients[j])
+            tick(timer,'build')
+            tidy.run(idivtext)  # unwrap hyperlinks that google has wrapped with extra stuff
+            body = str(idivtext)
+            idivtext.decompose()  # done with it (and with the answer paragraphs moved into it)
+            # take the question out of the soup too: moving an element searches its parent's
+            # contents for it, so the questions done have to be out of the way
+            ingredients[start].decompose()
+            tick(timer,'links')
+            cards.append((card,question,title or '',body))
+            if lazy != None:
+                bodies.append((card,body))
+                body = lazy_body(card)  # filled in from the bundle when the card opens
+            doc.write(body)
+            doc.write(CARD_CLOSE)
+        doc.write(ACCORDION_CLOSE)
+    if lazy != None:
+        doc.write(lazy_script(lazy['url']))
+        lazy['bundle'] = build_bundle(bodies)
+    lap(timer,'cards',[soup])
+
+    if search != None:
+        search['index'] = build_index(cards)
+        lap(timer,'search')
+
+    if stats != None:
+        stats.update(cleaner.counts); stats.update(tidy.counts)
+    if unresolved != None:
+        unresolved.extend(linker.unresolved)
+
+    out = doc.close()
+    lap(timer,'render')
+    return out
 
-        idivcoll = copy(divcoll)
-        idivcoll.attrs['id'] = 'collapse%02d' % ic
-        idivcoll.attrs['aria-labelledby'] = 'heading%02d' % ic
-        idivcoll.attrs['data-parent'] = '#%s' % acc_id
-        icard.insert(1,idivcoll)
-
-        idivtext = copy(divtext)
-        idivcoll.insert(0,idivtext)
-        ic += 1
+if __name__ == '__main__':
 
-        for j in range(Qind[i]+1,Qind[i+1]):
-            if ingredients[j].strong.text.startswith('A'):
-                _ = ingredients[j].strong.extract()
-            idivtext.append(ingredients[j])
+    # start by exporting google doc as html; the input can be the zip archive google gives you
+    # or the html file extracted from it (we don't need any image files afaik)
 
-    # unwrap hyperlinks that google has wrapped with extra stuff
-    links = bowl.find_all(_has_href)
-    for link in links:
-        if link.attrs['href'].startswith('#ftnt') or link.attrs['href'].startswith('mailto'):
-            continue
-        link.attrs['href'] = urllib.parse.unquote(link.attrs['href'].split('?q=')[1].split('&')[0])
+    # filename  can be set by command line args
+    # if not  present, we ask for the info via input()
+    parser = ArgumentParser()
+    parser.add_argument('--ifile','-f',metavar='ifile',type=str,help='path to input file')
+    add_parser_arg(parser)
+    add_cache_args(parser)
+    add_stats_arg(parser)
+    add_profile_args(parser)
+    add_watch_args(parser)
+    add_link_args(parser)
+    add_search_arg(parser)
+    add_minify_args(parser)
+    add_lazy_arg(parser)
+    parser.add_argument('--chunk',type=int,default=CHUNK,metavar='N',\
+                    help='questions per accordion, in each category if there are any (default %d, 0 for one accordion per category)' % CHUNK)
+    args = parser.parse_args()
+    args.minify = args.minify or args.minify_check
 
-    # write
-    bowl.smooth()
-    f = open(ofile,'w')
-    #f.write(bowl.prettify())
-    f.write(str(bowl))
-    f.close()
+    # set ofile names
+    ofile = 'out_faq.html'
 
+    index = AnchorIndex()  # headings in the other documents links can point to
+    link_docs(index,args.link_docs,parser=args.parser)
+
+    def run(ifile):
+        """
+        convert one export and write the output (atomically, so nothing ever reads half of it)
+        """
+        text = read_export(ifile)
+        css_cache = CACHE_DIR if args.use_cache and not args.rebuild else None
+        unresolved = []
+        search = {'url':os.path.basename(index_path(ofile))} if args.search else None
+        lazy = {'url':os.path.basename(bundle_path(ofile))} if args.lazy else None
+        kwargs = dict(parser=args.parser,css_cache=css_cache,css_check=args.css_check,index=index,\
+                      unresolved=unresolved,search=search,chunk=args.chunk,lazy=lazy)
+        if args.profile != None or args.cprofile != None:
+            out,report = profile_convert(convert,text,kwargs,cprofile=args.cprofile)
+            report['input'] = ifile; report['parser'] = args.parser or default_parser()
+            if args.profile != None:
+                write_report(args.profile,report)
+            print_report(report)
+            stats = report['rules']
+        elif args.minify:
+            stats = {}
+            out = convert(text,stats=stats,**kwargs)
+        else:
+            # written out card by card as they're done, so the whole page is never in memory
+            stats = {}; out = None
+            with atomic_file(ofile) as f:
+                convert(text,stats=stats,out=f,**kwargs)
+        if args.stats:
+            print_stats(stats)
+        print_unresolved(unresolved)
+        if args.link_report != None:
+            write_unresolved(args.link_report,unresolved)
+
+        # write
+        if args.minify:
+            print_sizes(ofile,write_minified(ofile,out,check=args.minify_check))
+        elif out != None:
+            write_atomic(ofile,out)
+        if search != None:
+            (write_gzipped if args.minify else write_atomic)(index_path(ofile),dump_index(search['index']))
+        if lazy != None:
+            (write_gzipped if args.minify else write_atomic)(bundle_path(ofile),dump_bundle(lazy['bundle']))
+
+    if args.watch != None:
+        # convert the most recently changed export (of this kind) whenever something changes
+        def handle(paths):
+            paths = pick(paths,lambda p: guess_kind(p,read_export(p)) == 'faq')  # skip other docs
+            if len(paths) == 0:
+                return
+            ifile = newest(paths)
+            t0 = time.perf_counter()
+            try:
+                run(ifile)
+                print('%s -> %s (%.2f s)' % (ifile,ofile,time.perf_counter()-t0))
+            except Exception as e:
+                print('%s FAILED: %s: %s' % (ifile,type(e).__name__,e))
+        print('watching %s (ctrl-c to stop)' % args.watch)
+        watch(args.watch,handle,interval=args.interval)
+    else:
+        ifile = args.ifile
+        if ifile == None:
+            ifile = input('Enter path to input file: ') or 'Seismica_FAQ.html'
+        assert os.path.isfile(ifile),'file does not exist'
+        run(ifile)
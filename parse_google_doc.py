@@ -1,12 +1,20 @@
-import numpy as np
-import pandas as pd
-from bs4 import BeautifulSoup
-import cssutils as csu
-from copy import copy
+from gdoc_utils import read_export, load_soup, shell_html, style_text, strip_comments, add_parser_arg, add_cache_args, add_stats_arg, print_stats, default_parser, write_atomic, atomic_file, guess_kind, CACHE_DIR
+from css_translate import translate_table
+from cleaner import soup_cleaner, body_cleaner
+from profiling import lap, section, tick, profile_convert, write_report, print_report, add_profile_args
+from accordion import card_open, accordion_open, heading, Page, nest_in, shared_body, shared_ref, lazy_body, lazy_script, search_box, CARD_CLOSE, ACCORDION_CLOSE, SHARED_SCRIPT
+from section_cache import section_key, cache_path, load_cache, save_cache
+from watch import watch, newest, pick, add_watch_args
+from links import AnchorIndex, Linker, element_ids, link_docs, print_unresolved, write_unresolved, add_link_args
+from search import build_index, dump_index, index_path, add_search_arg
+from minify import write_minified, write_gzipped, print_sizes, add_minify_args
+from outline import Outline, lone_section
+from lazy import build_bundle, dump_bundle, bundle_path, add_lazy_arg
 from argparse import ArgumentParser
-import re
-import urllib
+import time
 import os, sys
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
 
 ####
 # parse google doc of guidelines AND editorial policies (html download) and reformat
@@ -15,13 +23,15 @@ import os, sys
 # TODO:
     # catch for any hdr2 sections that *start* with <ol> or <ul> (ln 344, 'prev' etc)
     # re-combine oddly segmented nested lists? Might be more trouble than it's worth
-    # nested accordions? at least for one spot in policies for data availability/types
-        # and/or other things that are in paragraph-sections (could also reformat as ol post-google)
+    # nested accordions: h3s in a section can be one now (--nest-h3); at least for one spot in policies
+        # for data availability/types, make those h3s? and/or other things that are in paragraph-sections
+        # (could also reformat as ol post-google)
 # TODO for google doc formatting to make this work:
-    # links between sections and between different documents: numbers mean nothing
+    # links between sections and between different documents: numbers mean nothing, link to the
+        # headings themselves (links.py points those at the right cards)
     # weird italicized *Seismica*'s things in ed pol
     # get rid of as many numbered lists as possible
-    # update links (esp cross-document) to the right things, un-highlight
+    # un-highlight links
 
 # for linking to open particular panels in accordion (same page only):
 # <p><a href="#collapseSeven" data-target="#collapseSeven" data-toggle="collapse" data-parent="#accordionExample">link to open seventh panel</a></p>
@@ -49,191 +59,101 @@ import os, sys
 #
 ####
 
-def strip_comments(soup,cmt_class):
+def anchor_targets(soup,outline=None):
     """
-    decompose divs and <a>s from comments
+    for links.AnchorIndex: {id: (target id, collapsed)} for every id in the document, pointing
+    at the card for the h2 section it's in, or the accordion for the h1 if it comes before the
+    first h2 (ids before the first h1 don't end up anywhere)
+    run on the comment-stripped soup before cleaning, so empty bookmark <a>s are still there;
+    outline is the outline.Outline of its top-level elements, if there is one already
     """
-    for div in soup.find_all('div',class_=cmt_class):
-        div.decompose()
-    for a in soup.find_all(id=re.compile('^cmnt')):
-        a.decompose()
-    return soup
-
-def find_comment_class(soup):
-    """
-    figure out what the css tag is for divs around comments so we can strip all of them out
-    """
-    divs = soup.find_all('div')
-    for d in divs:
-        aas = d.find_all(id=re.compile('^cmnt'))
-        if len(aas) > 0:
-            return d.attrs['class']  # assume all comments are the same class (seems safe)
-
-def clean_soup(soup,h6=True,notext=True,aempty=True,sup=True):
-    """
-    clean up various kinds of empty tags that tend to show up in these files
-    h6 and sup are mainly in the guidelines; notext and aempty are in both, probably?
-    """
-    if h6:
-        for h in soup.find_all('h6'):
-            h.unwrap()
-
     ingredients = soup.body.find_all(recursive=False)
-    if notext:
-        for ing in ingredients:
-            if ing.text == None or ing.text == '':
-                ing.decompose()
-    if aempty:
-        for a in soup.find_all('a'):
-            if a.string == None:
-                a.decompose()
-    if sup:
-        for s in soup.find_all('sup'):
-            if s.string == None:
-                s.decompose()
-    return soup
-
-def clean_spans(soup,translate={}):
+    if outline == None:
+        outline = Outline(ingredients)
+    targets = {}
+    for h1 in outline.h1s:
+        for a in element_ids(ingredients[h1.start:h1.mark]):
+            targets[a] = (h1.id,False)
+        for h2 in h1.children:
+            for a in element_ids(ingredients[h2.start:h2.end]):
+                targets.setdefault(a,(h2.id,True))
+    return targets
+
+def index_text(text,parser=None):
     """
-    get rid of empty span elements (mostly in guidelines) and translate any classes that 
-    we can figure out (also mostly in guidelines)
+    anchor_targets for the text of an export (for indexing other documents in a run)
     """
-    for sp in soup.find_all('span'):
-        for k in translate.keys():
-            if 'class' in sp.attrs and k in sp.attrs['class']:
-                for a in translate[k]:
-                    sp.wrap(copy(a))
-        sp.unwrap()
-    return soup
+    soup = load_soup(text,parser=parser)
+    soup.head.extract()
+    return anchor_targets(strip_comments(soup))
 
-
-def get_h1_h2(ingredients):
-    """
-    from a soup, extract indices of elements that contain h1 or h2 tags
-    hdr1 has one extra element added for fenceposting
-    """
-    hdr1 = []; hdr2 = []
-    hdr1_text = []; hdr2_text = []
-    for i,ing in enumerate(ingredients):
-        if bool(ing.h1) or ing.name == 'h1':
-            hdr1.append(i)
-            gettext = ing.text.lower()
-            gettext = re.sub(r'[^\w\s]','',gettext)  # strip out punctuation
-            hdr1_text.append(gettext.replace(' ','-'))  # (messes with acc)
-        elif bool(ing.h2):
-            hdr2.append(i)
-            gettext = ing.text.lower()
-            gettext = re.sub(r'[^\w\s]','',gettext)
-            hdr2_text.append(gettext.replace(' ','-'))
-    hdr1.append(len(ingredients)+1)  # dummy entry for EOL
-    hdr1 = np.array(hdr1); hdr2 = np.array(hdr2)
-    return hdr1, hdr2, hdr1_text, hdr2_text
-
-def class_translate(sheet,css_keys,match='.c'):
+def _start(ol):
     """
-    scan a stylesheet for (.c#) rules and pick out a particular set of css keys
-    return dict of (.c#) keys and html tags that they should get, based on input css_keys dict
+    the start number of an <ol> (google always sets one, but just in case)
     """
-    translate = {}
-    for rule in sheet:  # loop all rules
-        try:
-            if rule.selectorText.startswith(match):  # find rules matching name criterion
-                ruledict = {}
-                for k in css_keys.keys():  # find style tags that match css_keys top level
-                    if k in rule.style.keys():
-                        ruledict[k] = rule.style[k]
-                rulelist = []
-                if ruledict != {}:
-                    for k in ruledict.keys():  # check whether tag contents need to be translated
-                        if ruledict[k] in css_keys[k].keys():
-                            rulelist.append(css_keys[k][ruledict[k]])
-                if len(rulelist) > 0:
-                    # if tag needs translation, translate it
-                    # NOTE we strip leading . from the rule name
-                    translate[rule.selectorText.split('.')[-1]] = rulelist
-        except AttributeError:
-            pass  # no selectorText, probably the link at the top
-    return translate
-
-def _ol_info(idivtext):
+    return int(ol.attrs.get('start',1))
+
+def _move_into(parent,into):
     """
-    get start numbers and #items in each ol in a chunk of stuff
+    move children of parent into other tags: into maps positions in parent.contents to the tag
+    each one should be appended to (in order); they are all taken out first, last-first with
+    their positions, so bs4 doesn't have to search the contents for each one
     """
-    ols = idivtext.find_all('ol',recursive=False)
-    if len(ols) > 1:
-        lis = np.zeros(len(ols),dtype=int); sts = np.zeros(len(ols),dtype=int)
-        for io,ol in enumerate(ols):
-            # count li elements at level 1
-            lis[io] = len(ol.find_all('li',recursive=False))
-            # get start #s
-            sts[io] = int(ol.attrs['start'])
-    return ols, sts, lis
-
-def check_whose(idivtext):
+    kids = parent.contents
+    moving = [(i,kids[i]) for i in sorted(into.keys())]
+    for i,kid in reversed(moving):
+        kid.extract(_self_index=i)
+    for i,kid in moving:
+        into[i].append(kid)
+
+def nest_ols(idivtext,tops=None):
     """
-    test whether any bits of <ol> set are un-nested
+    put split and mis-nested <ol>s back together, along with the extra bits (<p>, <ul> etc)
+    that fell between the chunks, in one sweep over the top-level elements of a card body
+    google starts a new <ol> whenever something else comes in the middle of a numbered list
+    (a paragraph, a sub-list), with start set to carry on the numbering. Going down the
+    elements we keep the chunk of the list that is open and the number it expects next: an <ol>
+    that starts at that number opens the next chunk, and everything else from the first <ol> to
+    the last one (including <ol>s that don't carry on the numbering, ie sub-lists) goes in the
+    open chunk
+    tops is where the top-level <ol>s are in idivtext.contents, if that's known already
     """
-    ols = idivtext.find_all('ol',recursive=False)
-    # check if we need to recursively nest any ols
-    if len(ols) > 1:
-        ol_list,sts,lis = _ol_info(idivtext)
-        # see if sts and li are consistent with each other
-        whose = np.cumsum(lis)[:-1] + 1 == sts[1:] 
-        return np.all(whose)
-    else:
-        return True  # only one <ol>, everything is fine (or had better be)
-
-
-def nest_in_between(idivtext):
-    """
-    nest extra bits (<p> etc) that fell between chunks of <ol>
-    """
-    ols = idivtext.find_all('ol',recursive=False)
-    # check if we need to recursively nest any ols
-    if len(ols) > 1:
-        ol_list,sts,lis = _ol_info(idivtext)
-        # see if sts and li are consistent with each other
-        whose = np.cumsum(lis)[:-1] + 1 == sts[1:]
-        for io in range(len(ol_list)-1):
-            if ol_list[io].next_sibling.name != 'ol':  # something to append
-                for g in ol_list[io].next_siblings:
-                    if g == ol_list[io+1]:
-                        break
-                    else:
-                        toadd = g.extract()
-                        ol_list[io].append(toadd)
-
+    kids = idivtext.contents
+    if tops == None:
+        tops = [i for i,kid in enumerate(kids) if kid.name == 'ol']
+    if len(tops) < 2:
+        return idivtext  # only one <ol>, everything is fine (or had better be)
+
+    into = {}
+    ol = kids[tops[0]]; nxt = len(ol.find_all('li',recursive=False)) + 1
+    for i in range(tops[0]+1,tops[-1]+1):
+        kid = kids[i]
+        if kid.name == 'ol' and _start(kid) == nxt:
+            ol = kid; nxt += len(kid.find_all('li',recursive=False))
+        else:
+            into[i] = ol
+    _move_into(idivtext,into)
     return idivtext
 
 def nest_lis(idivtext):
     """
-    put <p> and similar elements that fall in <ol> but not <li> in <li>
-    doesn't actually work at the moment (31 May 2022)
-    or maybe sort of works but would need to be run iteratively or something?
-    basically google docs does not understand lists with multiple paragraphs per <li>
+    put <p> and similar elements that fall in <ol> but not <li> in the <li> before them
+    basically google docs does not understand lists with multiple paragraphs per <li>, so they
+    come out as separate elements after the item (which nest_ols then puts in the <ol>)
+    anything before the first <li> of a list is left where it is
     """
-    ols = idivtext.find_all('ol',recursive=False)
-
-    for ol in ols:
-        lis = ol.find_all('li',recursive=False)
-        ing = ol.find_all(recursive=False)
-        if len(lis) != len(ing):  # there are elements that are not in list items
-            if len(lis) > 1:
-                for il in range(len(lis)-1):
-                    if lis[il].next_sibling.name != 'li':
-                        for g in lis[il].next_siblings:
-                            if g == lis[il+1]:
-                                break
-                            else:
-                                toadd = g.extract()
-                                lis[il].append(toadd)
-            else:
-                if lis[0].next_sibling.name != 'li':
-                    for g in lis[0].next_siblings:
-                        toadd = g.extract()
-                        lis[0].append(toadd)
+    for ol in idivtext.find_all('ol'):
+        into = {}; li = None
+        for i,kid in enumerate(ol.contents):
+            if kid.name == 'li':
+                li = kid
+            elif li != None:
+                into[i] = li
+        _move_into(ol,into)
     return idivtext
 
+SECTION_BATCH = 1 << 16  # characters of section html to send to a worker process at a time (with --jobs)
+
 # here are some css tags that we want to translate, and how we want to translate them
 # NOTE <u> is maybe not best practice? Also here I think it only applies to hyperlinks.
 css_keys = {'font-weight':{'700':'strong'},\
@@ -241,222 +161,414 @@ css_keys = {'font-weight':{'700':'strong'},\
             'text-decoration':{'underline':'u'},\
             'background-color':{'#ff0':'mark'}}
 
-def _has_href(tag):
+def card_body(soup,ingredients,sect,nest=False,timer=None):
     """
-    function to pass to find_all() to get all hyperlinks
+    make the <div class="card-body"> for a section (an outline.Section, with positions in
+    ingredients): move its own elements in, give tables a header row, put stray <ul>s back in
+    their <ol>, and fix up mis-nested/split <ol>s
+    nest=True also moves things that end up loose in an <ol> into the <li> before them
+    timer is an optional profiling.StageTimer, with a section started for this one
     """
-    return tag.has_attr('href')
-
-if __name__ == '__main__':
-
-    # start by exporting google doc as html and extracting the html file from the zip archive
-    # (we don't need any image files afaik)
-
-    # filename and type (guidelines or not, ie editorial policies) can be set by command line args
-    # if those aren't present, we ask for the info via input()
-    parser = ArgumentParser()
-    parser.add_argument('--ifile','-f',metavar='ifile',type=str,help='path to input file')
-    args = parser.parse_args()
-
-    ifile = args.ifile
-    if ifile == None:
-        ifile = input('Enter path to input file: ') or 'combined_doc.html'
-    assert os.path.isfile(ifile),'file does not exist'
-
-    # set ofile names
-    ofile = 'out_allthings.html'
+    idivtext = soup.new_tag('div'); idivtext.attrs['class'] = 'card-body'
+
+    uls = set(sect.uls)
+    for k in range(sect.start+1,sect.mark):
+        ing = ingredients[k]
+        if k in uls:  # put this back in the hierarchy with the previous ol
+            # it's the last thing in idivtext, so the last <ol> in there is in it
+            prev = ingredients[k-1]
+            prev = (prev.find_all('ol') or [prev])[-1]
+            prev.append(ing.extract())
+        else:
+            idivtext.append(ing)
+
+    for k in sect.tables:  # this should be the reviewer recommendations table
+        ing = ingredients[k]
+        ing.attrs['class'] = 'table'
+        if not bool(ing.thead):  # no header line, need to make the first row a header
+            first_row = ing.tr.extract()
+            thead = soup.new_tag('thead')
+            ing.insert(0,thead)
+            thead.append(first_row)
+            for td in first_row.find_all('td'):
+                td.wrap(soup.new_tag('th'))
+                td.unwrap()
+    tick(timer,'build')
+
+    # check <ol>s within this card; if the first one has start != 1, reset it
+    # (this happens at one particular point in the reviewer guidelines at the moment)
+    first = idivtext.find('ol')
+    if first != None:
+        first.attrs['start'] = '1'
+
+    # put split/mis-nested <ol>s back together, and (optionally) stray bits into their <li>s;
+    # the <ol>s' places in the card body are the outline's, less the <ul>s that went into them
+    tops = []; j = 0
+    for k in sect.ols:
+        while j < len(sect.uls) and sect.uls[j] < k:
+            j += 1
+        tops.append(k-sect.start-1-j)
+    idivtext = nest_ols(idivtext,tops)
+    if nest:
+        idivtext = nest_lis(idivtext)
+    tick(timer,'lists')
+    return idivtext
 
-    # then:
-    f = open(ifile,'r') # open html file
-    text = f.readline()  # google docs outputs html as one single line, weirdly
-    f.close()
-    soup = BeautifulSoup(text,'html.parser')  # parse to a soup
+def build_sections(fragments,nest=False,linker=None):
+    """
+    card_body and the link/table fixes for some sections given as html (each one's heading and
+    the elements up to the next), in a worker process; linker is a links.Linker that has their
+    links resolved (Linker.detached, after scanning them)
+    returns [(card body html, cleaning rule counts)]
+    """
+    built = []
+    for fragment in fragments:
+        # html.parser gives back the tree the html came from; lxml and html5lib would re-nest
+        # things the way a browser does
+        soup = load_soup(fragment,parser='html.parser')
+        ingredients = soup.find_all(recursive=False)
+        idivtext = card_body(soup,ingredients,lone_section(ingredients),nest=nest)
+        tidy = body_cleaner(linker=linker)
+        tidy.run(idivtext)
+        built.append((str(idivtext),tidy.counts))
+    return built
+
+def convert(text,parser=None,cache=None,css_cache=None,css_check=False,stats=None,timer=None,nest=False,\
+            shared='copy',index=None,page=None,unresolved=None,search=None,out=None,pool=None,nest_h3=False,\
+            lazy=None):
+    """
+    run the whole conversion on the text of a google-exported html file
+    parser picks the bs4 backend (see gdoc_utils.load_soup); returns the output html as a string,
+    or writes it to out (a file open for writing) card by card as they're done and returns None
+    cache is an optional dict of rendered card bodies from section_cache.load_cache: unchanged
+    sections are taken from it, and it is updated in place to hold this document's sections
+    css_cache is a directory to cache the stylesheet translation in (None for no caching), and
+    css_check cross-checks the fast stylesheet reader against cssutils
+    stats is an optional dict that gets the number of tags each cleaning rule changed, and timer
+    an optional profiling.StageTimer to time each stage (and section)
+    nest=True puts paragraphs etc that google left between list items into the <li>s (nest_lis)
+    nest_h3=True makes the h3s in an h2 section cards of their own, in an accordion at the end
+    of its card body (links into them, and repeated sections, go by the whole h2 card)
+    shared is what to do with an h2 section that appears again (same heading and contents) under
+    another h1: 'copy' writes out the same html again, 'ref' leaves an empty card body there and
+    adds a script that copies in the first one when the page loads (smaller page, needs js)
+    index is a links.AnchorIndex of the other documents in a run that links can point to (this
+    one is added to it), page the name of this document's output file in it, and unresolved an
+    optional list that gets the links that don't go anywhere (see links.Linker)
+    search is an optional dict that gets a search index of the cards (search.build_index) under
+    'index'; if it has a 'url' for that index, a search box for it goes at the top of the page
+    lazy is an optional dict with the 'url' of a bundle of the card bodies (see lazy.py): the
+    page then only has placeholders for them, filled in from the bundle as cards are opened, and
+    the bundle goes in lazy['bundle'] (shared is ignored, since the bundle has each body once)
+    pool is an optional concurrent.futures executor (of processes) to build the sections in,
+    see build_sections; the output is the same either way
+    """
+    soup = load_soup(text,parser=parser)  # parse to a soup
     header = soup.head.extract()
     if bool(soup.img): soup.img.decompose()  # get rid of the header image (seismica logo)
         # (only for guidelines, but doesn't hurt ed pol b/c there are no images in it)
+    lap(timer,'parse',[soup])
 
     # deal with css style in header, to some extent
-    style = csu.parseString(header.style.text)  # parses to CSSStyleSheet object
     # we will only look at .c# styles, and find italics, bold, and underline
     #   [info on what is looked for/translated is in css_keys before __main__]
     # we're skipping all the hyper-specific list element formatting at the moment
-    translate_tags = class_translate(style,css_keys)
-    translate = {}  # need to actually make soup tags to wrap things in; do this outside of function
-    for k in translate_tags.keys():
-        translate[k] = []
-        for a in translate_tags[k]:
-            translate[k].append(soup.new_tag(a))
+    # (the table is cached in css_cache by a hash of the css, see css_translate.translate_table)
+    translate = translate_table(style_text(header),css_keys,cache_dir=css_cache,check=css_check)
+    lap(timer,'stylesheet',[soup])
 
     # figure out what the comment div class name is, strip out comments
-    cmt_class = find_comment_class(soup)
-    soup = strip_comments(soup,cmt_class=cmt_class)
-
-    # clean up span formatting, translate to html tags since we can't use css header
-    soup = clean_spans(soup,translate=translate)
-
-    # clean out empty tags etc
-    soup = clean_soup(soup)  # not all apply to ed pol, but that's actually fine
-
-    # make a copy of the soup and empty it so we can add things back in
-    bowl = copy(soup)
-    bowl.body.clear()
-    del bowl.body['class']  # for neatness
-
-    # set up generic accordion tags that can be modified later
-    span = bowl.new_tag('span'); span.attrs['class'] = 'pull-left'; span.string = 'heading here'
-    button = bowl.new_tag('button')
-    button.attrs = {'class':"btn btn-lg btn-light btn-block collapsed",\
-                    'type':'button',\
-                    'data-toggle':'collapse',\
-                    'data-target':'#collapse01',\
-                    'aria-expanded':'false',\
-                    'aria-controls':'collapse01'}
-    h2 = bowl.new_tag('h2'); h2.attrs['class'] = 'mb-0'
-    divhead = bowl.new_tag('div'); divhead.attrs = {'id':'heading01','class':'card-header'}
-    divcoll = bowl.new_tag('div')
-    divcoll.attrs = {'id':'collapse01','class':'collapse','aria-labelledby':'heading01',\
-                    'data-parent':'#accid'}
-    divtext = bowl.new_tag('div'); divtext.attrs['class'] = 'card-body';# divtext.string = 'text here'
-    card = bowl.new_tag('div'); card.attrs['class'] = 'card'
+    soup = strip_comments(soup)
+    lap(timer,'comments',[soup])
+
+    # outline the document (the headings, their ids and what is in each section, see outline.py)
+    # and map where every heading/bookmark id ends up, for the links to them
+    outline = Outline(soup.body.find_all(recursive=False),depth=3 if nest_h3 else 2)
+    if index == None:
+        index = AnchorIndex()
+    index.add(page,anchor_targets(soup,outline))
+    linker = Linker(index,page)
+    lap(timer,'anchors',[soup])
+
+    # clean up span formatting, translate to html tags since we can't use css header,
+    # and clean out empty tags etc (all in one walk, see cleaner.py)
+    cleaner = soup_cleaner(soup,translate=translate)  # not all apply to ed pol, but that's fine
+    cleaner.run(soup,top=soup.body)
+    lap(timer,'clean',[soup])
+    tidy = body_cleaner(linker=linker)  # links and tables in the card bodies
+
+    # skeleton of the output document; the body gets filled in with accordions from templates,
+    # each card written out (to out, if there is a file to write to) as soon as it's done
+    doc = Page(shell_html(soup),out)
+    if search != None and search.get('url') != None:
+        doc.write(search_box(search['url']))
 
     # go through body of soup element-wise, and deal with each in turn
     ingredients = soup.body.find_all(recursive=False)  # reset list
-    # run through ingredients and map out where the headers and such are for overall structure
-    hdr1, hdr2, h1text, h2text = get_h1_h2(ingredients)
+    outline.locate(ingredients)  # the cleaning took out some (empty) elements
+
+    # sections that show up under more than one h1 are only built once: same has the (heading
+    # slug, content hash) of each one whose heading comes up again, and the repeats reuse the
+    # card body of the first (see shared); the hash leaves out the heading itself, which google
+    # gives a new id in each copy. This is worked out up front, since the first copy is written
+    # out before the repeats are reached
+    repeated = {t for t,n in Counter(sect.slug for sect in outline.sections()).items() if n > 1}
+    options = {'nest':True} if nest else None  # for section_key
+    same = {sect.start:(sect.slug,section_key(ingredients[sect.start+1:sect.end],translate,options))\
+            for sect in outline.sections() if sect.slug in repeated}
+    copies = Counter(same.values())
+    labels = {}  # (slug, hash) of each shared card body: label the repeats refer to it by (shared='ref')
+    if shared == 'ref' and lazy == None:  # (the lazy bundle only has each body once anyway)
+        labels = {key:'%s-%s' % (key[0],key[1][:8]) for key,n in copies.items() if n > 1}
+    lap(timer,'outline',[soup])
+
+    # work out where each card body comes from, in document order: an earlier copy of the same
+    # section, the section cache, or building it from the section's elements. With a pool, the
+    # ones to build are all sent off to it here (as html), to run while the page is written
+    jobs = []; batch = []; size = 0  # sections for the pool, sent a batch at a time
+    def source(sect):
+        """
+        (source, cache key, cached body or (job, place in its batch)) for a section's own elements
+        """
+        nonlocal batch, size
+        # resolve its links (and note the ones that don't go anywhere)
+        deps = linker.scan(ingredients[sect.start:sect.mark],sect.id)
+
+        # if this section is unchanged since the last run, reuse its rendered card body
+        # (if it links to other sections, only if they are still where they were)
+        key = None
+        if cache != None:
+            key = section_key(ingredients[sect.start:sect.mark],translate,\
+                              dict(options or {},links=deps) if len(deps) > 0 else options)
+        if key != None and key in cache:
+            return 'cached',key,cache[key]
+        if pool == None:
+            return 'build',key,None
+        batch.append(''.join(str(t) for t in ingredients[sect.start:sect.mark]))
+        where = (len(jobs),len(batch)-1)
+        size += len(batch[-1])
+        if size >= SECTION_BATCH:
+            jobs.append(pool.submit(build_sections,batch,nest,linker.detached()))
+            batch = []; size = 0
+        return 'pool',key,where
+
+    plan = []  # for each h1: (h2 section, source, cache key, what, [(h3 section, source, cache key, what)])
+    planned = set()  # (slug, hash) of the repeated sections that have a first copy
+    for h1 in outline.h1s:
+        plan.append([])
+        for sect in h1.children:
+            if same.get(sect.start) in planned:
+                plan[-1].append((sect,'duplicate',None,None,[]))
+                continue
+            if sect.start in same:
+                planned.add(same[sect.start])
+            plan[-1].append((sect,)+source(sect)+([(sub,)+source(sub) for sub in sect.children],))
+    if len(batch) > 0:
+        jobs.append(pool.submit(build_sections,batch,nest,linker.detached()))
+
+    everything = {}  # (slug, hash): card body of the first copy
+    cards = []  # (card id, title, h1 title, card body) for the search index
+    used = {}  # card bodies for the section cache, reused or new
+    bodies = []  # (card id, card body) for the lazy bundle
+    def body_of(sect,source,key,what):
+        """
+        the card body for a section that isn't a repeat, from wherever the plan says
+        """
+        if source == 'cached':
+            body = what
+            tick(timer,'cached')
+        elif source == 'pool':
+            body,counts = jobs[what[0]].result()[what[1]]
+            for rule,n in counts.items():
+                tidy.counts[rule] += n
+            tick(timer,'pool')
+        else:
+            idivtext = card_body(soup,ingredients,sect,nest=nest,timer=timer)
+            tidy.run(idivtext)  # links and table borders
+            body = str(idivtext)
+            idivtext.decompose()  # done with it (and with the elements moved into it)
+            tick(timer,'links')
+        if key != None:
+            used[key] = body
+        return body
 
-    everything = {}  # dict for holding content so we can transfer duplicates
     # SPLIT HERE for ed pol vs guidelines in main loop
-    for i in range(len(hdr1)-1):  # looping level 1 (Authors, Reviewers, Editors)
-        # put in h1 header for marking
-        h1 = ingredients[hdr1[i]]  # get the h1 element
-        new = bowl.new_tag('h1'); new.string = h1.text   # make a new tag for it
-        bowl.body.append(new)
-
-        # start building the accordion
-        acc_id = 'acc_%s' % h1text[i]  # id from section head - long but at least not arbirtray
-        accord = bowl.new_tag('div'); accord.attrs = {'id':acc_id,'class':'accordion'}
-        bowl.body.append(accord)  # we'll insert elements as they are made
-
-        # go through the h2 markers, and between each, preserve whatever's there
-        ic = 0  # counter for collapsible headings
-        hdr2_use = hdr2[np.logical_and(hdr2>hdr1[i],hdr2<hdr1[i+1])]
-        hdr2_use = np.append(hdr2_use,hdr1[i+1])  # bookends again
-        h2t_use = np.array(h2text)[np.logical_and(hdr2>hdr1[i],hdr2<hdr1[i+1])]
-        h2t_use = np.append(h2t_use,'x')  # bookends again
-        for j in range(len(hdr2_use)-1):
-            icard = copy(card)
-            accord.append(icard)
-            ing = ingredients[hdr2_use[j]]
-            ispan = copy(span); ispan.string = ing.text.strip()
-            icard.insert(0,ispan)
-            ibutton = copy(button)
-            ibutton.attrs['data-target'] = '#%s' % h2t_use[j]
-            ibutton.attrs['aria-controls'] = '%s' % h2t_use[j]
-            ispan.wrap(ibutton)
-            ih2 = copy(h2); ibutton.wrap(ih2)
-            idivhead = copy(divhead); idivhead.attrs['id'] = '%s' % h2t_use[j] #'heading%02d' % ic
-            ih2.wrap(idivhead)
-
-            idivcoll = copy(divcoll)
-            idivcoll.attrs['id'] = '%s' % h2t_use[j]
-            idivcoll.attrs['aria-labelledby'] = '%s' % h2t_use[j] # 'heading%02d' % ic
-            idivcoll.attrs['data-parent'] = '#%s' % acc_id
-            icard.insert(1,idivcoll)
+    for i,h1 in enumerate(outline.h1s):  # looping level 1 (Authors, Reviewers, Editors)
+        # put in h1 header for marking, and start building the accordion
+        doc.write(heading('h1',ingredients[h1.start].text))
+        doc.write(accordion_open(h1.id))
 
+        # go through the h2 sections, and in each, preserve whatever's there
+        for sect,source,key,what,subs in plan[i]:
+            doc.write(card_open(sect.head,sect.id,h1.id,sect.title))
+            section(timer,sect.id)
 
             # check if this content already exists in a previous accordion
-            if len(everything) > 0 and h2t_use[j] in everything.keys():
-                idivtext = copy(everything[h2t_use[j]])
-                idivcoll.insert(0,idivtext)
-                ic += 1
+            if source == 'duplicate':
+                body = everything[same[sect.start]]
+                if same[sect.start] in labels:
+                    body = shared_ref(labels[same[sect.start]])  # filled in client-side
+                tick(timer,'duplicate')
             else:
-                idivtext = copy(divtext)
-                idivcoll.insert(0,idivtext)
-                ic += 1
-
-                for k in range(hdr2_use[j]+1,hdr2_use[j+1]):
-                    try:
-                        ing = ingredients[k]
-                    except IndexError:  # reached end of list, hopefully
-                        break
-
-                    # if we don't break things, move on to check this element
-                    if ing.name == 'table': # this should be the reviewer recommendations table
-                        ing.attrs['class'] = 'table'
-                        if not bool(ing.thead):  # no header line, need to make the first row a header
-                            first_row = ing.tr.extract()
-                            thead = bowl.new_tag('thead')
-                            ing.insert(0,thead)
-                            thead.append(first_row)
-                            for td in first_row.find_all('td'): 
-                                td.wrap(bowl.new_tag('th')) 
-                                td.unwrap() 
-                        idivtext.append(ing)
-
-                    elif ing.name == 'ul':  # put this back in the hierarchy with the previous ol
-                        prev = ingredients[k-1]  # should be ol
-                        if prev.name == 'ol':
-                            prev = idivtext.find_all('ol')[-1]
-                            ul = ing.extract()
-                            prev.append(ul)
-                        else:
-                            idivtext.append(ing)
-
-                    else:
-                        idivtext.append(ing)
-
-                # check <ol>s within this card; if the first one has start != 1, reset it
-                # (this happens at one particular point in the reviewer guidelines at the moment)
-                ols = idivtext.find_all('ol')
-                if len(ols) > 0 and ols[0].attrs['start'] != 1:
-                    ols[0].attrs['start'] = '1'
-
-                # check if we need to recursively nest any ols
-                if check_whose(idivtext):
-                    idivtext = nest_in_between(idivtext)
-                else:
-                    # there's a mis-nested thing here; deal with it
-                    iq = False
-                    ol_list,sts,lis = _ol_info(idivtext)
-                    whose = np.cumsum(lis)[:-1] + 1 == sts[1:]
-                    while not iq:
-                        olstart = ol_list[np.where(whose == False)[0][0]]  # this should not work??
-                        iadd = True
-                        while iadd:
-                            toadd = olstart.next_sibling.extract()
-                            if toadd.name == 'ol':
-                                iadd = False
-                            olstart.append(toadd)
-                        ol_list,sts,lis = _ol_info(idivtext)
-                        whose = np.cumsum(lis)[:-1] + 1 == sts[1:]
-                        if np.all(whose):
-                            iq = True
-
-                # nest extra bits (<p> etc) one more time now that numbers are matched
-                idivtext = nest_in_between(idivtext)
-                #idivtext = nest_lis(idivtext)
-
-                everything[h2t_use[j]] = idivtext  # save in case this is duplicated
-
-    # unwrap hyperlinks that google has wrapped with extra stuff
-    links = bowl.find_all(_has_href)
-    for link in links:
-        if link.attrs['href'].startswith('#ftnt') or link.attrs['href'].startswith('mailto'):
-            continue
-        link.attrs['href'] = urllib.parse.unquote(link.attrs['href'].split('?q=')[1].split('&')[0])
-
-    # border the tables
-    for tab in bowl.find_all('table'):
-        tab.attrs['style'] = "border:1px solid black;border-collapse:collapse"
-    for th in bowl.find_all('th'):
-        th.attrs['style'] = "border:1px solid black"
-    for td in bowl.find_all('td'):
-        td.attrs['style'] = "border:1px solid black"
-
-    # write
-    bowl.smooth()
-    f = open(ofile,'w')
-    #f.write(bowl.prettify())
-    f.write(str(bowl))
-    f.close()
+                body = body_of(sect,source,key,what)
+                cards.append((sect.id,sect.title,h1.title,body))
+                if len(subs) > 0:  # the h3 sections, in an accordion of their own in the card
+                    nested = [accordion_open(sect.acc)]
+                    for sub in subs:
+                        section(timer,sub[0].id)
+                        subbody = body_of(*sub)
+                        # (indexed under the h2 card, which is what opens: the h3 one is inside it,
+                        # and with --lazy isn't on the page until the h2 card has been opened)
+                        cards.append((sect.id,sub[0].title,h1.title,subbody))
+                        nested += [card_open(sub[0].head,sub[0].id,sect.acc,sub[0].title),subbody,CARD_CLOSE]
+                    nested.append(ACCORDION_CLOSE)
+                    body = nest_in(body,''.join(nested))
+                if sect.start in same:
+                    everything[same[sect.start]] = body  # save in case this is duplicated
+                if same.get(sect.start) in labels:
+                    body = shared_body(body,labels[same[sect.start]])  # mark it so the repeats can find it
+            for t in ingredients[sect.start:sect.end]:
+                t.clear(decompose=True)  # whatever of the section is still in the soup
+
+            if lazy != None:
+                bodies.append((sect.id,body))
+                body = lazy_body(sect.id)  # filled in from the bundle when the card opens
+            doc.write(body)
+            doc.write(CARD_CLOSE)
+        plan[i] = None  # let go of the bodies
+        doc.write(ACCORDION_CLOSE)
+    if len(labels) > 0:
+        doc.write(SHARED_SCRIPT)
+    if lazy != None:
+        doc.write(lazy_script(lazy['url']))
+        lazy['bundle'] = build_bundle(bodies)
+    lap(timer,'sections',[soup])
+
+    if search != None:
+        search['index'] = build_index(cards)
+        lap(timer,'search')
+
+    if stats != None:
+        stats.update(cleaner.counts); stats.update(tidy.counts)
+    if unresolved != None:
+        unresolved.extend(linker.unresolved)
+    if cache != None:
+        cache.clear(); cache.update(used)  # keep only this document's sections
+    out = doc.close()
+    lap(timer,'render')
+    return out
 
+if __name__ == '__main__':
+
+    # start by exporting google doc as html; the input can be the zip archive google gives you
+    # or the html file extracted from it (we don't need any image files afaik)
+
+    # filename and type (guidelines or not, ie editorial policies) can be set by command line args
+    # if those aren't present, we ask for the info via input()
+    parser = ArgumentParser()
+    parser.add_argument('--ifile','-f',metavar='ifile',type=str,help='path to input file')
+    add_parser_arg(parser)
+    parser.add_argument('--cache',type=str,default=None,\
+                    help='section cache file (default: %s/sections_<input name>.json)' % CACHE_DIR)
+    add_cache_args(parser)
+    add_stats_arg(parser)
+    add_profile_args(parser)
+    add_watch_args(parser)
+    add_link_args(parser)
+    add_search_arg(parser)
+    add_minify_args(parser)
+    add_lazy_arg(parser)
+    parser.add_argument('--nest-lis',dest='nest',action='store_true',\
+                    help='put paragraphs that fall between list items into the item before them')
+    parser.add_argument('--nest-h3',action='store_true',\
+                    help='make the h3s in each h2 section a nested accordion of their own')
+    parser.add_argument('--shared',choices=['copy','ref'],default='copy',\
+                    help='sections repeated under several h1s: copy the html (default), or reference the first one (filled in by js)')
+    parser.add_argument('--jobs','-j',type=int,default=None,metavar='N',\
+                    help='build the h2 sections in N worker processes')
+    args = parser.parse_args()
+    args.minify = args.minify or args.minify_check
+
+    # set ofile names
+    ofile = 'out_allthings.html'
+
+    caches = {}  # section caches by cache file, kept in memory between runs in --watch mode
+    index = AnchorIndex()  # headings in the other documents links can point to
+    link_docs(index,args.link_docs,parser=args.parser)
+    pool = None  # worker processes for the sections, started once (and kept in --watch mode)
+    if args.jobs != None and args.jobs > 1:
+        pool = ProcessPoolExecutor(max_workers=args.jobs)
+    def run(ifile):
+        """
+        convert one export and write the output (atomically, so nothing ever reads half of it)
+        """
+        text = read_export(ifile)
+        cache = None
+        if args.use_cache:
+            cfile = args.cache or cache_path(ifile)
+            if cfile not in caches:
+                caches[cfile] = {} if args.rebuild else load_cache(cfile)
+            cache = caches[cfile]
+        css_cache = CACHE_DIR if args.use_cache and not args.rebuild else None
+        unresolved = []
+        search = {'url':os.path.basename(index_path(ofile))} if args.search else None
+        lazy = {'url':os.path.basename(bundle_path(ofile))} if args.lazy else None
+        kwargs = dict(parser=args.parser,cache=cache,css_cache=css_cache,css_check=args.css_check,nest=args.nest,\
+                      shared=args.shared,index=index,unresolved=unresolved,search=search,pool=pool,\
+                      nest_h3=args.nest_h3,lazy=lazy)
+        if args.profile != None or args.cprofile != None:
+            out,report = profile_convert(convert,text,kwargs,cprofile=args.cprofile)
+            report['input'] = ifile; report['parser'] = args.parser or default_parser()
+            if args.profile != None:
+                write_report(args.profile,report)
+            print_report(report)
+            stats = report['rules']
+        elif args.minify:
+            stats = {}
+            out = convert(text,stats=stats,**kwargs)
+        else:
+            # written out card by card as they're done, so the whole page is never in memory
+            stats = {}; out = None
+            with atomic_file(ofile) as f:
+                convert(text,stats=stats,out=f,**kwargs)
+        if args.stats:
+            print_stats(stats)
+        if args.use_cache:
+            save_cache(cfile,cache)
+        print_unresolved(unresolved)
+        if args.link_report != None:
+            write_unresolved(args.link_report,unresolved)
+
+        # write
+        if args.minify:
+            print_sizes(ofile,write_minified(ofile,out,check=args.minify_check))
+        elif out != None:
+            write_atomic(ofile,out)
+        if search != None:
+            (write_gzipped if args.minify else write_atomic)(index_path(ofile),dump_index(search['index']))
+        if lazy != None:
+            (write_gzipped if args.minify else write_atomic)(bundle_path(ofile),dump_bundle(lazy['bundle']))
+
+    if args.watch != None:
+        # convert the most recently changed export (of this kind) whenever something changes
+        def handle(paths):
+            paths = pick(paths,lambda p: guess_kind(p,read_export(p)) == 'guidelines')  # skip other docs
+            if len(paths) == 0:
+                return
+            ifile = newest(paths)
+            t0 = time.perf_counter()
+            try:
+                run(ifile)
+                print('%s -> %s (%.2f s)' % (ifile,ofile,time.perf_counter()-t0))
+            except Exception as e:
+                print('%s FAILED: %s: %s' % (ifile,type(e).__name__,e))
+        print('watching %s (ctrl-c to stop)' % args.watch)
+        watch(args.watch,handle,interval=args.interval)
+    else:
+        ifile = args.ifile
+        if ifile == None:
+            ifile = input('Enter path to input file: ') or 'combined_doc.html'
+        assert os.path.isfile(ifile),'file does not exist'
+        run(ifile)
+    if pool != None:
+        pool.shutdown()
@@ -0,0 +1,187 @@
+import time
+import json
+import cProfile
+import tracemalloc
+from bs4 import Tag
+
+####
+# instrumentation for the converters: convert(timer=...) marks the end of each stage with
+# lap(), and the start of each h2 section (or FAQ card) with section() and the parts of its
+# processing with tick(); all of these do nothing when there is no timer
+#
+# profile_convert runs a conversion with a StageTimer for --profile: once under tracemalloc
+# for memory, once for wall times and tag counts (tracemalloc slows things down, and not
+# evenly), and optionally once more with cProfile switched on for just the slowest stage
+####
+
+class StageTimer:
+    """
+    wall time, memory (if tracemalloc is tracing) and tag counts for each stage of a conversion,
+    and times for each section within a stage
+    count=True counts the tags in the roots given to lap() (not included in the stage's time);
+    profile_at is the position of a stage to run cProfile on
+    """
+    def __init__(self,count=False,profile_at=None):
+        self.stages = []  # {name, seconds, peak_mb, current_mb, nodes_in, nodes_out}
+        self.sections = []  # {section, seconds, parts:{name:seconds}}
+        self.count = count
+        self.profile_at = profile_at; self.profiler = None
+        self.start()
+
+    def start(self):
+        """
+        start timing the next stage
+        """
+        if tracemalloc.is_tracing():
+            tracemalloc.reset_peak()
+        if self.profile_at == len(self.stages):
+            self.profiler = cProfile.Profile()
+            self.profiler.enable()
+        self.t0 = time.perf_counter()
+
+    def lap(self,name,roots=None):
+        """
+        record the stage that just finished, and start the next one
+        roots are the tags (or soups) that hold the document at this point, for the tag count
+        """
+        dt = time.perf_counter() - self.t0
+        if self.profiler != None and self.profile_at == len(self.stages):
+            self.profiler.disable()
+        stage = {'name':name,'seconds':dt}
+        if tracemalloc.is_tracing():
+            current,peak = tracemalloc.get_traced_memory()
+            stage['peak_mb'] = peak/1e6; stage['current_mb'] = current/1e6
+        if self.count:
+            stage['nodes_in'] = self.stages[-1]['nodes_out'] if len(self.stages) > 0 else None
+            stage['nodes_out'] = count_tags(roots) if roots != None else None
+        self.stages.append(stage)
+        self.start()
+
+    def section(self,label):
+        """
+        start timing one section
+        """
+        self.sections.append({'section':label,'seconds':0.,'parts':{}})
+        self.s0 = time.perf_counter()
+
+    def tick(self,part):
+        """
+        add the time since the section started (or the last tick) to one part of it
+        """
+        t = time.perf_counter()
+        sec = self.sections[-1]
+        sec['parts'][part] = sec['parts'].get(part,0.) + t - self.s0
+        sec['seconds'] += t - self.s0
+        self.s0 = t
+
+def count_tags(roots):
+    """
+    number of tags in and under a list of tags (each one counted once)
+    """
+    seen = set(); n = 0
+    for r in roots:
+        if id(r) in seen:
+            continue
+        seen.add(id(r))
+        n += len(r.find_all(True)) + (1 if isinstance(r,Tag) and r.name != '[document]' else 0)
+    return n
+
+def lap(timer,name,roots=None):
+    """
+    mark the end of a stage on a StageTimer, if there is one
+    """
+    if timer != None:
+        timer.lap(name,roots)
+
+def section(timer,label):
+    """
+    mark the start of a section on a StageTimer, if there is one
+    """
+    if timer != None:
+        timer.section(label)
+
+def tick(timer,part):
+    """
+    mark the end of part of a section on a StageTimer, if there is one
+    """
+    if timer != None:
+        timer.tick(part)
+
+def profile_convert(convert,text,kwargs={},cprofile=None,memory=True):
+    """
+    run convert(text,**kwargs) (one of the scripts' convert functions) and profile it
+    returns the output and a report dict: per-stage wall time, tracemalloc peak and tag counts
+    in/out, per-section times, the slowest stage, and the cleaning rule counts
+    cprofile is a file to dump cProfile stats for the slowest stage to (None for none)
+    the extra runs get their own copy of any section cache (and list of unresolved links), so
+    only the timed run updates it
+    """
+    def again():
+        kw = dict(kwargs)
+        if kw.get('cache') != None:
+            kw['cache'] = dict(kw['cache'])
+        if kw.get('unresolved') != None:
+            kw['unresolved'] = []
+        return kw
+
+    mem = None
+    if memory:
+        mem = StageTimer()
+        tracemalloc.start()
+        convert(text,timer=mem,**again())
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+
+    timer = StageTimer(count=True)
+    stats = {}
+    out = convert(text,timer=timer,stats=stats,**kwargs)
+
+    stages = timer.stages
+    if mem != None:
+        for st,ms in zip(stages,mem.stages):
+            st['peak_mb'] = ms['peak_mb']; st['current_mb'] = ms['current_mb']
+    slowest = max(range(len(stages)),key=lambda i: stages[i]['seconds'])
+    report = {'seconds':sum(st['seconds'] for st in stages),\
+              'peak_mb':peak/1e6 if mem != None else None,\
+              'stages':stages,'slowest':stages[slowest]['name'],\
+              'sections':timer.sections,'rules':stats,'cprofile':None}
+
+    if cprofile != None:
+        prof = StageTimer(profile_at=slowest)
+        convert(text,timer=prof,**again())
+        prof.profiler.dump_stats(cprofile)
+        report['cprofile'] = cprofile
+    return out, report
+
+def write_report(ofile,report):
+    """
+    save a profile report as json
+    """
+    f = open(ofile,'w')
+    json.dump(report,f,indent=1)
+    f.close()
+
+def print_report(report):
+    """
+    short summary of a profile report: time (and peak memory) per stage, and the slowest sections
+    """
+    for st in report['stages']:
+        line = '%-12s %9.3f s' % (st['name'],st['seconds'])
+        if 'peak_mb' in st:
+            line += ' %9.1f MB peak' % st['peak_mb']
+        if st.get('nodes_out') != None:
+            line += ' %8d tags' % st['nodes_out']
+        print(line)
+    print('%-12s %9.3f s  (slowest stage: %s)' % ('total',report['seconds'],report['slowest']))
+    secs = sorted(report['sections'],key=lambda s: -s['seconds'])[:5]
+    if len(secs) > 0:
+        print('slowest sections: ' + ', '.join('%s %.3f s' % (s['section'],s['seconds']) for s in secs))
+
+def add_profile_args(argparser):
+    """
+    add the --profile/--cprofile options to a script's ArgumentParser
+    """
+    argparser.add_argument('--profile',type=str,default=None,metavar='FILE',\
+                    help='profile the conversion and save a json report of each stage to FILE')
+    argparser.add_argument('--cprofile',type=str,default=None,metavar='FILE',\
+                    help='also dump cProfile stats for the slowest stage to FILE (see pstats)')
@@ -0,0 +1,100 @@
+/* search box for the accordion pages made by parse_google_doc.py / parse_faq.py with --search
+ *
+ * fills in each <div class="card-search" data-index="..."> with a text box, loads the search
+ * index it names (see search.py for the format), and lists the matching cards while you type;
+ * clicking one opens the card and scrolls to it. Queries work like search.py's: every word has
+ * to be in the card, the last one as a prefix, ranked by how often the words come up. */
+(function () {
+  var LIMIT = 10;
+
+  function tokens(text, stop) {
+    var words = text.toLowerCase().normalize('NFKD').replace(/[\u0300-\u036f]/g, '')
+                    .match(/[\p{L}\p{N}]+/gu) || [];
+    return words.filter(function (w) { return !stop.has(w); });
+  }
+
+  function postings(index, token) {
+    var post = index.terms[token] || [], found = {}, n = 0;
+    for (var k = 0; k < post.length; k += 2) {
+      n += post[k];
+      found[n] = post[k + 1];
+    }
+    return found;
+  }
+
+  function query(index, q) {
+    var words = tokens(q, index.stopSet), scores = null;
+    if (words.length === 0) return [];
+    words.forEach(function (w, k) {
+      var found;
+      if (k === words.length - 1) {
+        found = {};
+        index.termList.forEach(function (t) {
+          if (t.lastIndexOf(w, 0) !== 0) return;
+          var p = postings(index, t);
+          for (var n in p) found[n] = (found[n] || 0) + p[n];
+        });
+      } else {
+        found = postings(index, w);
+      }
+      if (scores === null) {
+        scores = found;
+      } else {
+        var both = {};
+        for (var n in scores) if (n in found) both[n] = scores[n] + found[n];
+        scores = both;
+      }
+    });
+    return Object.keys(scores).map(Number)
+      .sort(function (a, b) { return scores[b] - scores[a] || a - b; })
+      .slice(0, LIMIT).map(function (n) { return index.docs[n]; });
+  }
+
+  function openCard(id) {
+    var card = document.getElementById(id);
+    if (!card) return;
+    if (window.jQuery && jQuery.fn.collapse) {
+      jQuery(card).collapse('show');
+    } else {
+      card.classList.add('show');
+    }
+    card.parentNode.scrollIntoView();
+  }
+
+  function setUp(box, index) {
+    index.stopSet = new Set(index.stop);
+    index.termList = Object.keys(index.terms);
+    var input = document.createElement('input'), list = document.createElement('ul');
+    input.type = 'search';
+    input.className = 'form-control';
+    input.placeholder = 'Search';
+    list.className = 'list-unstyled';
+    box.appendChild(input);
+    box.appendChild(list);
+    input.addEventListener('input', function () {
+      list.innerHTML = '';
+      query(index, input.value).forEach(function (doc) {
+        var item = document.createElement('li'), link = document.createElement('a'),
+            snip = document.createElement('small');
+        link.href = '#' + doc[0];
+        link.textContent = (doc[2] ? doc[2] + ': ' : '') + doc[1];
+        link.addEventListener('click', function (e) {
+          e.preventDefault();
+          openCard(doc[0]);
+        });
+        snip.textContent = ' ' + doc[3];
+        item.appendChild(link);
+        item.appendChild(snip);
+        list.appendChild(item);
+      });
+    });
+  }
+
+  document.addEventListener('DOMContentLoaded', function () {
+    document.querySelectorAll('.card-search[data-index]').forEach(function (box) {
+      fetch(box.getAttribute('data-index'))
+        .then(function (r) { return r.json(); })
+        .then(function (index) { setUp(box, index); });
+    });
+  });
+})();
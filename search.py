@@ -0,0 +1,157 @@
+import re
+import sys
+import json
+import html
+import unicodedata
+from argparse import ArgumentParser
+
+####
+# client-side search over the cards: browser find-in-page doesn't look inside collapsed
+# cards, so the scripts can also write an inverted index of them (--search) for search.js to
+# load and query on the page
+#
+# the index is compact json:
+#   {"v":1, "stop":[stopwords], "docs":[[card id, title, section, snippet], ...],
+#    "terms":{token:[doc gap, count, doc gap, count, ...]}}
+# with each token's postings as (gap from the previous doc number, number of times it occurs in
+# the card, title words counting TITLE_WEIGHT times). Tokens are lowercased runs of letters and
+# digits with accents stripped, and stopwords left out; search.js tokenizes queries the same
+# way, ANDs the terms (the last one as a prefix, so results show up while typing) and ranks by
+# the summed counts. `python search.py index.json words...` runs the same query here.
+####
+
+INDEX_VERSION = 1
+TITLE_WEIGHT = 5
+SNIPPET = 160  # characters
+STOP = ('a','an','and','are','as','at','be','by','can','for','from','has','have','if','in','is',\
+        'it','its','not','of','on','or','that','the','this','to','was','we','will','with','you','your')
+
+_stop = frozenset(STOP)
+_word = re.compile(r'[^\W_]+')
+_tag = re.compile(r'<[^>]*>')
+
+def tokens(text):
+    """
+    the search tokens in some text, in order (with repeats)
+    """
+    text = unicodedata.normalize('NFKD',text.lower())
+    text = ''.join(c for c in text if not unicodedata.combining(c))
+    return [w for w in _word.findall(text) if w not in _stop]
+
+def body_text(body):
+    """
+    the text of a card body: a tag, or the html string of one (from a section cache)
+    """
+    if isinstance(body,str):
+        return html.unescape(_tag.sub(' ',body))
+    return body.get_text(' ')
+
+def snippet(text):
+    """
+    the start of some text, whitespace squashed, cut at a word boundary
+    """
+    text = ' '.join(text.split())
+    if len(text) <= SNIPPET:
+        return text
+    return text[:SNIPPET].rsplit(' ',1)[0] + '…'
+
+def build_index(cards):
+    """
+    the search index for a list of (card id, title, section, body) (body as for body_text); a
+    body that comes up more than once (a shared section) is only indexed the first time
+    """
+    docs = []; counts = {}; seen = set()
+    for card_id,title,sect,body in cards:
+        if id(body) in seen:
+            continue
+        seen.add(id(body))
+        text = body_text(body)
+        n = len(docs)
+        docs.append([card_id,title,sect,snippet(text)])
+        tf = {}
+        for t in tokens(text):
+            tf[t] = tf.get(t,0) + 1
+        for t in tokens(title):
+            tf[t] = tf.get(t,0) + TITLE_WEIGHT
+        for t,c in tf.items():
+            counts.setdefault(t,[]).append((n,c))
+    terms = {}
+    for t in sorted(counts.keys()):
+        post = []; prev = 0
+        for n,c in counts[t]:
+            post.append(n-prev); post.append(c)
+            prev = n
+        terms[t] = post
+    return {'v':INDEX_VERSION,'stop':list(STOP),'docs':docs,'terms':terms}
+
+def dump_index(index):
+    """
+    the index as compact json
+    """
+    return json.dumps(index,separators=(',',':'),ensure_ascii=False)
+
+def postings(index,token):
+    """
+    {doc number: count} for one token
+    """
+    post = index['terms'].get(token,[])
+    found = {}; n = 0
+    for k in range(0,len(post),2):
+        n += post[k]
+        found[n] = post[k+1]
+    return found
+
+def query(index,q,limit=10):
+    """
+    the best-matching docs for a query, as [(score, doc)]: every word has to be in the card,
+    the last one as a prefix (what search.js does)
+    """
+    words = tokens(q)
+    if len(words) == 0:
+        return []
+    scores = None
+    for k,w in enumerate(words):
+        if k == len(words)-1:
+            found = {}
+            for t in index['terms']:
+                if t.startswith(w):
+                    for n,c in postings(index,t).items():
+                        found[n] = found.get(n,0) + c
+        else:
+            found = postings(index,w)
+        if scores == None:
+            scores = found
+        else:
+            scores = {n:s+found[n] for n,s in scores.items() if n in found}
+    best = sorted(scores.items(),key=lambda x: (-x[1],x[0]))[:limit]
+    return [(s,index['docs'][n]) for n,s in best]
+
+def index_path(ofile):
+    """
+    where the search index for an output file goes: out_x.html -> out_x.search.json
+    """
+    return re.sub(r'\.html?$','',ofile) + '.search.json'
+
+def add_search_arg(argparser):
+    """
+    add the --search option to a script's ArgumentParser
+    """
+    argparser.add_argument('--search',action='store_true',\
+                    help='also write a search index of the cards next to the output (for search.js)')
+
+if __name__ == '__main__':
+    parser = ArgumentParser()
+    parser.add_argument('index',type=str,help='search index (eg out_allthings.search.json)')
+    parser.add_argument('words',type=str,nargs='+',help='what to look for')
+    parser.add_argument('-n',type=int,default=10,help='number of results')
+    args = parser.parse_args()
+
+    f = open(args.index,'r',encoding='utf-8')
+    index = json.load(f)
+    f.close()
+    results = query(index,' '.join(args.words),limit=args.n)
+    if len(results) == 0:
+        print('nothing found')
+        sys.exit(1)
+    for score,(card_id,title,sect,snip) in results:
+        print('%4d  #%s  %s\n      %s' % (score,card_id,' / '.join(s for s in (sect,title) if s != ''),snip))
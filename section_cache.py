@@ -0,0 +1,78 @@
+import os
+import json
+import hashlib
+import functools
+
+from gdoc_utils import CACHE_DIR, write_atomic
+
+####
+# cache of rendered card bodies for parse_google_doc, so a re-run after an edit only has to
+# redo the h2 sections that actually changed
+#
+# each section is keyed by a hash of its (cleaned) ingredients, as sliced by the document outline
+# (outline.py), plus the stylesheet translation table and CACHE_VERSION. The cached value is the
+# final html for the card body (lists repaired, links unwrapped, tables styled), which goes
+# straight into the output in place of the section's content. A cache file also records a hash
+# of the code that makes the bodies, and one made by other code is ignored, so a cache from
+# before an upgrade doesn't hand back bodies the new code would make differently.
+####
+
+CACHE_VERSION = 2  # bump this when what's stored changes so old files are ignored
+BODY_CODE = ('parse_google_doc.py','outline.py','cleaner.py','gdoc_utils.py','links.py')  # what makes a card body
+
+def section_key(ings,translate,options=None):
+    """
+    hash the ingredients of one h2 section (header element first) and the translation table,
+    plus a dict of any non-default options that change how card bodies are made
+    """
+    h = hashlib.sha1()
+    h.update(('v%d\n' % CACHE_VERSION).encode())
+    h.update(json.dumps(list(translate.items())).encode())  # order matters for nesting
+    if options:
+        h.update(json.dumps(options,sort_keys=True).encode())
+    for ing in ings:
+        h.update(b'\n')
+        h.update(str(ing).encode())
+    return h.hexdigest()
+
+@functools.lru_cache(maxsize=None)
+def code_version():
+    """
+    a hash of the source of the modules in BODY_CODE
+    """
+    h = hashlib.sha1()
+    top = os.path.dirname(os.path.abspath(__file__))
+    for name in BODY_CODE:
+        f = open(os.path.join(top,name),'rb')
+        h.update(f.read())
+        f.close()
+    return h.hexdigest()
+
+def cache_path(ifile):
+    """
+    default cache file for an input file
+    """
+    return os.path.join(CACHE_DIR,'sections_%s.json' % os.path.splitext(os.path.basename(ifile))[0])
+
+def load_cache(cfile):
+    """
+    read a section cache from disk; empty if it isn't there, or is from another CACHE_VERSION
+    or other body-making code
+    """
+    if not os.path.isfile(cfile):
+        return {}
+    try:
+        f = open(cfile,'r')
+        stored = json.load(f)
+        f.close()
+    except ValueError:
+        return {}  # half-written or otherwise broken, start over
+    if stored.get('version') != CACHE_VERSION or stored.get('code') != code_version():
+        return {}
+    return stored['sections']
+
+def save_cache(cfile,cache):
+    """
+    write a section cache to disk
+    """
+    write_atomic(cfile,json.dumps({'version':CACHE_VERSION,'code':code_version(),'sections':cache}))
@@ -0,0 +1,469 @@
+import io
+import json
+import time
+import zipfile
+import hashlib
+import threading
+from collections import OrderedDict, deque
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlsplit, parse_qs, urlencode
+from urllib.request import Request, urlopen
+from argparse import ArgumentParser
+
+from gdoc_utils import guess_kind, available_parsers, KINDS
+
+####
+# conversions for other tooling (eg the scripts that update the OJS pages), without a CLI run
+# and its input() prompts:
+#   - convert_text(text, kind, options) is the whole pipeline of either script as a function:
+#     the text of an export in, the page out
+#   - ConversionService runs those in a bounded process pool, and keeps the pages it made in
+#     an LRU cache keyed by a hash of the export and the options, so asking again for a page
+#     that hasn't changed costs nothing (the same request already being converted is waited
+#     on, not started twice). It counts request latency, cache hits and the queue depth
+#   - python service.py [--port 8765] [-j N] serves it over http on localhost (stdlib only, no
+#     network needed):
+#       POST /convert?kind=faq&minify=1   export html (or google's .zip) as the body -> the page
+#       GET  /metrics                     the counts, in prometheus' text format
+#       GET  /metrics.json                the same as json
+#       GET  /health                      "ok"
+#     the response says X-Cache: hit, miss or shared (waited on the same conversion). A busy
+#     service (max_pending conversions waiting or running) answers 503 with Retry-After,
+#     rather than queueing up without end
+#   - request_conversion(text, url, kind, **options) is the client side of that, for scripts
+#
+# the options are the ones that change the page (OPTIONS); things that write files next to it
+# (--search, --lazy) and the caches on disk are left to the scripts
+####
+
+OPTIONS = {'parser':None,'minify':False,'nest':False,'nest_h3':False,'shared':'copy','chunk':None}  # defaults
+KIND_OPTIONS = {'guidelines':('nest','nest_h3','shared'),'faq':('chunk',)}  # options for one kind only
+LATENCY_BUCKETS = (0.005,0.01,0.025,0.05,0.1,0.25,0.5,1.,2.5,5.,10.)  # seconds, for the histogram
+MAX_BODY = 64*1024*1024  # bytes: the biggest export that's accepted
+
+def export_text(data):
+    """
+    the text of an export sent as bytes: the html itself, or google's .zip with the html in it
+    """
+    if data[:4] == b'PK\x03\x04':
+        with zipfile.ZipFile(io.BytesIO(data)) as z:
+            names = [n for n in z.namelist() if n.lower().endswith('.html')]
+            if len(names) == 0:
+                raise ValueError('no html file in the zip')
+            data = z.read(names[0])
+    return data.decode('utf-8')
+
+def conversion_options(kind,params):
+    """
+    a full set of options for a kind of document (KINDS), with the defaults filled in, from
+    params (eg a request's query string: strings are turned into bools and numbers)
+    ValueError for anything unknown, or meant for the other kind of document
+    """
+    if kind not in KINDS:
+        raise ValueError('unknown kind %r (one of %s)' % (kind,', '.join(KINDS)))
+    options = dict(OPTIONS)
+    for name,value in params.items():
+        if name not in OPTIONS:
+            raise ValueError('unknown option %r' % name)
+        if value != OPTIONS[name] and any(name in names for k,names in KIND_OPTIONS.items() if k != kind):
+            raise ValueError('option %r is not for %s documents' % (name,kind))
+        if isinstance(OPTIONS[name],bool) and isinstance(value,str):
+            if value.lower() not in ('1','0','true','false','yes','no',''):
+                raise ValueError('option %r is yes or no, not %r' % (name,value))
+            value = value.lower() in ('1','true','yes','')
+        elif name == 'chunk' and value != None:
+            value = int(value)
+            if value < 0:
+                raise ValueError('chunk has to be 0 or more')
+        options[name] = value
+    if options['parser'] != None and options['parser'] not in available_parsers():
+        raise ValueError('parser %r is not installed (there is %s)' % (options['parser'],', '.join(available_parsers())))
+    if options['shared'] not in ('copy','ref'):
+        raise ValueError('shared is copy or ref, not %r' % options['shared'])
+    return options
+
+def convert_text(text,kind=None,options=None):
+    """
+    convert the text of an export with either script's pipeline and return the page; kind is
+    guessed if it's None (gdoc_utils.guess_kind), and options is a dict of OPTIONS (see
+    conversion_options)
+    """
+    if kind == None:
+        kind = guess_kind('',text)
+    options = conversion_options(kind,options or {})
+    if kind == 'faq':
+        import parse_faq
+        kwargs = {} if options['chunk'] == None else {'chunk':options['chunk']}
+        out = parse_faq.convert(text,parser=options['parser'],**kwargs)
+    else:
+        import parse_google_doc
+        out = parse_google_doc.convert(text,parser=options['parser'],nest=options['nest'],\
+                                       nest_h3=options['nest_h3'],shared=options['shared'])
+    if options['minify']:
+        from minify import minify
+        out = minify(out)
+    return out
+
+def cache_key(text,kind,options):
+    """
+    the key for a page in the cache: a hash of the export, its kind and the options
+    """
+    h = hashlib.sha256(text.encode('utf-8'))
+    h.update(json.dumps([kind,options],sort_keys=True).encode('utf-8'))
+    return h.hexdigest()
+
+class LRUCache:
+    """
+    the most recently used pages, up to maxsize of them and max_bytes of text in all (counted
+    in characters; the least recently used go first); safe to use from several threads
+    """
+    def __init__(self,maxsize=128,max_bytes=64*1024*1024):
+        self.maxsize = maxsize
+        self.max_bytes = max_bytes
+        self.nbytes = 0
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self,key):
+        """
+        the page for key (now the most recently used), or None
+        """
+        with self._lock:
+            value = self._items.get(key)
+            if value != None:
+                self._items.move_to_end(key)
+            return value
+
+    def put(self,key,value):
+        """
+        keep a page, dropping the least recently used ones to make room (a page bigger than
+        max_bytes on its own isn't kept)
+        """
+        size = len(value)
+        if size > self.max_bytes or self.maxsize < 1:
+            return
+        with self._lock:
+            old = self._items.pop(key,None)
+            if old != None:
+                self.nbytes -= len(old)
+            self._items[key] = value
+            self.nbytes += size
+            while len(self._items) > self.maxsize or self.nbytes > self.max_bytes:
+                k,v = self._items.popitem(last=False)
+                self.nbytes -= len(v)
+
+    def __len__(self):
+        return len(self._items)
+
+class Metrics:
+    """
+    counts for the service: requests by status, latency (a histogram, and percentiles of the
+    last window requests), cache hits/misses/shared, and conversions waiting or running
+    """
+    def __init__(self,window=1000):
+        self._lock = threading.Lock()
+        self.started = time.time()
+        self.requests = {}  # status code: count
+        self.latency_sum = 0.
+        self.buckets = [0]*len(LATENCY_BUCKETS)
+        self.recent = deque(maxlen=window)
+        self.cache = {'hit':0,'miss':0,'shared':0}
+        self.pending = 0; self.max_pending = 0
+
+    def observe(self,seconds,status):
+        """
+        count a finished request
+        """
+        with self._lock:
+            self.requests[status] = self.requests.get(status,0) + 1
+            self.latency_sum += seconds
+            for k,edge in enumerate(LATENCY_BUCKETS):
+                if seconds <= edge:
+                    self.buckets[k] += 1
+            self.recent.append(seconds)
+
+    def lookup(self,result):
+        """
+        count a cache lookup: 'hit', 'miss' or 'shared'
+        """
+        with self._lock:
+            self.cache[result] += 1
+
+    def queued(self,change):
+        """
+        a conversion was handed to the pool (+1), or finished (-1)
+        """
+        with self._lock:
+            self.pending += change
+            self.max_pending = max(self.max_pending,self.pending)
+
+    def snapshot(self,cache=None,workers=None):
+        """
+        the counts as a dict (with the cache's size, and the number of workers, if given)
+        """
+        with self._lock:
+            recent = sorted(self.recent)
+            lookups = sum(self.cache.values())
+            def pct(p):
+                return recent[min(len(recent)-1,int(p*len(recent)))] if len(recent) > 0 else None
+            snap = {'uptime_seconds':time.time()-self.started,\
+                    'requests':{str(k):v for k,v in sorted(self.requests.items())},\
+                    'latency_seconds':{'count':sum(self.requests.values()),'sum':self.latency_sum,\
+                                       'buckets':dict(zip([str(b) for b in LATENCY_BUCKETS],self.buckets)),\
+                                       'p50':pct(.5),'p90':pct(.9),'p99':pct(.99)},\
+                    'cache':dict(self.cache,hit_rate=(self.cache['hit']+self.cache['shared'])/lookups if lookups > 0 else None),\
+                    'queue':{'depth':self.pending,'max_depth':self.max_pending,\
+                             'waiting':max(0,self.pending-workers) if workers != None else None,'workers':workers}}
+        if cache != None:
+            snap['cache'].update(entries=len(cache),bytes=cache.nbytes)
+        return snap
+
+def prometheus(snap):
+    """
+    a Metrics snapshot in prometheus' text format
+    """
+    lines = ['# TYPE convert_requests_total counter']
+    for status,n in snap['requests'].items():
+        lines.append('convert_requests_total{status="%s"} %d' % (status,n))
+    lat = snap['latency_seconds']
+    lines.append('# TYPE convert_request_seconds histogram')
+    for edge,n in lat['buckets'].items():
+        lines.append('convert_request_seconds_bucket{le="%s"} %d' % (edge,n))
+    lines.append('convert_request_seconds_bucket{le="+Inf"} %d' % lat['count'])
+    lines.append('convert_request_seconds_sum %.6f' % lat['sum'])
+    lines.append('convert_request_seconds_count %d' % lat['count'])
+    lines.append('# TYPE convert_cache_lookups_total counter')
+    for result in ('hit','miss','shared'):
+        lines.append('convert_cache_lookups_total{result="%s"} %d' % (result,snap['cache'][result]))
+    lines.append('# TYPE convert_cache_hit_ratio gauge')
+    lines.append('convert_cache_hit_ratio %s' % ('NaN' if snap['cache']['hit_rate'] == None else '%.6f' % snap['cache']['hit_rate']))
+    for name in ('entries','bytes'):
+        if name in snap['cache']:
+            lines.append('# TYPE convert_cache_%s gauge' % name)
+            lines.append('convert_cache_%s %d' % (name,snap['cache'][name]))
+    lines.append('# TYPE convert_queue_depth gauge')
+    lines.append('convert_queue_depth %d' % snap['queue']['depth'])
+    lines.append('# TYPE convert_queue_max_depth gauge')
+    lines.append('convert_queue_max_depth %d' % snap['queue']['max_depth'])
+    return '\n'.join(lines) + '\n'
+
+class Busy(Exception):
+    """
+    the service has as many conversions waiting or running as it takes
+    """
+
+class ConversionService:
+    """
+    convert_text in a pool of workers processes, with an LRU cache of the pages (see above)
+    max_pending is how many conversions can be waiting or running at once (Busy past that;
+    default 4 per worker)
+    """
+    def __init__(self,workers=2,cache_size=128,cache_bytes=64*1024*1024,max_pending=None):
+        self.workers = workers
+        self.max_pending = max_pending or 4*workers
+        self.cache = LRUCache(cache_size,cache_bytes)
+        self.metrics = Metrics()
+        self.pool = ProcessPoolExecutor(max_workers=workers)
+        self._inflight = {}  # cache key: future, for conversions under way
+        self._lock = threading.Lock()
+
+    def warm(self):
+        """
+        start the worker processes and have them import the scripts, before any requests (and
+        before the server's threads, so the workers aren't forked from a threaded process)
+        """
+        for fut in [self.pool.submit(_warm) for k in range(self.workers)]:
+            fut.result()
+
+    def convert(self,text,kind=None,options=None):
+        """
+        the page for an export, and how it was had ('hit', 'miss' or 'shared'); ValueError for
+        bad options (before anything is queued), Busy if the queue is full, and whatever the
+        conversion raised if it failed
+        """
+        if kind == None:
+            kind = guess_kind('',text)
+        options = conversion_options(kind,options or {})
+        key = cache_key(text,kind,options)
+        out = self.cache.get(key)
+        if out != None:
+            self.metrics.lookup('hit')
+            return out,'hit'
+        with self._lock:
+            fut = self._inflight.get(key)
+            how = 'shared'
+            if fut == None:
+                out = self.cache.get(key)  # (it may have just finished)
+                if out != None:
+                    how = 'hit'
+                elif len(self._inflight) >= self.max_pending:
+                    raise Busy('%d conversions waiting or running' % len(self._inflight))
+                else:
+                    pool = self.pool
+                    try:
+                        fut = pool.submit(convert_text,text,kind,options)
+                    except BrokenProcessPool:  # a worker died while the pool was idle
+                        pool = self._new_pool(pool)
+                        fut = pool.submit(convert_text,text,kind,options)
+                    self._inflight[key] = fut
+                    self.metrics.queued(+1)
+                    how = 'miss'
+        if how == 'miss':
+            # (outside the lock: a future that's already done runs the callback right here,
+            # and _done takes the lock)
+            fut.add_done_callback(lambda f: self._done(key,f,pool))
+        self.metrics.lookup(how)
+        return (out if how == 'hit' else fut.result()),how
+
+    def _done(self,key,fut,pool):
+        """
+        a conversion finished: cache its page (if it worked) and stop counting it; if a worker
+        died, the pool it was in is no good any more, so there's a new one for what comes next
+        """
+        error = fut.exception()
+        if error == None:
+            self.cache.put(key,fut.result())
+        with self._lock:
+            self._inflight.pop(key,None)
+            if isinstance(error,BrokenProcessPool):
+                self._new_pool(pool)
+        self.metrics.queued(-1)
+
+    def _new_pool(self,broken):
+        """
+        swap a broken pool for a new one (unless that's been done already) and shut the broken
+        one down; returns the pool to use. Called with self._lock held
+        """
+        if self.pool is broken:
+            self.pool = ProcessPoolExecutor(max_workers=self.workers)
+            broken.shutdown(wait=False)
+        return self.pool
+
+    def snapshot(self):
+        """
+        the service's metrics as a dict
+        """
+        return self.metrics.snapshot(cache=self.cache,workers=self.workers)
+
+    def close(self):
+        self.pool.shutdown()
+
+def _warm():
+    """
+    import what the conversions need (in a worker process)
+    """
+    import parse_google_doc, parse_faq, minify
+    return True
+
+class Handler(BaseHTTPRequestHandler):
+    """
+    the http side of a ConversionService (self.server.service; see above for the urls)
+    """
+    protocol_version = 'HTTP/1.1'
+    quiet = True
+
+    def _send(self,status,body,ctype='text/plain; charset=utf-8',headers={}):
+        data = body.encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type',ctype)
+        self.send_header('Content-Length',str(len(data)))
+        for k,v in headers.items():
+            self.send_header(k,v)
+        self.end_headers()
+        self.wfile.write(data)
+        return status
+
+    def do_GET(self):
+        path = urlsplit(self.path).path
+        service = self.server.service
+        if path == '/health':
+            self._send(200,'ok\n')
+        elif path == '/metrics':
+            self._send(200,prometheus(service.snapshot()),ctype='text/plain; version=0.0.4; charset=utf-8')
+        elif path == '/metrics.json':
+            self._send(200,json.dumps(service.snapshot(),indent=1),ctype='application/json')
+        else:
+            self._send(404,'not found: %s\n' % path)
+
+    def do_POST(self):
+        t0 = time.perf_counter()
+        url = urlsplit(self.path)
+        service = self.server.service
+        if url.path != '/convert':
+            self._send(404,'not found: %s\n' % url.path)
+            return
+        length = int(self.headers.get('Content-Length') or 0)
+        if length > MAX_BODY:
+            self.close_connection = True
+            status = self._send(413,'export too big (%d bytes, at most %d)\n' % (length,MAX_BODY))
+            service.metrics.observe(time.perf_counter()-t0,status)
+            return
+        data = self.rfile.read(length)
+        params = {k:v[-1] for k,v in parse_qs(url.query,keep_blank_values=True).items()}
+        kind = params.pop('kind',None) or None
+        try:
+            out,how = service.convert(export_text(data),kind,params)
+            status = self._send(200,out,ctype='text/html; charset=utf-8',headers={'X-Cache':how})
+        except (ValueError,UnicodeDecodeError,zipfile.BadZipFile) as e:
+            status = self._send(400,'%s\n' % e)
+        except Busy as e:
+            status = self._send(503,'busy: %s\n' % e,headers={'Retry-After':'1'})
+        except Exception as e:
+            status = self._send(500,'conversion failed: %s: %s\n' % (type(e).__name__,e))
+        service.metrics.observe(time.perf_counter()-t0,status)
+
+    def log_message(self,format,*args):
+        if not self.quiet:
+            BaseHTTPRequestHandler.log_message(self,format,*args)
+
+def make_server(service,host='127.0.0.1',port=8765,quiet=True):
+    """
+    an http server for a ConversionService (port=0 picks a free one: see server.server_address);
+    call serve_forever() on it, in a thread if need be
+    """
+    handler = type('Handler',(Handler,),{'quiet':quiet})
+    server = ThreadingHTTPServer((host,port),handler)
+    server.daemon_threads = True
+    server.service = service
+    return server
+
+def request_conversion(text,url='http://127.0.0.1:8765',kind=None,timeout=600,**options):
+    """
+    ask a running service for the page for an export (text, or bytes of a .zip); the options
+    are those of conversion_options. Returns the page; urllib's HTTPError if the service said no
+    """
+    params = dict(options)
+    if kind != None:
+        params['kind'] = kind
+    params = {k:(int(v) if isinstance(v,bool) else v) for k,v in params.items() if v != None}
+    data = text if isinstance(text,bytes) else text.encode('utf-8')
+    req = Request(url.rstrip('/')+'/convert?'+urlencode(params),data=data,method='POST',\
+                  headers={'Content-Type':'text/html; charset=utf-8'})
+    with urlopen(req,timeout=timeout) as resp:
+        return resp.read().decode('utf-8')
+
+if __name__ == '__main__':
+    parser = ArgumentParser()
+    parser.add_argument('--host',type=str,default='127.0.0.1',help='address to listen on (default: only this machine)')
+    parser.add_argument('--port',type=int,default=8765,help='port to listen on')
+    parser.add_argument('--jobs','-j',type=int,default=2,help='number of worker processes')
+    parser.add_argument('--cache-size',type=int,default=128,help='most pages to keep in the cache')
+    parser.add_argument('--cache-mb',type=float,default=64,help='most megabytes of pages to keep in the cache')
+    parser.add_argument('--max-pending',type=int,default=None,\
+                    help='conversions that can be waiting or running before new ones get 503 (default: 4 per worker)')
+    parser.add_argument('--verbose','-v',action='store_true',help='log each request')
+    args = parser.parse_args()
+
+    service = ConversionService(workers=args.jobs,cache_size=args.cache_size,cache_bytes=int(args.cache_mb*1024*1024),\
+                                max_pending=args.max_pending)
+    service.warm()
+    server = make_server(service,args.host,args.port,quiet=not args.verbose)
+    print('serving conversions on http://%s:%d (ctrl-c to stop)' % server.server_address[:2])
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    server.server_close()
+    service.close()
@@ -0,0 +1,87 @@
+import os
+import time
+
+####
+# --watch mode: stay running and reconvert exports when they show up or change, so editors
+# re-exporting a google doc over and over don't pay for python startup, imports and the
+# stylesheet translation every time (the translation is kept in memory by css_translate, and
+# parse_google_doc keeps its section cache in memory between runs)
+#
+# this just polls the directory (the stdlib has nothing like inotify, and it's a handful of
+# files); a file is only converted once its size and mtime are the same on two polls in a row,
+# so we don't read an export that is still being downloaded/copied in
+####
+
+EXPORT_EXTS = ('.html','.zip')
+
+def is_export(name):
+    """
+    whether a file name looks like an export to convert (not our own outputs, not hidden or
+    temporary files)
+    """
+    low = name.lower()
+    return low.endswith(EXPORT_EXTS) and not low.startswith(('out_','.','~'))
+
+def scan(dirname):
+    """
+    {path:(mtime,size)} for the exports in a directory
+    """
+    found = {}
+    for entry in os.scandir(dirname):
+        if entry.is_file() and is_export(entry.name):
+            st = entry.stat()
+            found[entry.path] = (st.st_mtime_ns,st.st_size)
+    return found
+
+def newest(paths):
+    """
+    the most recently modified of some files
+    """
+    return max(paths,key=lambda p: os.stat(p).st_mtime_ns)
+
+def watch(dirname,handle,interval=1.0,rounds=None):
+    """
+    poll dirname every interval seconds and call handle(paths) with the exports that are new or
+    changed (and have settled) since they were last handled; the ones already there at the start
+    count as new. handle should catch its own errors; rounds stops after that many polls (None:
+    run until interrupted)
+    """
+    done = {}  # path: signature when last handled
+    prev = {}
+    n = 0
+    try:
+        while rounds == None or n < rounds:
+            now = scan(dirname)
+            ready = [p for p,sig in now.items() if prev.get(p) == sig and done.get(p) != sig]
+            if len(ready) > 0:
+                handle(sorted(ready))
+                for p in ready:
+                    done[p] = now[p]
+            prev = now
+            n += 1
+            time.sleep(interval)
+    except KeyboardInterrupt:
+        print('stopped watching %s' % dirname)
+
+def pick(paths,keep):
+    """
+    the paths that keep(path) is true for; a file keep fails on (one that can't be read as an
+    export: a zip with no html in it, text that isn't utf-8...) is skipped with a message,
+    rather than the error stopping the watch
+    """
+    picked = []
+    for p in paths:
+        try:
+            if keep(p):
+                picked.append(p)
+        except Exception as e:
+            print('%s SKIPPED: %s: %s' % (p,type(e).__name__,e))
+    return picked
+
+def add_watch_args(argparser):
+    """
+    add the --watch/--interval options to a script's ArgumentParser
+    """
+    argparser.add_argument('--watch',type=str,default=None,metavar='DIR',\
+                    help='keep running, and reconvert exports (.html or .zip) in DIR when they change')
+    argparser.add_argument('--interval',type=float,default=1.0,help='seconds between checks in --watch mode')